@@ -1,37 +1,64 @@
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 
-from app.api.models import TextIn, LocationOut
-from app.services.spacy_service import extract_locations_with_spacy
-from app.services.bilstm_service import extract_locations_with_bilstm
+from typing import List, Dict, Any, Literal
+
+from app.api.models import TextIn, LocationOut, BatchTextIn, BatchLocationOut, EnsembleLocationOut, CascadeLocationOut
+from app.services.spacy_service import extract_locations_with_spacy, extract_locations_with_spacy_batch
+from app.services.bilstm_service import extract_locations_with_bilstm, extract_locations_with_bilstm_batch, bilstm_batcher
+from app.services.ensemble_service import extract_locations_with_ensemble
+from app.services.cascade_service import extract_locations_with_cascade, cascade_stats
+from app.services.gazetteer_service import extract_locations_with_gazetteer
+from app.services.prefilter import prefilter_stats
+from app.services.coalescing import coalescing_stats
 from app.frontend.html import HTML_CONTENT 
-from app.core.config import logger 
+from app.core.config import request_logger, ENSEMBLE_DEFAULT_POLICY
+from app.core.cache import get_result_cache, get_sentence_cache
+from app.core.metrics import render_metrics
 
 router = APIRouter()
 
+def _batch_response(texts: List[str], result: Dict[str, Any], default_model: str, spans: bool = False) -> BatchLocationOut:
+    """Builds the batch response, keeping per-text errors in each item's error_message."""
+    model_used = result.get("model_used", default_model)
+    items = []
+    for text, item in zip(texts, result.get("results", [])):
+        items.append(LocationOut(
+            input_text=text,
+            extracted_locations=item.get("locations", []),
+            model_used=item.get("model_used", model_used),
+            error_message=item.get("error"),
+            spans=item.get("spans") if spans else None
+        ))
+    return BatchLocationOut(results=items, model_used=model_used)
+
 @router.post("/extract-with-spacy/",
              response_model=LocationOut,
              tags=["Location Extraction"],
              summary="Extract locations using spaCy",
              description="Processes the input text with a spaCy NER model to identify and return geographical locations.")
-async def extract_spacy_endpoint(data: TextIn):
+async def extract_spacy_endpoint(data: TextIn, by_sentence: bool = False, spans: bool = False):
     """
     Endpoint to extract locations using the **spaCy** model.
     - Processes input text.
     - Identifies entities like GPE (Geopolitical Entity), LOC (Location).
     - Returns a list of unique location names found.
+    - With `?by_sentence=true`, the text is processed sentence by sentence and results of
+      previously seen sentences are reused.
+    - With `?spans=true`, the response also lists every location occurrence with its character offsets.
     """
     user_sentence = data.text
-    logger.info(f"Received request for spaCy extraction: '{user_sentence[:70]}...'")
-    result = await extract_locations_with_spacy(user_sentence)
+    request_logger.info("Received request for spaCy extraction: '%.70s...'", user_sentence)
+    result = await extract_locations_with_spacy(user_sentence, by_sentence=by_sentence)
 
     if "error" in result:
-        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"])
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
 
     return LocationOut(
         input_text=user_sentence,
         extracted_locations=result.get("locations", []),
-        model_used=result.get("model_used", "spaCy")
+        model_used=result.get("model_used", "spaCy"),
+        spans=result.get("spans") if spans else None
     )
 
 @router.post("/extract-with-bilstm/",
@@ -39,27 +66,211 @@ async def extract_spacy_endpoint(data: TextIn):
              tags=["Location Extraction"],
              summary="Extract locations using BiLSTM-CRF",
              description="Processes the input text with a BiLSTM-CRF model to identify and return geographical locations based on B-LOC and I-LOC tags.")
-async def extract_bilstm_endpoint(data: TextIn):
+async def extract_bilstm_endpoint(data: TextIn, long_document: bool = False, by_sentence: bool = False, spans: bool = False):
     """
     Endpoint to extract locations using the **BiLSTM-CRF** model.
     - Tokenizes input text (using spaCy's tokenizer).
     - Converts tokens to IDs and feeds them to the BiLSTM-CRF model.
     - Decodes predicted tags to identify location spans (B-LOC, I-LOC).
     - Returns a list of unique location names found.
+    - With `?long_document=true`, texts longer than the model's maximum sequence length
+      are processed in overlapping windows instead of being truncated.
+    - With `?by_sentence=true`, the text is processed sentence by sentence and results of
+      previously seen sentences are reused.
+    - With `?spans=true`, the response also lists every location occurrence with its character offsets.
     """
     user_sentence = data.text
-    logger.info(f"Received request for BiLSTM-CRF extraction: '{user_sentence[:70]}...'")
-    result = await extract_locations_with_bilstm(user_sentence)
+    request_logger.info("Received request for BiLSTM-CRF extraction: '%.70s...'", user_sentence)
+    result = await extract_locations_with_bilstm(user_sentence, long_document=long_document, by_sentence=by_sentence)
 
     if "error" in result:
-        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"])
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
 
     return LocationOut(
         input_text=user_sentence,
         extracted_locations=result.get("locations", []),
-        model_used=result.get("model_used", "BiLSTM-CRF")
+        model_used=result.get("model_used", "BiLSTM-CRF"),
+        spans=result.get("spans") if spans else None
+    )
+
+@router.post("/extract-with-gazetteer/",
+             response_model=LocationOut,
+             tags=["Location Extraction"],
+             summary="Extract locations using the gazetteer",
+             description="Matches the input text against a fixed list of known place names, without running a model.")
+async def extract_gazetteer_endpoint(data: TextIn, spans: bool = False):
+    """
+    Endpoint to extract locations using the **gazetteer**.
+    - Finds every known place name on token boundaries (case-insensitively by default),
+      preferring the longest name: "New York City" over "New York".
+    - Takes microseconds per text, but only finds names that are in the gazetteer.
+    - With `?spans=true`, the response also lists every location occurrence with its character offsets.
+    """
+    user_sentence = data.text
+    request_logger.info("Received request for gazetteer extraction: '%.70s...'", user_sentence)
+    result = await extract_locations_with_gazetteer(user_sentence)
+
+    if "error" in result:
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
+
+    return LocationOut(
+        input_text=user_sentence,
+        extracted_locations=result.get("locations", []),
+        model_used=result.get("model_used", "Gazetteer"),
+        spans=result.get("spans") if spans else None
+    )
+
+@router.post("/extract-with-ensemble/",
+             response_model=EnsembleLocationOut,
+             tags=["Location Extraction"],
+             summary="Extract locations using spaCy and BiLSTM-CRF together",
+             description="Runs spaCy and the BiLSTM-CRF model concurrently on one shared tokenization and merges their locations with a union, intersection or vote policy.")
+async def extract_ensemble_endpoint(data: TextIn, policy: Literal["union", "intersection", "vote"] = ENSEMBLE_DEFAULT_POLICY, spans: bool = False):
+    """
+    Endpoint to extract locations using **both models** in one request.
+    - Tokenizes the input once and runs spaCy NER and BiLSTM-CRF decoding in parallel.
+    - Overlapping locations from the two models are merged according to `policy`:
+      `union` (found by either), `intersection` (found by both) or `vote` (weighted agreement).
+    - With `?spans=true`, each span also lists the models that found it in `sources`.
+    """
+    user_sentence = data.text
+    request_logger.info("Received request for ensemble extraction (%s): '%.70s...'", policy, user_sentence)
+    result = await extract_locations_with_ensemble(user_sentence, policy=policy)
+
+    if "error" in result:
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
+
+    return EnsembleLocationOut(
+        input_text=user_sentence,
+        extracted_locations=result.get("locations", []),
+        model_used=result.get("model_used", "Ensemble"),
+        spans=result.get("spans") if spans else None
+    )
+
+@router.post("/extract-with-cascade/",
+             response_model=CascadeLocationOut,
+             tags=["Location Extraction"],
+             summary="Extract locations with the BiLSTM-CRF, escalating uncertain texts to spaCy",
+             description="Decodes the input text with the BiLSTM-CRF model and scores the result with CRF marginals; texts below the confidence threshold are re-run with spaCy.")
+async def extract_cascade_endpoint(data: TextIn, spans: bool = False):
+    """
+    Endpoint to extract locations with a **confidence cascade**.
+    - Runs the cheaper BiLSTM-CRF first and computes the marginal probability of every predicted tag.
+    - If any token is below `CASCADE_CONFIDENCE_THRESHOLD` (or the text was truncated), spaCy's result is returned instead.
+    - `confidence` and `escalated` report the decision; with `?spans=true`, BiLSTM-CRF spans carry their own confidence.
+    """
+    user_sentence = data.text
+    request_logger.info("Received request for cascade extraction: '%.70s...'", user_sentence)
+    result = await extract_locations_with_cascade(user_sentence)
+
+    if "error" in result:
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
+
+    return CascadeLocationOut(
+        input_text=user_sentence,
+        extracted_locations=result.get("locations", []),
+        model_used=result.get("model_used", "Cascade"),
+        confidence=result["confidence"],
+        escalated=result["escalated"],
+        spans=result.get("spans") if spans else None
     )
 
+@router.post("/extract-with-spacy/batch/",
+             response_model=BatchLocationOut,
+             tags=["Location Extraction"],
+             summary="Extract locations from several texts using spaCy",
+             description="Processes a list of texts with spaCy's nlp.pipe and returns one result per text, in input order.")
+async def extract_spacy_batch_endpoint(data: BatchTextIn, spans: bool = False):
+    """
+    Batch endpoint to extract locations using the **spaCy** model.
+    - Processes all texts with `nlp.pipe`.
+    - Returns results in input order; a failing text carries its own `error_message`.
+    - With `?spans=true`, each result also lists its location occurrences with character offsets.
+    """
+    request_logger.info("Received batch request for spaCy extraction: %d texts", len(data.texts))
+    result = await extract_locations_with_spacy_batch(data.texts)
+
+    if "error" in result:
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
+
+    return _batch_response(data.texts, result, "spaCy", spans)
+
+@router.post("/extract-with-bilstm/batch/",
+             response_model=BatchLocationOut,
+             tags=["Location Extraction"],
+             summary="Extract locations from several texts using BiLSTM-CRF",
+             description="Processes a list of texts with a single BiLSTM-CRF decode call and returns one result per text, in input order.")
+async def extract_bilstm_batch_endpoint(data: BatchTextIn, spans: bool = False):
+    """
+    Batch endpoint to extract locations using the **BiLSTM-CRF** model.
+    - Tokenizes every text and pads the batch to its longest item.
+    - Runs one `decode` call for the whole batch.
+    - Returns results in input order; a failing text carries its own `error_message`.
+    - With `?spans=true`, each result also lists its location occurrences with character offsets.
+    """
+    request_logger.info("Received batch request for BiLSTM-CRF extraction: %d texts", len(data.texts))
+    result = await extract_locations_with_bilstm_batch(data.texts)
+
+    if "error" in result:
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"], headers=result.get("headers"))
+
+    return _batch_response(data.texts, result, "BiLSTM-CRF", spans)
+
+@router.get("/stats/batching",
+            tags=["Monitoring"],
+            summary="Micro-batching statistics",
+            description="Returns the batch size and queue-wait histograms achieved by the BiLSTM-CRF micro-batcher.")
+async def batching_stats():
+    """
+    Reports how well concurrent single-text BiLSTM requests are being batched together.
+    """
+    return {"bilstm": bilstm_batcher.stats()}
+
+@router.get("/stats/cache",
+            tags=["Monitoring"],
+            summary="Result cache statistics",
+            description="Returns hit, miss, eviction and size counters of the document result cache and the per-sentence cache, and the request coalescing counters.")
+async def cache_stats():
+    """
+    Reports how often repeated texts (`results`) and repeated sentences (`sentences`)
+    are answered from cache instead of a model, and how often identical concurrent requests
+    shared one in-flight extraction (`coalescing`).
+    """
+    return {"results": get_result_cache().stats(), "sentences": get_sentence_cache().stats(), "coalescing": coalescing_stats()}
+
+@router.get("/stats/cascade",
+            tags=["Monitoring"],
+            summary="Confidence cascade statistics",
+            description="Returns the escalation rate of the cascade endpoint, the mean latency of each stage and the estimated spaCy time saved.")
+async def cascade_statistics():
+    """
+    Reports how many cascade requests were answered by the BiLSTM-CRF alone and how many were escalated to spaCy.
+    """
+    return cascade_stats()
+
+@router.get("/stats/prefilter",
+            tags=["Monitoring"],
+            summary="Candidate pre-filter statistics",
+            description="Returns how many texts the pre-filter answered without a model, and the false-negative rate measured by re-running the model on a sample of them.")
+async def prefilter_statistics():
+    """
+    Reports the pre-filter's skip rate per backend and its audited false-negative rate:
+    the share of sampled skipped texts in which the full model does find a location.
+    """
+    return prefilter_stats()
+
+@router.get("/metrics",
+            response_class=Response,
+            tags=["Monitoring"],
+            summary="Prometheus metrics",
+            description="Returns per-stage latency histograms, request and error counters, token lengths, truncations, executor queues, batch sizes and process RSS in the Prometheus text format.")
+async def metrics():
+    """
+    Scrape target for Prometheus (or anything that reads its text format); no metrics service is needed.
+    Stage latencies are labelled by backend and stage: tokenize, tensors, forward, viterbi, marginals, pipeline, postprocess, match.
+    """
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @router.get("/",
             response_class=HTMLResponse,
             tags=["Frontend"],
@@ -69,5 +280,5 @@ async def get_frontend_form():
     """
     Serves the main HTML page for interacting with the API.
     """
-    logger.info("Serving HTML frontend.")
+    request_logger.info("Serving HTML frontend.")
     return HTMLResponse(content=HTML_CONTENT, status_code=200)
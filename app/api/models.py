@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
+from typing_extensions import Annotated
+
+from app.core.config import BATCH_MAX_TEXTS
 
 class TextIn(BaseModel):
     """Input text model for location extraction."""
@@ -9,12 +12,22 @@ class TextIn(BaseModel):
         json_schema_extra={"example": "I will travel from London to Tokyo, passing through Paris and then to New York."}
     )
 
+class LocationSpan(BaseModel):
+    """One extracted location occurrence, with its position in the input text."""
+    start: int = Field(..., description="Start character offset in the input text")
+    end: int = Field(..., description="End character offset in the input text (exclusive)")
+    text: str = Field(..., description="The input text between start and end")
+    label: str = Field(..., description="Entity label, e.g. GPE, LOC")
+    token_start: int = Field(..., description="Index of the first token of the location")
+    token_end: int = Field(..., description="Index after the last token of the location")
+
 class LocationOut(BaseModel):
     """Output model for extracted locations."""
     input_text: str = Field(..., description="The original input text")
     extracted_locations: List[str] = Field(..., description="List of extracted location names")
     model_used: str = Field(..., description="Name of the model used for extraction")
     error_message: Optional[str] = Field(None, description="Error message if any")
+    spans: Optional[List[LocationSpan]] = Field(None, description="Every location occurrence with its offsets (only with ?spans=true)")
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -33,4 +46,36 @@ class LocationOut(BaseModel):
                 }
             ]
         }
-    )
\ No newline at end of file
+    )
+
+class BatchTextIn(BaseModel):
+    """Input model for batch location extraction."""
+    texts: List[Annotated[str, Field(min_length=1)]] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_TEXTS,
+        json_schema_extra={"example": ["We visited Berlin and Rome last summer.", "Flights from Lagos to Nairobi are delayed."]}
+    )
+
+class BatchLocationOut(BaseModel):
+    """Output model for batch location extraction. Results are returned in input order."""
+    results: List[LocationOut] = Field(..., description="One result per input text, in input order")
+    model_used: str = Field(..., description="Name of the model used for extraction")
+
+class EnsembleLocationSpan(LocationSpan):
+    """A merged ensemble location, with the models that found it."""
+    sources: List[str] = Field(..., description="Models that found this location")
+
+class EnsembleLocationOut(LocationOut):
+    """Output model for ensemble location extraction."""
+    spans: Optional[List[EnsembleLocationSpan]] = Field(None, description="Every merged location occurrence with its offsets and sources (only with ?spans=true)")
+
+class ScoredLocationSpan(LocationSpan):
+    """A cascade location, with the BiLSTM-CRF's confidence in it."""
+    confidence: Optional[float] = Field(None, description="Lowest CRF marginal probability of the span's tags (None for spans found by spaCy after escalation)")
+
+class CascadeLocationOut(LocationOut):
+    """Output model for cascade location extraction."""
+    confidence: float = Field(..., description="Document confidence of the BiLSTM-CRF result: lowest CRF marginal probability over its tokens")
+    escalated: bool = Field(..., description="Whether the text was re-run with spaCy because the BiLSTM-CRF was not confident enough")
+    spans: Optional[List[ScoredLocationSpan]] = Field(None, description="Every location occurrence with its offsets and confidence (only with ?spans=true)")
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import (
+    logger, RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_SQLITE_PATH,
+    SENTENCE_CACHE_MAX_BYTES, SENTENCE_CACHE_TTL_SECONDS
+)
+from app.core.metrics import registry, CallbackFamily
+
+def result_cache_key(backend: str, model_version: str, text: str, *options: Any) -> str:
+    """
+    Builds the cache key for one extraction request: backend, model version, request options
+    and a SHA-256 of the exact input text. The text is not normalized, because results
+    (and character offsets) depend on the exact input.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    option_part = ",".join(str(option) for option in options)
+    return f"{backend}:{model_version}:{option_part}:{text_hash}"
+
+class ResultCache:
+    """
+    Two-tier cache of extraction results (JSON-serializable dicts).
+    - Memory tier: LRU bounded by the total size of the serialized entries (`max_bytes`).
+    - Disk tier (optional): SQLite file shared by every worker process and kept across restarts.
+    Entries in both tiers expire `ttl_seconds` after they were stored. Keys start with the backend
+    name, so a backend's entries can be invalidated on their own.
+
+    Request handlers use aget()/aset(): the memory tier is used directly, and the disk tier is read
+    and written on a worker thread, so a busy SQLite file (up to its 5 s busy timeout) never blocks
+    the event loop. The two tiers have separate locks, so memory lookups never wait for disk I/O.
+    Disk-tier errors are logged and treated as misses.
+    """
+    def __init__(self, max_bytes: int, ttl_seconds: float, sqlite_path: Optional[str] = None, name: str = "results"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, serialized value)
+        self._bytes = 0
+        self._lock = threading.Lock() # Memory tier and counters
+        self._db_lock = threading.Lock() # Disk tier
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _get_db(self) -> Optional[sqlite3.Connection]:
+        """Opens the disk tier on first use. Caller holds the disk lock."""
+        if self.sqlite_path is None:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL") # Concurrent readers across worker processes
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            logger.info("Result cache '%s' disk tier opened at '%s'", self.name, self.sqlite_path)
+        return self._db
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return len(key) + len(value)
+
+    def _store_in_memory(self, key: str, value: str, expires_at: float) -> None:
+        """Inserts an entry and evicts least recently used entries until the byte budget holds. Caller holds the lock."""
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= self._entry_size(key, previous[1])
+        self._entries[key] = (expires_at, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_key, (_, old_value) = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(old_key, old_value)
+            self._counters["evictions"] += 1
+
+    def _get_from_memory(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+            del self._entries[key]
+            self._bytes -= self._entry_size(key, value)
+            self._counters["expirations"] += 1
+            return None
+
+    def _get_from_disk(self, key: str, now: float) -> Optional[str]:
+        """Reads the disk tier and promotes a hit to the memory tier. Blocking."""
+        try:
+            with self._db_lock:
+                row = self._get_db().execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Result cache '%s' disk tier read failed: %s", self.name, e)
+            return None
+        if row is None or row[1] <= now:
+            return None
+        with self._lock:
+            self._store_in_memory(key, row[0], row[1])
+            self._counters["disk_hits"] += 1
+        return row[0]
+
+    def _write_to_disk(self, key: str, serialized: str, expires_at: float) -> None:
+        """Blocking."""
+        try:
+            with self._db_lock:
+                self._get_db().execute(
+                    "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)", (key, serialized, expires_at))
+        except sqlite3.Error as e:
+            logger.warning("Result cache '%s' disk tier write failed: %s", self.name, e)
+
+    def _finish_get(self, value: Optional[str]) -> Optional[Dict[str, Any]]:
+        if value is None:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        return json.loads(value)
+
+    def _store(self, key: str, value: Dict[str, Any]) -> Tuple[str, float]:
+        """Stores a value in the memory tier and returns its serialized form and expiry time."""
+        serialized = json.dumps(value, separators=(",", ":"))
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_in_memory(key, serialized, expires_at)
+        return serialized, expires_at
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns a fresh copy of the cached value, or None on a miss or an expired entry. Blocking on the disk tier."""
+        now = time.time()
+        value = self._get_from_memory(key, now)
+        if value is None and self.sqlite_path is not None:
+            value = self._get_from_disk(key, now)
+        return self._finish_get(value)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """Like get(), with the disk tier read on a worker thread."""
+        now = time.time()
+        value = self._get_from_memory(key, now)
+        if value is None and self.sqlite_path is not None:
+            value = await asyncio.to_thread(self._get_from_disk, key, now)
+        return self._finish_get(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Stores a value in both tiers. Blocking on the disk tier."""
+        serialized, expires_at = self._store(key, value)
+        if self.sqlite_path is not None:
+            self._write_to_disk(key, serialized, expires_at)
+
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        """Like set(), with the disk tier written on a worker thread."""
+        serialized, expires_at = self._store(key, value)
+        if self.sqlite_path is not None:
+            await asyncio.to_thread(self._write_to_disk, key, serialized, expires_at)
+
+    def invalidate(self, backend: Optional[str] = None) -> int:
+        """Drops every entry of `backend` (or every entry) from both tiers. Returns the number of memory entries dropped."""
+        prefix = f"{backend}:" if backend else ""
+        with self._lock:
+            stale = [key for key in self._entries if key.startswith(prefix)]
+            for key in stale:
+                self._bytes -= self._entry_size(key, self._entries.pop(key)[1])
+            self._counters["invalidations"] += 1
+        if self.sqlite_path is not None:
+            with self._db_lock:
+                self._get_db().execute("DELETE FROM results WHERE key LIKE ? OR expires_at <= ?", (prefix + "%", time.time()))
+        logger.info("Result cache '%s' invalidated %d entries for backend '%s'.", self.name, len(stale), backend or "*")
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            entries, used_bytes = len(self._entries), self._bytes
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        return {
+            "enabled": RESULT_CACHE_ENABLED,
+            **counters,
+            "hit_rate": (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": used_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self.sqlite_path,
+        }
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_SQLITE_PATH)
+
+def get_result_cache() -> ResultCache:
+    """Returns the shared extraction result cache."""
+    return result_cache
+
+# Per-sentence location spans for sentence-level memoization (app/services/sentence_memo.py)
+sentence_cache = ResultCache(SENTENCE_CACHE_MAX_BYTES, SENTENCE_CACHE_TTL_SECONDS, name="sentences")
+
+def get_sentence_cache() -> ResultCache:
+    """Returns the per-sentence span cache."""
+    return sentence_cache
+
+def _cache_lookup_samples():
+    for cache in (result_cache, sentence_cache):
+        stats = cache.stats()
+        for outcome, field in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+            yield (cache.name, outcome), stats[field]
+
+registry.register(CallbackFamily(
+    "cache_lookups_total", "Cache lookups by outcome.", ("cache", "outcome"), _cache_lookup_samples, metric_type="counter"))
+registry.register(CallbackFamily(
+    "cache_memory_bytes", "Size of the serialized entries in the memory tier.", ("cache",),
+    lambda: (((cache.name,), cache.stats()["bytes"]) for cache in (result_cache, sentence_cache))))
@@ -1,10 +1,32 @@
 import os
 import logging
-import torch
+
+from app.core.logs import configure_logging, SampledRequestLogger
 
 # --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "text" # "text", or "json" (one object per line, with request IDs and stage timings)
+# Records go through a bounded queue to a background thread, so request handlers never wait on log I/O.
+# When the queue is full, records are dropped instead of blocking.
+LOG_QUEUE_ENABLED = True
+LOG_QUEUE_MAX_SIZE = 10000
+# Share of requests whose per-request info lines (received, extracted, completed) are logged,
+# per request path. Warnings and errors are always logged.
+LOG_REQUEST_SAMPLE_RATES = {
+    "/extract-with-spacy/": 1.0,
+    "/extract-with-bilstm/": 1.0,
+    "/extract-with-ensemble/": 1.0,
+    "/extract-with-gazetteer/": 1.0,
+    "/extract-with-cascade/": 1.0,
+    "/health": 0.0,
+    "/ready": 0.0,
+    "/metrics": 0.0,
+}
+LOG_REQUEST_DEFAULT_SAMPLE_RATE = 1.0
+
+configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_ENABLED, LOG_QUEUE_MAX_SIZE)
 logger = logging.getLogger(__name__)
+request_logger = SampledRequestLogger(logger) # Per-request info lines, subject to LOG_REQUEST_SAMPLE_RATES
 
 # --- Base Directory ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,24 +38,171 @@ BILSTM_MODEL_DIR = os.path.join(DATA_DIR, "BILSTM")
 WORD2IDX_PATH = os.path.join(BILSTM_MODEL_DIR, "ner_word2idx.pkl")
 TAG2IDX_PATH = os.path.join(BILSTM_MODEL_DIR, "ner_tag2idx.pkl")
 MODEL_WEIGHTS_PATH = os.path.join(BILSTM_MODEL_DIR, "best_bilstm_crf_location_ner_model_pytorch.pth")
+REFERENCE_CORPUS_PATH = os.path.join(BILSTM_MODEL_DIR, "reference_corpus.txt")
+# Flat weight file for the "numpy" backend, written by `python -m app.models.numpy_bilstm`
+NUMPY_WEIGHTS_PATH = os.path.join(BILSTM_MODEL_DIR, "bilstm_crf_weights.npz")
+# First-layer input projection table of the "numpy" backend, cached next to the weights
+INPUT_PROJECTION_TABLE_PATH = os.path.join(BILSTM_MODEL_DIR, "bilstm_crf_input_projection.npy")
+# Memory-mappable artifacts written by `python -m app.models.artifacts` (see app/models/artifacts.py)
+SAFETENSORS_WEIGHTS_PATH = os.path.join(BILSTM_MODEL_DIR, "bilstm_crf_weights.safetensors")
+WORD2IDX_TRIE_PATH = os.path.join(BILSTM_MODEL_DIR, "ner_word2idx.marisa")
+WORD2IDX_TRIE_INDICES_PATH = os.path.join(BILSTM_MODEL_DIR, "ner_word2idx.indices.npy")
+# Gazetteer backend: place names, one per line (optionally a tab and a label), and its compiled index
+GAZETTEER_PATH = os.path.join(DATA_DIR, "gazetteer", "locations.tsv")
+GAZETTEER_INDEX_PATH = os.path.join(DATA_DIR, "gazetteer", "locations.marisa")
+
+# --- Model Loading ---
+# Backends to serve: any of "spacy", "bilstm" and "gazetteer". A BiLSTM-only deployment loads a
+# tokenizer-only spaCy object for preprocessing instead of the full NER pipeline.
+ENABLED_BACKENDS = ("spacy", "bilstm", "gazetteer")
+# "parallel": load the enabled backends in background threads; the API accepts traffic at once
+#   and /ready reports when a backend is usable.
+# "sequential": load every backend before the API accepts traffic.
+# "lazy": load each backend on its first request.
+MODEL_LOADING_MODE = "parallel"
 
 BILSTM_EMBED_DIM = 150
 BILSTM_LSTM_UNITS = 128
 BILSTM_LAYERS = 2
 BILSTM_DROPOUT = 0.35
 
+# BiLSTM inference backend (see app/models/backends.py):
+# "eager" (fp32), "dynamic_int8" (int8 nn.LSTM and hidden2tag, CPU only), "torchscript",
+# or "numpy" (torch-free runtime in app/models/numpy_bilstm.py, loads NUMPY_WEIGHTS_PATH).
+BILSTM_INFERENCE_BACKEND = "eager"
+# Non-eager backends are compared with fp32 on REFERENCE_CORPUS_PATH at load time
+# and replaced by the eager model if their token-level tag agreement is too low.
+BILSTM_BACKEND_PARITY_CHECK = True
+BILSTM_BACKEND_MIN_TOKEN_AGREEMENT = 0.99
+# "numpy" backend: precompute the first LSTM layer's input gates for every vocabulary entry at load
+# time, so each token costs one row gather instead of an embedding lookup plus the input GEMM.
+# The table (vocab_size x 8 * BILSTM_LSTM_UNITS floats, about 60 MB for the shipped vocabulary) is
+# cached at INPUT_PROJECTION_TABLE_PATH and memory-mapped, so worker processes share one copy.
+BILSTM_INPUT_PROJECTION_TABLE = True
+BILSTM_INPUT_PROJECTION_TABLE_CACHE = True
+
+# When the memory-mappable artifacts exist, load them instead of the .pth/.npz weights and the
+# pickled word2idx. Worker processes then share one copy of the weights and vocabulary in the page
+# cache. Applies to the "eager" and "numpy" backends; the others build their own copy of the weights.
+BILSTM_MMAP_ARTIFACTS = True
+
 BILSTM_MAX_SEQ_LEN = 100
+# Long-document mode: texts longer than BILSTM_MAX_SEQ_LEN are split into overlapping
+# windows of BILSTM_MAX_SEQ_LEN tokens that share BILSTM_WINDOW_OVERLAP tokens.
+BILSTM_WINDOW_OVERLAP = 20
+# Batched BiLSTM calls are grouped by token length into these buckets (upper bounds);
+# each bucket is padded only to its own longest sequence.
+BILSTM_LENGTH_BUCKETS = (8, 16, 32, 64, BILSTM_MAX_SEQ_LEN)
 PAD_TOKEN = "<PAD>"
 UNK_TOKEN = "<UNK>"
 PAD_IDX = 0 
 UNK_IDX = 1 
 
-if torch.cuda.is_available():
-    DEVICE = torch.device("cuda")
-    logger.info("CUDA is available. Using GPU.")
+# --- Gazetteer Backend ---
+# Known place names matched without a model (app/models/gazetteer.py). The memory-mapped index is
+# rebuilt from GAZETTEER_PATH at load time if it is missing, older than that file, or was built
+# with another folding mode.
+GAZETTEER_FOLDING = "casefold_ascii" # "none", "casefold", or "casefold_ascii" (also ignores accents)
+# Texts up to this many characters are matched directly on the event loop, which takes tens of
+# microseconds; longer texts go to the inference executor.
+GAZETTEER_INLINE_MAX_CHARS = 5000
+
+# --- Candidate Pre-Filter ---
+# Texts without any location candidate (a capitalized word that does not start a sentence, a word of
+# PREFILTER_LEXICON_PATH, or a gazetteer name) get an empty result without running spaCy or the
+# BiLSTM-CRF. See app/services/prefilter.py. Check the audited false-negative rate on
+# /stats/prefilter against your own traffic before relying on it.
+PREFILTER_ENABLED = False
+# Location words of the BiLSTM vocabulary, written by `python -m app.services.prefilter <tagged corpus>`
+PREFILTER_LEXICON_PATH = os.path.join(BILSTM_MODEL_DIR, "loc_vocab.txt")
+# Share of skipped texts still run through the model in the background to measure false negatives
+PREFILTER_AUDIT_SAMPLE_RATE = 0.02
+
+# --- Batch Extraction ---
+BATCH_MAX_TEXTS = 256 # Maximum number of texts accepted by the batch endpoints
+SPACY_BATCH_SIZE = 64 # batch_size passed to nlp.pipe
+
+# --- Inference Executor ---
+# Model inference runs on a bounded thread pool so it never blocks the event loop.
+INFERENCE_EXECUTOR_WORKERS = min(4, os.cpu_count() or 1)
+INFERENCE_EXECUTOR_QUEUE_LIMIT = 64 # Jobs allowed to wait for a free worker before new ones are rejected
+INFERENCE_OVERLOAD_STATUS_CODE = 503 # Returned when the executor is saturated (use 429 to signal client back-off)
+INFERENCE_OVERLOAD_RETRY_AFTER_SECONDS = 1
+
+# --- Inference Engine ---
+# "threads": inference runs on the thread pool above, inside the API process.
+# "processes": every spaCy and BiLSTM-CRF extraction runs in worker processes that each hold their own
+#   spaCy/BiLSTM-CRF replica, so tokenization, post-processing and CRF decoding use several cores
+#   despite the GIL. The API process itself loads neither model (only the gazetteer).
+INFERENCE_ENGINE = "threads"
+INFERENCE_PROCESS_WORKERS = 0 # 0: one worker per CPU available to this process
+INFERENCE_PROCESS_TORCH_THREADS = 0 # torch intra-op threads per worker; 0: available CPUs // workers (at least 1)
+INFERENCE_PROCESS_QUEUE_LIMIT = 64 # Jobs allowed to wait for a free worker process before new ones are rejected
+INFERENCE_PROCESS_START_TIMEOUT_SECONDS = 300
+
+# --- Ensemble Extraction ---
+# spaCy and the BiLSTM-CRF run concurrently on one dedicated executor each.
+ENSEMBLE_EXECUTOR_WORKERS = 2
+ENSEMBLE_EXECUTOR_QUEUE_LIMIT = 32
+# How overlapping spans of the two models are merged: "union" keeps locations found by either model,
+# "intersection" those found by both, "vote" those whose summed model weight reaches the threshold.
+ENSEMBLE_DEFAULT_POLICY = "union"
+ENSEMBLE_VOTE_WEIGHTS = {"spacy": 0.6, "bilstm": 0.4}
+ENSEMBLE_VOTE_THRESHOLD = 0.5
+
+# --- Confidence Cascade ---
+# /extract-with-cascade/ decodes with the BiLSTM-CRF first and scores the result with CRF marginals.
+# Documents whose least confident token (the marginal probability of its predicted tag) is below the
+# threshold, or that were truncated to BILSTM_MAX_SEQ_LEN, are re-run with spaCy.
+CASCADE_CONFIDENCE_THRESHOLD = 0.9
+
+# --- BiLSTM Micro-Batching ---
+# Concurrent single-text BiLSTM requests are collected and decoded together.
+BILSTM_MICROBATCH_ENABLED = True
+BILSTM_MICROBATCH_MAX_SIZE = 32 # Flush as soon as this many requests are pending
+BILSTM_MICROBATCH_MAX_WAIT_MS = 5.0 # ...or once the oldest pending request has waited this long
+
+# --- Warmup ---
+# In the "parallel" and "sequential" loading modes (and in inference worker processes), each backend
+# runs synthetic texts of every WARMUP_TOKEN_LENGTHS length at every WARMUP_BATCH_SIZES size right
+# after loading, and only then becomes "ready" on /ready. The first real requests then do not pay for
+# allocator growth, oneDNN kernel selection or spaCy's first pipeline call. Lazy loading skips it.
+WARMUP_ENABLED = True
+WARMUP_TOKEN_LENGTHS = BILSTM_LENGTH_BUCKETS
+WARMUP_BATCH_SIZES = (1, 8, BILSTM_MICROBATCH_MAX_SIZE)
+
+# --- Request Coalescing ---
+# Concurrent single-text requests with the same backend, options and exact text share one extraction
+# instead of each running the model (bursts of identical texts arrive before any result is cached).
+REQUEST_COALESCING_ENABLED = True
+
+# --- Result Cache ---
+# Extraction results are cached per (backend, model version, options, exact text hash).
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024 # Memory tier budget (serialized entry size)
+RESULT_CACHE_TTL_SECONDS = 3600
+# Optional SQLite disk tier shared by uvicorn workers and kept across restarts,
+# e.g. os.path.join(DATA_DIR, "result_cache.sqlite3"). None keeps the cache in memory only.
+RESULT_CACHE_SQLITE_PATH = None
+
+# --- Sentence-Level Memoization ---
+# With by_sentence=true, documents are split into sentences and each sentence's spans are cached,
+# so re-sending a lightly edited document only runs the model on the changed sentences.
+SENTENCE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SENTENCE_CACHE_TTL_SECONDS = 24 * 3600
+
+# torch is only imported for the torch backends, so the "numpy" backend can run without it installed
+if BILSTM_INFERENCE_BACKEND == "numpy":
+    DEVICE = None
+    logger.info("BiLSTM backend is 'numpy'. Running without torch on CPU.")
 else:
-    DEVICE = torch.device("cpu")
-    logger.info("CUDA not available. Using CPU.")
+    import torch
+    if torch.cuda.is_available():
+        DEVICE = torch.device("cuda")
+        logger.info("CUDA is available. Using GPU.")
+    else:
+        DEVICE = torch.device("cpu")
+        logger.info("CUDA not available. Using CPU.")
 
 # --- API Information ---
 API_TITLE = "Location Extractor API (spaCy & BiLSTM-CRF)"
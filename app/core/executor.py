@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import (
+    logger, INFERENCE_EXECUTOR_WORKERS, INFERENCE_EXECUTOR_QUEUE_LIMIT,
+    INFERENCE_OVERLOAD_STATUS_CODE, INFERENCE_OVERLOAD_RETRY_AFTER_SECONDS,
+    ENSEMBLE_EXECUTOR_WORKERS, ENSEMBLE_EXECUTOR_QUEUE_LIMIT
+)
+from app.core.metrics import registry, CallbackFamily
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the inference executor already holds as many jobs as it accepts."""
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking model inference.
+    Keeps CPU-bound work (spaCy pipelines, BiLSTM-CRF decoding) off the asyncio event loop.
+    At most `max_workers` jobs run at once and at most `queue_limit` more wait for a
+    free thread; anything beyond that is rejected immediately with ExecutorSaturatedError
+    instead of queueing without bound.
+    """
+    def __init__(self, max_workers: int, queue_limit: int, name: str = "inference"):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_limit = max(0, queue_limit)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def _submit(self, pool, call: Callable[[], Any]):
+        # The job runs in a copy of the caller's context, so it keeps the request ID and stage timings
+        return pool.submit(contextvars.copy_context().run, call)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs fn(*args, **kwargs) on the pool and awaits its result."""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.queue_limit:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Inference executor '{self.name}' is saturated "
+                    f"({self._in_flight} jobs in flight, limit {self.max_workers + self.queue_limit})."
+                )
+            self._in_flight += 1
+            pool = self._get_pool()
+
+        try:
+            concurrent_future = self._submit(pool, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # Released when the job itself finishes, even if the awaiting caller is cancelled
+        concurrent_future.add_done_callback(self._release)
+        return await asyncio.wrap_future(concurrent_future)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of accepted jobs still waiting for a free worker thread."""
+        with self._lock:
+            return max(0, self._in_flight - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the worker threads. The pool is recreated on the next run()."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.info("Shutting down inference executor '%s'.", self.name)
+            pool.shutdown(wait=wait)
+
+inference_executor = InferenceExecutor(INFERENCE_EXECUTOR_WORKERS, INFERENCE_EXECUTOR_QUEUE_LIMIT, name="inference")
+
+def get_inference_executor() -> InferenceExecutor:
+    """Returns the shared inference executor."""
+    return inference_executor
+
+# The ensemble endpoint runs each model on its own pool, so one model's queue never delays the other
+ensemble_executors = {
+    backend: InferenceExecutor(ENSEMBLE_EXECUTOR_WORKERS, ENSEMBLE_EXECUTOR_QUEUE_LIMIT, name=f"ensemble-{backend}")
+    for backend in ("spacy", "bilstm")
+}
+
+def get_ensemble_executor(backend: str) -> InferenceExecutor:
+    """Returns the ensemble endpoint's executor for one backend ("spacy" or "bilstm")."""
+    return ensemble_executors[backend]
+
+def _executor_samples(field: str):
+    for executor in (inference_executor, *ensemble_executors.values()):
+        yield (executor.name,), executor.stats()[field]
+
+registry.register(CallbackFamily(
+    "executor_queue_depth", "Accepted jobs waiting for a free worker thread.", ("executor",),
+    lambda: _executor_samples("queue_depth")))
+registry.register(CallbackFamily(
+    "executor_in_flight", "Jobs running or waiting on the executor.", ("executor",),
+    lambda: _executor_samples("in_flight")))
+registry.register(CallbackFamily(
+    "executor_rejected_total", "Jobs rejected because the executor was saturated.", ("executor",),
+    lambda: _executor_samples("rejected"), metric_type="counter"))
+
+def overload_result(error: ExecutorSaturatedError) -> Dict[str, Any]:
+    """Service result returned when a request is rejected because the executor is saturated."""
+    logger.warning("Rejecting request: %s", error)
+    return {
+        "error": "The server is busy processing other requests. Please retry shortly.",
+        "status_code": INFERENCE_OVERLOAD_STATUS_CODE,
+        "headers": {"Retry-After": str(INFERENCE_OVERLOAD_RETRY_AFTER_SECONDS)}
+    }
@@ -0,0 +1,149 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+TEXT_LOG_FORMAT = "%(asctime)s - %(levelname)s - %(request_id)s - %(message)s"
+
+# Per-request context, set by the HTTP middleware in main.py. Executor jobs run in a copy of the
+# caller's context (app/core/executor.py), so their log lines and stage timings keep the request ID.
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+log_sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("log_sampled", default=True)
+request_stages_var: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_stages", default=None)
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current request ID to each record. Must run in the thread that logs, where the request context is."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread.
+    %-style arguments are merged here, while they still hold the values of the event (the caller may
+    change a logged list right after), but unlike QueueHandler the formatter (timestamps, JSON,
+    tracebacks) runs in the listener thread. When the queue is full, records are dropped (and
+    counted) instead of blocking.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra={"fields": {...}} are merged in."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SampledRequestLogger(logging.LoggerAdapter):
+    """
+    Logger for per-request lines (request received, locations extracted, request completed).
+    Records are only created for requests picked by log sampling, so skipped requests pay
+    nothing beyond one context lookup. Warnings and errors should go to the plain logger.
+    """
+    def isEnabledFor(self, level: int) -> bool:
+        return log_sampled_var.get() and self.logger.isEnabledFor(level)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+class _AppStreamHandler(logging.StreamHandler):
+    """Stream handler installed by configure_logging (so it is only installed once)."""
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: str = "INFO", log_format: str = "text", use_queue: bool = True, queue_size: int = 10000) -> None:
+    """
+    Configures the root logger once: a stream handler with text or JSON output, behind a
+    background queue listener when `use_queue` is set.
+    """
+    global _queue_handler, _listener
+    root = logging.getLogger()
+    if any(isinstance(handler, (NonBlockingQueueHandler, _AppStreamHandler)) for handler in root.handlers):
+        return
+
+    stream_handler = _AppStreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_LOG_FORMAT))
+    if use_queue:
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        _queue_handler.addFilter(RequestContextFilter())
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        root.addHandler(_queue_handler)
+    else:
+        stream_handler.addFilter(RequestContextFilter())
+        root.addHandler(stream_handler)
+    root.setLevel(level)
+
+def stop_logging() -> None:
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def dropped_log_records() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+def new_request_id(candidate: Optional[str] = None) -> str:
+    """Returns `candidate` (e.g. an incoming X-Request-ID) if it is a safe ID, or a new random one."""
+    if candidate and _REQUEST_ID_PATTERN.match(candidate):
+        return candidate
+    return uuid.uuid4().hex
+
+def start_request_context(request_id: str, sample_rate: float) -> list:
+    """Sets the request ID, the sampling decision and an empty stage timing dict. Returns reset tokens."""
+    return [
+        request_id_var.set(request_id),
+        log_sampled_var.set(sample_rate >= 1.0 or random.random() < sample_rate),
+        request_stages_var.set({}),
+    ]
+
+def end_request_context(tokens: list) -> None:
+    for var, token in zip((request_id_var, log_sampled_var, request_stages_var), tokens):
+        var.reset(token)
+
+def record_stage_timing(name: str, seconds: float) -> None:
+    """Adds a stage duration to the current request's timings, if there is a request."""
+    stages = request_stages_var.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds * 1000.0
+
+def request_stage_timings() -> Dict[str, Any]:
+    """Stage durations (ms) recorded so far for the current request."""
+    return {name: round(ms, 3) for name, ms in (request_stages_var.get() or {}).items()}
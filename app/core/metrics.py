@@ -0,0 +1,234 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+import psutil
+
+from app.core.logs import record_stage_timing, dropped_log_records
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+LATENCY_BUCKETS_SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram.
+    Bucket counts are cumulative (each bucket counts observations <= its upper bound),
+    with an implicit +Inf bucket holding the total count.
+    """
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1) # Last slot is the +Inf bucket
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns cumulative bucket counts, total count and sum."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[str(bound)] = running
+        running += counts[-1]
+        cumulative["+Inf"] = running
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+# --- Prometheus exposition ---
+# Every metric lives in the process-wide `registry` and is rendered by GET /metrics in the
+# Prometheus text format (version 0.0.4), so any scraper can read it without extra services.
+
+METRIC_PREFIX = "location_extractor_"
+TOKEN_LENGTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+# True while synthetic work (e.g. warmup) runs in the current context, whose samples must not skew production metrics
+_metrics_suppressed: contextvars.ContextVar[bool] = contextvars.ContextVar("metrics_suppressed", default=False)
+
+@contextmanager
+def suppress_metrics():
+    """Drops the counter and histogram samples recorded in the enclosed block (in this thread or task only)."""
+    token = _metrics_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _metrics_suppressed.reset(token)
+
+LabelValues = Tuple[str, ...]
+
+def _escape_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
+
+class CounterFamily:
+    """Monotonic counters, one per combination of label values."""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: float = 1) -> None:
+        if _metrics_suppressed.get():
+            return
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *label_values: Any) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(value) for value in label_values), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class HistogramFamily:
+    """Histograms (see Histogram), one per combination of label values."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS_SECONDS):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[LabelValues, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *label_values: Any) -> Histogram:
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            return histogram
+
+    def attach(self, histogram: Histogram, *label_values: Any) -> None:
+        """Exposes an existing Histogram (e.g. one owned by a MicroBatcher) under these label values."""
+        with self._lock:
+            self._histograms[tuple(str(value) for value in label_values)] = histogram
+
+    def observe(self, *label_values: Any, value: float) -> None:
+        if _metrics_suppressed.get():
+            return
+        self.labels(*label_values).observe(value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        lines = []
+        for key, histogram in histograms:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                bucket_labels = _format_labels(self.label_names, key, 'le="' + bound + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {repr(float(snapshot['sum']))}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {snapshot['count']}")
+        return lines
+
+class CallbackFamily:
+    """
+    Gauge (or counter) whose samples are read at scrape time.
+    `callback` returns (label values, value) pairs, so components expose state they already track.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[Any], float]]], metric_type: str = "gauge"):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.type = metric_type
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in self._callback()]
+
+class MetricsRegistry:
+    """Ordered collection of metric families, rendered together in the Prometheus text format."""
+    def __init__(self):
+        self._families: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, family):
+        """Adds a family and returns it. Registering a name again replaces the previous family."""
+        with self._lock:
+            self._families[family.name] = family
+        return family
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_LATENCY = registry.register(HistogramFamily(
+    "stage_latency_seconds", "Latency of each inference stage, per backend.", ("backend", "stage")))
+REQUESTS = registry.register(CounterFamily(
+    "http_requests_total", "HTTP requests handled, by route and status code.", ("method", "route", "status")))
+REQUEST_ERRORS = registry.register(CounterFamily(
+    "http_request_errors_total", "HTTP requests answered with a 4xx/5xx status, by route and status code.", ("method", "route", "status")))
+REQUEST_LATENCY = registry.register(HistogramFamily(
+    "http_request_duration_seconds", "End-to-end latency of HTTP requests, by route.", ("method", "route")))
+TOKEN_LENGTH = registry.register(HistogramFamily(
+    "input_tokens", "Number of tokens per text given to a model, before truncation.", ("backend",), TOKEN_LENGTH_BUCKETS))
+TRUNCATIONS = registry.register(CounterFamily(
+    "truncations_total", "Texts truncated to the model's maximum sequence length.", ("backend",)))
+DECODE_BATCH_SIZE = registry.register(HistogramFamily(
+    "decode_batch_size", "Sequences per model call (after length bucketing), per backend.", ("backend",), BATCH_SIZE_BUCKETS))
+
+def _process_resident_memory() -> Iterable[Tuple[Sequence[Any], float]]:
+    yield (), psutil.Process().memory_info().rss
+
+registry.register(CallbackFamily(
+    "process_resident_memory_bytes", "Resident set size of this worker process.", (), _process_resident_memory))
+registry.register(CallbackFamily(
+    "log_records_dropped_total", "Log records dropped because the log queue was full.", (),
+    lambda: [((), dropped_log_records())], metric_type="counter"))
+
+def observe_stage(backend: str, stage: str, elapsed: float) -> None:
+    """Records a stage duration (e.g. one timed in a worker process) like stage_timer does."""
+    if not _metrics_suppressed.get():
+        STAGE_LATENCY.observe(backend, stage, value=elapsed)
+        record_stage_timing(f"{backend}.{stage}", elapsed)
+
+@contextmanager
+def stage_timer(backend: str, stage: str):
+    """Times the enclosed block into the stage latency histogram of `backend` and the current request's stage timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(backend, stage, time.perf_counter() - start)
+
+def render_metrics() -> str:
+    """Returns every registered metric in the Prometheus text exposition format."""
+    return registry.render()
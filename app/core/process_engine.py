@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.core.config import (
+    logger, ENABLED_BACKENDS, INFERENCE_PROCESS_WORKERS, INFERENCE_PROCESS_TORCH_THREADS,
+    INFERENCE_PROCESS_QUEUE_LIMIT, INFERENCE_PROCESS_START_TIMEOUT_SECONDS
+)
+from app.core.executor import InferenceExecutor
+from app.core.metrics import registry, CallbackFamily
+
+def available_cpu_count() -> int:
+    """CPUs this process may run on (respects taskset/cgroup CPU affinity where the OS reports it)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # Not available on macOS/Windows
+        return os.cpu_count() or 1
+
+# --- Worker process side ---
+
+_startup_barrier = None
+
+def _init_worker(torch_threads: int, backends: Sequence[str], startup_barrier) -> None:
+    """Runs once in each worker process: pins torch's intra-op thread count, then loads and warms up the model replicas."""
+    global _startup_barrier
+    _startup_barrier = startup_barrier
+    from app.core.config import DEVICE
+    if DEVICE is not None:
+        import torch
+        torch.set_num_threads(torch_threads)
+    from app.core.config import WARMUP_ENABLED
+    from app.models.loaders import load_model, WORKER_BACKENDS
+    for backend in WORKER_BACKENDS: # spaCy first, so the BiLSTM reuses its tokenizer
+        if backend in backends:
+            load_model(backend, WARMUP_ENABLED)
+
+def _worker_ready() -> Dict[str, Any]:
+    """Startup task: waits until every worker has taken one (so each reports once) and returns its status."""
+    from app.core.config import DEVICE
+    from app.models.loaders import get_model_status, get_model_version
+    if _startup_barrier is not None:
+        _startup_barrier.wait(INFERENCE_PROCESS_START_TIMEOUT_SECONDS)
+    backends = get_model_status()
+    status = {"pid": os.getpid(), "backends": backends, "versions": {backend: get_model_version(backend) for backend in backends}}
+    if DEVICE is not None:
+        import torch
+        status["torch_threads"] = torch.get_num_threads()
+    return status
+
+# --- API process side ---
+
+class ProcessInferenceEngine(InferenceExecutor):
+    """
+    Bounded pool of worker processes, each holding its own model replicas.
+    Same contract as InferenceExecutor (run(), saturation with ExecutorSaturatedError, stats(),
+    shutdown()), but jobs must be module-level functions that find their models through the
+    loaders (e.g. spacy_service._extract_batch_in_worker), because models are never sent over IPC:
+    only the texts go to a worker and only the extracted spans come back, pickled.
+    Workers are started with "spawn", so none inherits torch's thread pools from the API process.
+    When a worker dies (e.g. killed for running out of memory), the pool is broken: the jobs it held
+    fail with BrokenProcessPool and a fresh pool is started at once. Its backends are reported as
+    loading until the new workers report their models (see app.models.loaders.record_worker_models).
+    """
+    def __init__(self, max_workers: int = 0, torch_threads: int = 0, queue_limit: int = INFERENCE_PROCESS_QUEUE_LIMIT,
+                 backends: Sequence[str] = ENABLED_BACKENDS, name: str = "process"):
+        cpus = available_cpu_count()
+        super().__init__(max_workers or cpus, queue_limit, name=name)
+        self.torch_threads = torch_threads or max(1, cpus // self.max_workers)
+        self.backends = tuple(backends)
+        self._startup_barrier = None
+        self._restarts = 0
+        self._restart_thread: Optional[threading.Thread] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._startup_barrier = context.Barrier(self.max_workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.torch_threads, self.backends, self._startup_barrier)
+            )
+        return self._pool
+
+    def _submit(self, pool, call: Callable[[], Any]):
+        return pool.submit(call) # Context variables do not cross process boundaries
+
+    def _replace_broken_pool(self, broken_pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is not broken_pool:
+                return # Already replaced by another job that failed with it
+            self._pool = None
+            self._restarts += 1
+        logger.warning("Inference worker pool '%s' is broken (a worker process died); starting new worker processes.", self.name)
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+        from app.models.loaders import mark_worker_models_loading
+        mark_worker_models_loading(self.backends)
+        # Started at once rather than by the next job, which would otherwise wait through the model loads
+        self._restart_thread = threading.Thread(target=self._restart, name=f"{self.name}-restart", daemon=True)
+        self._restart_thread.start()
+
+    def _restart(self) -> None:
+        """Starts the replacement workers and records the status of their models. Blocking."""
+        from app.models.loaders import record_worker_models
+        try:
+            statuses = self.start()
+        except Exception as e:
+            logger.error("Replacement inference workers of '%s' failed to start: %s", self.name, e, exc_info=True)
+            statuses = []
+        record_worker_models(statuses, self.backends)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs fn(*args, **kwargs) in a worker process and awaits its result."""
+        with self._lock:
+            pool = self._get_pool()
+        try:
+            return await super().run(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._replace_broken_pool(pool)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["restarts"] = self._restarts
+        return stats
+
+    def start(self) -> List[Dict[str, Any]]:
+        """
+        Starts every worker process and waits until all of them have loaded their models. Blocking.
+        Returns the status of each worker (pid, backend load status and version, torch threads).
+        """
+        logger.info(
+            "Starting %d inference worker processes with %d torch threads each (backends: %s).",
+            self.max_workers, self.torch_threads, ", ".join(self.backends)
+        )
+        with self._lock:
+            pool = self._get_pool()
+        futures = [pool.submit(_worker_ready) for _ in range(self.max_workers)]
+        statuses = [future.result(timeout=INFERENCE_PROCESS_START_TIMEOUT_SECONDS) for future in futures]
+        for status in statuses:
+            logger.info("Inference worker %s ready: %s", status["pid"], status["backends"])
+        return statuses
+
+    async def run_chunked(self, fn: Callable[..., List[Any]], items: List[Any], *args) -> List[Any]:
+        """
+        Splits `items` into one contiguous chunk per worker, runs fn(chunk, *args) on each in
+        parallel and returns the concatenated results, in input order.
+        """
+        num_chunks = max(1, min(self.max_workers, len(items)))
+        size = -(-len(items) // num_chunks) # Ceiling division
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        results = await asyncio.gather(*(self.run(fn, chunk, *args) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+process_engine: Optional[ProcessInferenceEngine] = None
+
+def get_process_engine() -> ProcessInferenceEngine:
+    """Returns the shared process inference engine, creating it (without starting workers) on first use."""
+    global process_engine
+    if process_engine is None:
+        process_engine = ProcessInferenceEngine(INFERENCE_PROCESS_WORKERS, INFERENCE_PROCESS_TORCH_THREADS)
+    return process_engine
+
+def _process_engine_samples(field: str):
+    if process_engine is not None:
+        yield (process_engine.name,), process_engine.stats()[field]
+
+registry.register(CallbackFamily(
+    "process_engine_queue_depth", "Accepted jobs waiting for a free worker process.", ("executor",),
+    lambda: _process_engine_samples("queue_depth")))
+registry.register(CallbackFamily(
+    "process_engine_rejected_total", "Jobs rejected because every worker process was busy and the queue was full.", ("executor",),
+    lambda: _process_engine_samples("rejected"), metric_type="counter"))
+registry.register(CallbackFamily(
+    "process_engine_restarts_total", "Times the worker pool was replaced because a worker process died.", ("executor",),
+    lambda: _process_engine_samples("restarts"), metric_type="counter"))
@@ -0,0 +1,127 @@
+"""
+Memory-mappable BiLSTM-CRF artifacts.
+
+* Weights: a safetensors file, read with np.memmap. Tensors are views of the mapped file, so the
+  page cache holds one copy of the weights however many worker processes load them.
+* Vocabulary: a marisa-trie of the words plus an int32 array (.npy) mapping each trie key ID to the
+  word's index, both memory-mapped, in place of the pickled word2idx dict.
+
+Export once from the training artifacts:
+    python -m app.models.artifacts                       # .pth (or .npz) weights and ner_word2idx.pkl
+    python -m app.models.artifacts --weights model.pth
+"""
+import argparse
+import json
+import os
+import struct
+from typing import Dict, Iterator, List, Tuple
+
+import marisa_trie
+import numpy as np
+
+# safetensors dtype names -> NumPy dtypes (only the ones a BiLSTM_CRF state dict contains)
+_SAFETENSORS_DTYPES = {"F32": np.float32, "F64": np.float64, "F16": np.float16, "I64": np.int64, "I32": np.int32}
+
+def load_mmap_weights(path: str) -> Dict[str, np.ndarray]:
+    """
+    Maps a safetensors file and returns its tensors as NumPy views of the mapping (no copy).
+    The mapping is copy-on-write: pages stay shared between processes unless a process writes to them.
+    """
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+    data = np.memmap(path, dtype=np.uint8, mode="c", offset=8 + header_size)
+    weights = {}
+    for name, info in header.items():
+        begin, end = info["data_offsets"]
+        weights[name] = data[begin:end].view(_SAFETENSORS_DTYPES[info["dtype"]]).reshape(info["shape"])
+    return weights
+
+def save_weights(state_dict, path: str) -> None:
+    """Writes a BiLSTM_CRF state dict (torch tensors or NumPy arrays) to a safetensors file, as float32."""
+    from safetensors.numpy import save_file
+    arrays = {
+        key: np.ascontiguousarray(value.detach().cpu().float().numpy() if hasattr(value, "detach") else value, dtype=np.float32)
+        for key, value in state_dict.items()
+    }
+    save_file(arrays, path)
+
+class TrieVocab:
+    """
+    Read-only word -> index mapping backed by a memory-mapped marisa-trie.
+    Supports the dict operations the services use (get, [], in, len, items) plus encode() for whole
+    token lists. Lookups cost a trie walk (a few hundred ns) instead of a hash probe.
+    """
+    def __init__(self, trie: marisa_trie.Trie, indices: np.ndarray):
+        self._trie = trie
+        self._indices = indices # trie key ID -> word index
+
+    @classmethod
+    def load(cls, trie_path: str, indices_path: str) -> "TrieVocab":
+        trie = marisa_trie.Trie()
+        trie.mmap(trie_path)
+        return cls(trie, np.load(indices_path, mmap_mode="r"))
+
+    @staticmethod
+    def save(word2idx: Dict[str, int], trie_path: str, indices_path: str) -> None:
+        trie = marisa_trie.Trie(word2idx.keys())
+        indices = np.empty(len(trie), dtype=np.int32)
+        for word, index in word2idx.items():
+            indices[trie[word]] = index
+        trie.save(trie_path)
+        np.save(indices_path, indices)
+
+    def get(self, word: str, default=None):
+        key_id = self._trie.get(word)
+        return default if key_id is None else int(self._indices[key_id])
+
+    def encode(self, words: List[str], default: int) -> List[int]:
+        """Indices of `words`, with `default` for unknown words."""
+        key_ids = np.fromiter((self._trie.get(word, -1) for word in words), dtype=np.int64, count=len(words))
+        return np.where(key_ids >= 0, self._indices[np.maximum(key_ids, 0)], default).tolist()
+
+    def __getitem__(self, word: str) -> int:
+        return int(self._indices[self._trie[word]])
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._trie
+
+    def __len__(self) -> int:
+        return len(self._trie)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        for word, key_id in self._trie.iteritems():
+            yield word, int(self._indices[key_id])
+
+def main():
+    from app.core.config import (
+        WORD2IDX_PATH, MODEL_WEIGHTS_PATH, NUMPY_WEIGHTS_PATH,
+        SAFETENSORS_WEIGHTS_PATH, WORD2IDX_TRIE_PATH, WORD2IDX_TRIE_INDICES_PATH
+    )
+    from app.models.loaders import read_pickled_word2idx
+
+    default_weights = MODEL_WEIGHTS_PATH if os.path.exists(MODEL_WEIGHTS_PATH) else NUMPY_WEIGHTS_PATH
+    parser = argparse.ArgumentParser(description="Export memory-mappable BiLSTM-CRF weights and vocabulary.")
+    parser.add_argument("--weights", default=default_weights, help="PyTorch state dict (.pth) or NumPy export (.npz)")
+    parser.add_argument("--word2idx", default=WORD2IDX_PATH, help="Pickled word2idx dict")
+    args = parser.parse_args()
+
+    word2idx = read_pickled_word2idx(args.word2idx)
+    TrieVocab.save(word2idx, WORD2IDX_TRIE_PATH, WORD2IDX_TRIE_INDICES_PATH)
+    print(f"Exported {len(word2idx)} words from {args.word2idx} to {WORD2IDX_TRIE_PATH}")
+
+    if not os.path.exists(args.weights):
+        print(f"Weights not found at {args.weights}; only the vocabulary was exported.")
+        return
+    if args.weights.endswith(".npz"):
+        with np.load(args.weights) as archive:
+            state_dict = {key: archive[key] for key in archive.files}
+    else:
+        import torch # Only needed for exporting .pth weights
+        state_dict = torch.load(args.weights, map_location="cpu")
+    save_weights(state_dict, SAFETENSORS_WEIGHTS_PATH)
+    print(f"Exported BiLSTM-CRF weights from {args.weights} to {SAFETENSORS_WEIGHTS_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import re
+from typing import Dict, List
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from app.core.config import logger, BILSTM_MAX_SEQ_LEN, PAD_IDX, UNK_TOKEN, UNK_IDX
+from app.models.bilstm import BiLSTM_CRF
+from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+BILSTM_BACKENDS = ("eager", "dynamic_int8", "torchscript", "numpy")
+
+class BiLSTMEmitter(nn.Module):
+    """
+    Emission network of a BiLSTM_CRF (embedding, BiLSTM, hidden2tag) as a standalone,
+    scriptable module. Same computation as BiLSTM_CRF.forward with lengths.
+    """
+    def __init__(self, embedding: nn.Embedding, lstm: nn.LSTM, hidden2tag: nn.Linear):
+        super().__init__()
+        self.embedding = embedding
+        self.lstm = lstm
+        self.hidden2tag = hidden2tag
+
+    def forward(self, word_ids: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+        embed = self.embedding(word_ids)
+        if bool((lengths < word_ids.size(1)).any()):
+            packed = pack_padded_sequence(embed, lengths.cpu(), batch_first=True, enforce_sorted=False)
+            packed_out, _ = self.lstm(packed)
+            lstm_out, _ = pad_packed_sequence(packed_out, batch_first=True, total_length=word_ids.size(1))
+        else:
+            lstm_out, _ = self.lstm(embed)
+        return self.hidden2tag(lstm_out)
+
+class TorchScriptBiLSTM_CRF(nn.Module):
+    """
+    BiLSTM_CRF whose emission network runs as a TorchScript module.
+    The CRF layer and decoding are shared with the eager model.
+    """
+    def __init__(self, model: BiLSTM_CRF):
+        super().__init__()
+        self.emitter = torch.jit.script(BiLSTMEmitter(model.embedding, model.lstm, model.hidden2tag))
+        self.crf = model.crf
+
+    def forward(self, word_ids: torch.Tensor, lengths: torch.Tensor = None) -> torch.Tensor:
+        if lengths is None:
+            lengths = torch.full((word_ids.size(0),), word_ids.size(1), dtype=torch.long)
+        return self.emitter(word_ids, lengths)
+
+    _to_seq_first = BiLSTM_CRF._to_seq_first
+    decode_padded = BiLSTM_CRF.decode_padded
+    viterbi = BiLSTM_CRF.viterbi
+    marginals = BiLSTM_CRF.marginals
+    decode = BiLSTM_CRF.decode
+    decode_with_torchcrf = BiLSTM_CRF.decode_with_torchcrf
+
+def build_inference_model(model: BiLSTM_CRF, backend: str) -> nn.Module:
+    """
+    Returns an inference-ready version of a loaded fp32 BiLSTM_CRF for the given backend:
+    - "eager": the model itself.
+    - "dynamic_int8": dynamic int8 quantization of the nn.LSTM and hidden2tag layers (CPU only).
+    - "torchscript": the emission network compiled with TorchScript.
+    - "numpy": the torch-free NumPy runtime, built from the model's state dict.
+    The returned model exposes the same decode()/decode_padded() interface
+    (with NumPy arrays instead of tensors for "numpy").
+    """
+    if backend == "eager":
+        return model
+    if backend == "dynamic_int8":
+        quantized = torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        return quantized.eval()
+    if backend == "torchscript":
+        return TorchScriptBiLSTM_CRF(model).eval()
+    if backend == "numpy":
+        return NumpyBiLSTM_CRF.from_state_dict(model.state_dict())
+    raise ValueError(f"Unknown BiLSTM inference backend '{backend}'. Expected one of {BILSTM_BACKENDS}.")
+
+def encode_reference_corpus(path: str, word2idx: Dict[str, int]) -> List[List[int]]:
+    """
+    Reads a reference corpus (one sentence per line) and encodes it with word2idx.
+    Uses a simple regex tokenizer so the parity check does not depend on spaCy being loaded.
+    """
+    unk_idx = word2idx.get(UNK_TOKEN, UNK_IDX)
+    sequences = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            tokens = re.findall(r"\w+|[^\w\s]", line)
+            if tokens:
+                sequences.append([word2idx.get(token, unk_idx) for token in tokens[:BILSTM_MAX_SEQ_LEN]])
+    return sequences
+
+def tag_agreement(reference_model: nn.Module, candidate_model: nn.Module,
+                  sequences: List[List[int]], batch_size: int = 32) -> Dict[str, float]:
+    """
+    Decodes the same sequences with both models and compares the predicted tags.
+    Returns the fraction of tokens and of whole sequences on which the candidate agrees with the reference.
+    """
+    agreeing_tokens = total_tokens = agreeing_sequences = 0
+    with torch.no_grad():
+        for start in range(0, len(sequences), batch_size):
+            batch = sequences[start:start + batch_size]
+            max_len = max(len(seq) for seq in batch)
+            word_ids = torch.tensor([seq + [PAD_IDX] * (max_len - len(seq)) for seq in batch], dtype=torch.long)
+            mask = torch.tensor([[1] * len(seq) + [0] * (max_len - len(seq)) for seq in batch], dtype=torch.bool)
+            reference_tags = reference_model.decode(word_ids, mask)
+            if isinstance(candidate_model, NumpyBiLSTM_CRF):
+                candidate_tags = candidate_model.decode(word_ids.numpy(), mask.numpy())
+            else:
+                candidate_tags = candidate_model.decode(word_ids, mask)
+            for expected, actual in zip(reference_tags, candidate_tags):
+                agreeing_tokens += sum(1 for e, a in zip(expected, actual) if e == a)
+                total_tokens += len(expected)
+                agreeing_sequences += int(expected == actual)
+
+    return {
+        "token_agreement": agreeing_tokens / total_tokens if total_tokens else 1.0,
+        "sequence_agreement": agreeing_sequences / len(sequences) if sequences else 1.0,
+        "sequences": len(sequences),
+    }
+
+def check_backend_parity(reference_model: BiLSTM_CRF, candidate_model: nn.Module,
+                         word2idx: Dict[str, int], corpus_path: str, backend: str) -> Dict[str, float]:
+    """Logs and returns the tag agreement of a backend against the fp32 eager model on the reference corpus."""
+    if not os.path.exists(corpus_path):
+        logger.warning("Reference corpus not found at '%s'. Skipping parity check for backend '%s'.", corpus_path, backend)
+        return {}
+    sequences = encode_reference_corpus(corpus_path, word2idx)
+    agreement = tag_agreement(reference_model, candidate_model, sequences)
+    logger.info(
+        "BiLSTM backend '%s' parity vs fp32 eager on %d sentences: token agreement %.4f, sequence agreement %.4f",
+        backend, agreement["sequences"], agreement["token_agreement"], agreement["sequence_agreement"]
+    )
+    return agreement
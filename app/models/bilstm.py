@@ -1,7 +1,9 @@
 import torch
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 from torchcrf import CRF
-from app.core.config import logger 
+from app.core.config import logger
+from app.models.crf import viterbi_decode, crf_marginals
 
 class BiLSTM_CRF(nn.Module):
     """
@@ -12,9 +14,8 @@ class BiLSTM_CRF(nn.Module):
                  dropout_rate=0.3, num_bilstm_layers=1, padding_idx=0):
         super().__init__()
         logger.info(
-            f"Initializing BiLSTM_CRF: vocab_size={vocab_size}, embed_dim={embed_dim}, "
-            f"lstm_units={lstm_units}, num_tags={num_tags}, dropout={dropout_rate}, "
-            f"layers={num_bilstm_layers}, pad_idx={padding_idx}"
+            "Initializing BiLSTM_CRF: vocab_size=%s, embed_dim=%s, lstm_units=%s, num_tags=%s, dropout=%s, layers=%s, pad_idx=%s",
+            vocab_size, embed_dim, lstm_units, num_tags, dropout_rate, num_bilstm_layers, padding_idx
         )
 
         # Embedding layer - maps word indices to embeddings
@@ -45,19 +46,29 @@ class BiLSTM_CRF(nn.Module):
         elif x.dim() == 2: 
             return x.permute(1, 0)
         else:
-            logger.warning(f"Unexpected tensor dimension in _to_seq_first: {x.dim()}")
+            logger.warning("Unexpected tensor dimension in _to_seq_first: %s", x.dim())
             return x
 
 
-    def forward(self, word_ids: torch.Tensor) -> torch.Tensor:
+    def forward(self, word_ids: torch.Tensor, lengths: torch.Tensor = None) -> torch.Tensor:
         """
         Forward pass to get emissions (logits before CRF).
         Input word_ids shape: (batch_size, seq_len)
+        Optional lengths shape: (batch_size,), the number of real tokens of each sequence.
         Output emissions shape: (batch_size, seq_len, num_tags)
+
+        When lengths are given, the LSTM runs on a packed sequence and skips the padding:
+        each sequence gets the same emissions as if it had been run on its own, unpadded.
+        Emissions at padded positions are computed from zero LSTM outputs and are meaningless.
         """
-        embed = self.embedding(word_ids)  
-        lstm_out, _ = self.lstm(embed)    
-        emissions = self.hidden2tag(lstm_out) 
+        embed = self.embedding(word_ids)
+        if lengths is not None and bool((lengths < word_ids.size(1)).any()):
+            packed = pack_padded_sequence(embed, lengths.cpu(), batch_first=True, enforce_sorted=False)
+            packed_out, _ = self.lstm(packed)
+            lstm_out, _ = pad_packed_sequence(packed_out, batch_first=True, total_length=word_ids.size(1))
+        else:
+            lstm_out, _ = self.lstm(embed)
+        emissions = self.hidden2tag(lstm_out)
         return emissions
 
     def compute_loss(self, word_ids: torch.Tensor, tag_ids: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
@@ -83,14 +94,57 @@ class BiLSTM_CRF(nn.Module):
         )
         return loss
 
+    def decode_padded(self, word_ids: torch.Tensor, mask: torch.Tensor, pad_tag: int = 0) -> torch.Tensor:
+        """
+        Viterbi decoding to find the best tag sequence, returned as a padded tensor.
+        word_ids shape: (batch_size, seq_len)
+        mask shape: (batch_size, seq_len), boolean or byte tensor, True for the leading real tokens
+        Returns a (batch_size, seq_len) tensor of tag IDs with `pad_tag` at masked positions.
+        Uses the batched decoder in app/models/crf.py with this model's crf.* weights.
+        """
+        mask = mask.bool() # Ensure mask is boolean
+        emissions = self.forward(word_ids, mask.sum(dim=1)) # (B, L, num_tags)
+        return self.viterbi(emissions, mask, pad_tag=pad_tag)
+
+    def viterbi(self, emissions: torch.Tensor, mask: torch.Tensor, pad_tag: int = 0) -> torch.Tensor:
+        """Batched Viterbi decoding of precomputed emissions with this model's crf.* weights."""
+        return viterbi_decode(
+            emissions,
+            mask.bool(),
+            self.crf.start_transitions,
+            self.crf.end_transitions,
+            self.crf.transitions,
+            pad_tag=pad_tag
+        )
+
+    def marginals(self, emissions: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+        """Per-token tag marginals (forward-backward) of precomputed emissions with this model's crf.* weights."""
+        return crf_marginals(
+            emissions,
+            mask.bool(),
+            self.crf.start_transitions,
+            self.crf.end_transitions,
+            self.crf.transitions
+        )
+
     def decode(self, word_ids: torch.Tensor, mask: torch.Tensor) -> list:
         """
         Viterbi decoding to find the best tag sequence.
         word_ids shape: (batch_size, seq_len)
-        mask shape: (batch_size, seq_len), boolean or byte tensor
+        mask shape: (batch_size, seq_len), boolean or byte tensor, True for the leading real tokens
         Returns a list of lists, where each inner list contains the predicted tag IDs for a sequence.
+        Padding is skipped by the LSTM, so results do not depend on how much a sequence was padded.
+        """
+        tags = self.decode_padded(word_ids, mask)
+        lengths = mask.sum(dim=1).tolist()
+        return [row[:length] for row, length in zip(tags.tolist(), lengths)]
+
+    def decode_with_torchcrf(self, word_ids: torch.Tensor, mask: torch.Tensor) -> list:
+        """
+        Reference decoding through torchcrf.CRF.decode (per-sequence Python backtrace).
+        Same inputs and output as decode(); kept for parity checks.
         """
-        emissions = self.forward(word_ids) # (B, L, num_tags)
+        emissions = self.forward(word_ids, mask.sum(dim=1)) # (B, L, num_tags)
 
         # Permute for CRF layer
         emissions_seq_first = self._to_seq_first(emissions)
@@ -0,0 +1,97 @@
+import torch
+
+def viterbi_decode(emissions: torch.Tensor, mask: torch.Tensor,
+                   start_transitions: torch.Tensor, end_transitions: torch.Tensor,
+                   transitions: torch.Tensor, pad_tag: int = 0) -> torch.Tensor:
+    """
+    Batched Viterbi decoding for a linear-chain CRF.
+    Uses the same parameters and scoring as torchcrf.CRF, but runs both the max-sum
+    forward pass and the backtrace as tensor operations over the whole batch.
+
+    emissions shape: (batch_size, seq_len, num_tags), batch-first
+    mask shape: (batch_size, seq_len), boolean, True for the leading real tokens
+        (the first timestep must be unmasked for every sequence)
+    start_transitions / end_transitions shape: (num_tags,)
+    transitions shape: (num_tags, num_tags), score of moving from tag i to tag j
+    Returns a (batch_size, seq_len) tensor of tag IDs, with `pad_tag` at masked positions.
+    """
+    batch_size, seq_len, num_tags = emissions.shape
+    mask = mask.bool()
+
+    step_emissions = emissions.unsqueeze(2).unbind(1) # seq_len x (B, 1, num_tags)
+    step_masks = mask.unsqueeze(2).unbind(1) # seq_len x (B, 1)
+    # Timesteps where no sequence is padded can skip the masking entirely
+    step_all_valid = mask.all(dim=0).tolist()
+
+    # score[b, j]: best score of a path ending in tag j at the current timestep
+    score = start_transitions + emissions[:, 0]
+    # Masked timesteps keep every tag in place, so the backtrace passes straight through them
+    identity = torch.arange(num_tags, device=emissions.device).expand(batch_size, num_tags)
+    history = []
+
+    for t in range(1, seq_len):
+        # (B, num_tags, 1) + (num_tags, num_tags) + (B, 1, num_tags) -> (B, from_tag, to_tag)
+        next_score, best_previous = (score.unsqueeze(2) + transitions + step_emissions[t]).max(dim=1)
+        if step_all_valid[t]:
+            score = next_score
+            history.append(best_previous)
+        else:
+            score = torch.where(step_masks[t], next_score, score)
+            history.append(torch.where(step_masks[t], best_previous, identity))
+
+    score = score + end_transitions
+    best_last_tag = score.argmax(dim=1)
+
+    current = best_last_tag.unsqueeze(1)
+    backtrace = [current]
+    for t in range(seq_len - 2, -1, -1):
+        current = history[t].gather(1, current)
+        backtrace.append(current)
+    backtrace.reverse()
+
+    tags = torch.cat(backtrace, dim=1)
+    return tags.masked_fill(~mask, pad_tag)
+
+def crf_marginals(emissions: torch.Tensor, mask: torch.Tensor,
+                  start_transitions: torch.Tensor, end_transitions: torch.Tensor,
+                  transitions: torch.Tensor) -> torch.Tensor:
+    """
+    Per-token tag marginals of a linear-chain CRF, by the forward-backward algorithm.
+    Same parameters, shapes and mask convention as viterbi_decode.
+    Returns a (batch_size, seq_len, num_tags) tensor: P(tag j at position t | sequence), summing to 1
+    over the tags at every real position, and 0 at masked positions.
+
+    Runs in probability space with every forward and backward vector renormalized at each step
+    (scaled forward-backward): a marginal is the normalized product of the two vectors, so the
+    scale factors cancel, and each step is one small matmul instead of a log-sum-exp.
+    Scores are shifted by their maximum before exp(), so nothing overflows.
+    """
+    batch_size, seq_len, num_tags = emissions.shape
+    mask = mask.bool()
+    tiny = torch.finfo(emissions.dtype).tiny
+
+    step_potentials = torch.exp(emissions - emissions.amax(dim=2, keepdim=True)).unbind(1) # seq_len x (B, num_tags)
+    transition_potentials = torch.exp(transitions - transitions.max()) # (from_tag, to_tag)
+    step_masks = mask.unsqueeze(2).unbind(1) # seq_len x (B, 1)
+    # Timesteps where no sequence is padded can skip the masking entirely
+    step_all_valid = mask.all(dim=0).tolist()
+
+    def normalize(x: torch.Tensor) -> torch.Tensor:
+        return x / x.sum(dim=-1, keepdim=True).clamp_min(tiny)
+
+    # alpha[t][b, j]: proportional to the summed scores of all paths over positions 0..t that end in tag j
+    alpha = [normalize(torch.exp(start_transitions - start_transitions.max()) * step_potentials[0])]
+    for t in range(1, seq_len):
+        next_alpha = normalize((alpha[-1] @ transition_potentials) * step_potentials[t])
+        alpha.append(next_alpha if step_all_valid[t] else torch.where(step_masks[t], next_alpha, alpha[-1]))
+
+    # beta[t][b, i]: proportional to the summed scores of all continuations from tag i at position t;
+    # the last real position of each sequence only continues with its end transition
+    beta = [normalize(torch.exp(end_transitions - end_transitions.max())).expand(batch_size, num_tags)]
+    for t in range(seq_len - 2, -1, -1):
+        next_beta = normalize((step_potentials[t + 1] * beta[-1]) @ transition_potentials.T)
+        beta.append(next_beta if step_all_valid[t + 1] else torch.where(step_masks[t + 1], next_beta, beta[0]))
+    beta.reverse()
+
+    marginals = normalize(torch.stack(alpha, dim=1) * torch.stack(beta, dim=1)) # (B, L, num_tags)
+    return marginals.masked_fill(~mask.unsqueeze(2), 0.0)
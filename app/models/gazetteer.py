@@ -0,0 +1,145 @@
+"""
+Gazetteer matcher: finds known place names in text without running a model.
+
+Names and texts are split by the same regex tokenizer (runs of word characters, and single
+punctuation marks), so matches always start and end on token boundaries: "Paris" never matches
+inside "Parisian". Tokens are folded with one of FOLDING_MODES and a name is stored as its folded
+tokens joined by spaces, in a marisa-trie that also holds every proper token prefix of a name.
+Matching therefore needs one trie lookup per token, extending a candidate while it is still a prefix.
+The scan keeps the leftmost-longest, non-overlapping matches. It runs in O(text tokens x
+tokens in the longest name), i.e. linear in the input for a given gazetteer.
+
+The trie is saved as a binary index and memory-mapped at load time:
+    python -m app.models.gazetteer data/gazetteer/locations.tsv data/gazetteer/locations.marisa
+"""
+import argparse
+import json
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Tuple
+
+import marisa_trie
+
+from app.services.spans import make_span
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# "none": exact case; "casefold": case-insensitive; "casefold_ascii": also ignores accents (São Paulo = Sao Paulo)
+FOLDING_MODES = ("none", "casefold", "casefold_ascii")
+DEFAULT_LABEL = "LOC"
+
+_PREFIX_MARKER = b"" # Value of keys that are a proper token prefix of at least one name
+_META_KEY = " meta" # Keys of names never start with a space, so this cannot collide with one
+
+def fold_token(token: str, folding: str) -> str:
+    """Normalizes one token for matching according to the folding mode."""
+    if folding == "none":
+        return token
+    token = token.casefold()
+    if folding == "casefold_ascii" and not token.isascii():
+        token = "".join(c for c in unicodedata.normalize("NFKD", token) if not unicodedata.combining(c))
+    return token
+
+def read_gazetteer(path: str) -> List[Tuple[str, str]]:
+    """Reads (name, label) pairs: one name per line, optionally followed by a tab and a label. # starts a comment line."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            name, _, label = line.partition("\t")
+            entries.append((name.strip(), label.strip() or DEFAULT_LABEL))
+    return entries
+
+class GazetteerMatcher:
+    """Compiled gazetteer. Build it from (name, label) pairs, or load a saved index with load()."""
+    def __init__(self, trie: marisa_trie.BytesTrie, folding: str, num_names: int, max_tokens: int):
+        self._trie = trie
+        self.folding = folding
+        self.num_names = num_names
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, str]], folding: str = "casefold") -> "GazetteerMatcher":
+        if folding not in FOLDING_MODES:
+            raise ValueError(f"Unknown gazetteer folding '{folding}'. Expected one of {FOLDING_MODES}.")
+        labels: Dict[str, str] = {}
+        for name, label in entries:
+            tokens = [fold_token(token, folding) for token in TOKEN_PATTERN.findall(name)]
+            if tokens:
+                labels.setdefault(" ".join(tokens), label) # The first label listed for a name wins
+        prefixes = set()
+        for key in labels:
+            tokens = key.split(" ")
+            prefixes.update(" ".join(tokens[:end]) for end in range(1, len(tokens)))
+        max_tokens = max((key.count(" ") + 1 for key in labels), default=0)
+
+        items = [(key, label.encode("utf-8")) for key, label in labels.items()]
+        items += [(prefix, _PREFIX_MARKER) for prefix in prefixes]
+        meta = {"folding": folding, "num_names": len(labels), "max_tokens": max_tokens}
+        items.append((_META_KEY, json.dumps(meta).encode("utf-8")))
+        return cls(marisa_trie.BytesTrie(items), folding, len(labels), max_tokens)
+
+    @classmethod
+    def from_file(cls, path: str, folding: str = "casefold") -> "GazetteerMatcher":
+        return cls.build(read_gazetteer(path), folding)
+
+    @classmethod
+    def load(cls, index_path: str) -> "GazetteerMatcher":
+        """Memory-maps a saved index."""
+        trie = marisa_trie.BytesTrie()
+        trie.mmap(index_path)
+        meta = json.loads(trie[_META_KEY][0])
+        return cls(trie, meta["folding"], meta["num_names"], meta["max_tokens"])
+
+    def save(self, index_path: str) -> None:
+        self._trie.save(index_path)
+
+    def __len__(self) -> int:
+        return self.num_names
+
+    def find(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Location spans of every gazetteer name in `text`, leftmost-longest and non-overlapping, in order.
+        Token indices refer to the gazetteer's own tokenization (TOKEN_PATTERN).
+        """
+        matches = list(TOKEN_PATTERN.finditer(text))
+        keys = [fold_token(match.group(), self.folding) for match in matches]
+        get = self._trie.get
+        spans = []
+        i, num_tokens = 0, len(keys)
+        while i < num_tokens:
+            key, best_end, best_label = keys[i], None, None
+            end = i + 1
+            while True:
+                values = get(key)
+                if values is None:
+                    break
+                label = next((value for value in values if value != _PREFIX_MARKER), None)
+                if label is not None:
+                    best_end, best_label = end, label
+                if end >= num_tokens or end - i >= self.max_tokens or _PREFIX_MARKER not in values:
+                    break
+                key = f"{key} {keys[end]}"
+                end += 1
+            if best_end is None:
+                i += 1
+                continue
+            start_char, end_char = matches[i].start(), matches[best_end - 1].end()
+            spans.append(make_span(start_char, end_char, text[start_char:end_char], best_label.decode("utf-8"), i, best_end))
+            i = best_end
+        return spans
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a gazetteer file into a memory-mappable index.")
+    parser.add_argument("gazetteer", help="One name per line, optionally followed by a tab and a label")
+    parser.add_argument("index", help="Destination index file (.marisa)")
+    parser.add_argument("--folding", choices=FOLDING_MODES, default="casefold_ascii")
+    args = parser.parse_args()
+
+    matcher = GazetteerMatcher.from_file(args.gazetteer, args.folding)
+    matcher.save(args.index)
+    print(f"Indexed {len(matcher)} names from {args.gazetteer} into {args.index} ({args.folding} folding)")
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,302 @@
+import asyncio
+import hashlib
 import os
 import pickle
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 import spacy
-import torch
 
 from app.core.config import (
     logger, DEVICE, SPACY_MODEL_PATH,
     BILSTM_MODEL_DIR, WORD2IDX_PATH, TAG2IDX_PATH, MODEL_WEIGHTS_PATH,
     BILSTM_EMBED_DIM, BILSTM_LSTM_UNITS, BILSTM_DROPOUT, BILSTM_LAYERS,
-    PAD_TOKEN, UNK_TOKEN, PAD_IDX, UNK_IDX
+    PAD_TOKEN, UNK_TOKEN, PAD_IDX, UNK_IDX,
+    BILSTM_INFERENCE_BACKEND, BILSTM_BACKEND_PARITY_CHECK, BILSTM_BACKEND_MIN_TOKEN_AGREEMENT, REFERENCE_CORPUS_PATH,
+    NUMPY_WEIGHTS_PATH, ENABLED_BACKENDS, MODEL_LOADING_MODE, WARMUP_ENABLED, INFERENCE_ENGINE,
+    BILSTM_INPUT_PROJECTION_TABLE, BILSTM_INPUT_PROJECTION_TABLE_CACHE, INPUT_PROJECTION_TABLE_PATH,
+    BILSTM_MMAP_ARTIFACTS, SAFETENSORS_WEIGHTS_PATH, WORD2IDX_TRIE_PATH, WORD2IDX_TRIE_INDICES_PATH,
+    GAZETTEER_PATH, GAZETTEER_INDEX_PATH, GAZETTEER_FOLDING
 )
-from app.models.bilstm import BiLSTM_CRF
+from app.core.cache import get_result_cache, get_sentence_cache
+from app.models.artifacts import TrieVocab, load_mmap_weights
+from app.models.gazetteer import GazetteerMatcher
+from app.models.numpy_bilstm import NumpyBiLSTM_CRF
 
 spacy_nlp = None
+spacy_tokenizer = None # spacy_nlp, or a tokenizer-only spaCy object when the spaCy backend is disabled
 bilstm_crf_model = None
 bilstm_word2idx = None
 bilstm_tag2idx = None
 bilstm_idx2tag = None
+gazetteer_matcher = None
 
-def load_all_models():
+model_status = {backend: "not_loaded" if backend in ENABLED_BACKENDS else "disabled" for backend in ("spacy", "bilstm", "gazetteer")}
+_load_locks = {backend: threading.Lock() for backend in model_status}
+model_versions = {} # backend -> fingerprint of the loaded model files, part of the result cache key
+
+# With INFERENCE_ENGINE = "processes", these backends are loaded by the worker processes only
+WORKER_BACKENDS = ("spacy", "bilstm")
+
+def _select_inference_backend(model, word2idx: dict):
+    """
+    Builds the configured BILSTM_INFERENCE_BACKEND from the loaded fp32 model.
+    Falls back to the fp32 eager model if the backend cannot be built or fails the parity check.
+    """
+    from app.models.backends import build_inference_model, check_backend_parity
+
+    backend = BILSTM_INFERENCE_BACKEND
+    if backend == "eager":
+        return model
+    if backend == "dynamic_int8" and DEVICE.type != "cpu":
+        logger.warning("BiLSTM backend 'dynamic_int8' is CPU only (device is %s). Using 'eager'.", DEVICE)
+        return model
+
+    try:
+        logger.info("Building BiLSTM inference backend '%s'", backend)
+        candidate = build_inference_model(model, backend)
+    except Exception as e_backend:
+        logger.error("ERROR building BiLSTM backend '%s': %s. Using 'eager'.", backend, e_backend, exc_info=True)
+        return model
+
+    if BILSTM_BACKEND_PARITY_CHECK:
+        agreement = check_backend_parity(model, candidate, word2idx, REFERENCE_CORPUS_PATH, backend)
+        if agreement and agreement["token_agreement"] < BILSTM_BACKEND_MIN_TOKEN_AGREEMENT:
+            logger.error(
+                "BiLSTM backend '%s' token agreement %.4f is below BILSTM_BACKEND_MIN_TOKEN_AGREEMENT=%s. Using 'eager'.",
+                backend, agreement["token_agreement"], BILSTM_BACKEND_MIN_TOKEN_AGREEMENT
+            )
+            return model
+
+    logger.info("BiLSTM inference backend '%s' is active.", backend)
+    return candidate
+
+def _load_torch_bilstm(vocab_size: int, num_tags: int, padding_idx: int, weights_path: str):
+    """
+    Builds the PyTorch BiLSTM_CRF and loads its weights. Safetensors weights are assigned as
+    parameters without copying, so they stay backed by the shared file mapping.
+    """
+    import torch
+    from app.models.bilstm import BiLSTM_CRF
+
+    model = BiLSTM_CRF(
+        vocab_size=vocab_size,
+        embed_dim=BILSTM_EMBED_DIM,
+        lstm_units=BILSTM_LSTM_UNITS,
+        num_tags=num_tags,
+        dropout_rate=BILSTM_DROPOUT,
+        num_bilstm_layers=BILSTM_LAYERS,
+        padding_idx=padding_idx
+    )
+
+    logger.info("Loading model weights from %s", weights_path)
+    if weights_path.endswith(".safetensors"):
+        state_dict = {key: torch.from_numpy(value) for key, value in load_mmap_weights(weights_path).items()}
+        model.load_state_dict(state_dict, assign=True)
+        model.to(DEVICE) # No-op on CPU, so the parameters keep pointing into the mapping
+    else:
+        model.to(DEVICE)
+        model.load_state_dict(torch.load(weights_path, map_location=DEVICE))
+    model.eval()
+
+    logger.info("BiLSTM-CRF model loaded successfully and moved to device: %s.", DEVICE)
+    return model
+
+def _load_numpy_bilstm(vocab_size: int, num_tags: int, weights_path: str) -> NumpyBiLSTM_CRF:
+    """
+    Loads the torch-free NumPy BiLSTM-CRF runtime from its exported weight file. With safetensors
+    weights, the embedding table (the bulk of the model) stays a view of the shared file mapping.
+    """
+    logger.info("Loading NumPy BiLSTM-CRF weights from %s", weights_path)
+    if weights_path.endswith(".safetensors"):
+        model = NumpyBiLSTM_CRF(load_mmap_weights(weights_path))
+    else:
+        model = NumpyBiLSTM_CRF.load(weights_path)
+    if model.embedding.shape[0] != vocab_size or model.transitions.shape[0] != num_tags:
+        raise RuntimeError(
+            f"NumPy weights have vocab_size={model.embedding.shape[0]}, num_tags={model.transitions.shape[0]}; "
+            f"mappings have vocab_size={vocab_size}, num_tags={num_tags}."
+        )
+    if BILSTM_INPUT_PROJECTION_TABLE:
+        attach_input_projection_table(model, weights_path)
+    logger.info("NumPy BiLSTM-CRF model loaded successfully.")
+    return model
+
+def _read_fingerprint(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def attach_input_projection_table(model: NumpyBiLSTM_CRF, weights_path: Optional[str] = None,
+                                  cache_path: Optional[str] = INPUT_PROJECTION_TABLE_PATH) -> None:
+    """
+    Gives the NumPy runtime its first-layer input projection table. A cached table at `cache_path` is
+    memory-mapped if the fingerprint saved next to it (`<cache_path>.fingerprint`) is that of `weights_path`
+    and it has the model's shape; otherwise the table is built from the weights and, when caching is on,
+    saved there with the fingerprint for the next start.
+    """
+    expected_shape = (model.embedding.shape[0], 8 * model.hidden_size)
+    use_cache = BILSTM_INPUT_PROJECTION_TABLE_CACHE and cache_path is not None
+    fingerprint = _files_fingerprint([weights_path] if weights_path is not None else [])
+    fingerprint_path = f"{cache_path}.fingerprint"
+    if use_cache and os.path.exists(cache_path):
+        if _read_fingerprint(fingerprint_path) != fingerprint:
+            logger.info("Input projection table at %s was built from other weights; rebuilding it.", cache_path)
+        else:
+            table = np.load(cache_path, mmap_mode="r")
+            if table.shape == expected_shape and table.dtype == np.float32:
+                logger.info("Memory-mapped the BiLSTM input projection table from %s", cache_path)
+                model.use_input_projection_table(table)
+                return
+            logger.warning("Input projection table at %s has shape %s; rebuilding it.", cache_path, table.shape)
+
+    start = time.perf_counter()
+    table = model.input_projection_table()
+    logger.info("Built the BiLSTM input projection table %s in %.2fs", table.shape, time.perf_counter() - start)
+    if use_cache:
+        try:
+            if os.path.exists(fingerprint_path):
+                os.remove(fingerprint_path) # A table left half-written is never taken for current
+            np.save(cache_path, table)
+            with open(fingerprint_path, "w", encoding="utf-8") as f:
+                f.write(fingerprint)
+        except OSError as e_save:
+            logger.warning("Could not cache the input projection table at %s: %s", cache_path, e_save)
+    model.use_input_projection_table(table)
+
+def _load_spacy_tokenizer():
     """
-    Loads the spaCy and BiLSTM-CRF models and their associated mappings.
-    This function is intended to be called at application startup.
+    Loads the spaCy model with every pipeline component excluded. The result tokenizes exactly like
+    the full pipeline (same tokenizer rules and vocab) but skips loading the NER weights.
     """
-    global spacy_nlp, bilstm_crf_model, bilstm_word2idx, bilstm_tag2idx, bilstm_idx2tag
+    pipeline = spacy.util.load_config(os.path.join(SPACY_MODEL_PATH, "config.cfg"))["nlp"]["pipeline"]
+    return spacy.load(SPACY_MODEL_PATH, exclude=list(pipeline))
+
+def load_spacy_model():
+    """Loads the full spaCy pipeline used by the spaCy backend."""
+    global spacy_nlp
 
     logger.info("--- Attempting to load spaCy model ---")
     try:
         if os.path.exists(SPACY_MODEL_PATH) and os.path.isdir(SPACY_MODEL_PATH):
-            logger.info(f"Loading spaCy model from '{SPACY_MODEL_PATH}'...")
+            logger.info("Loading spaCy model from '%s'...", SPACY_MODEL_PATH)
             spacy_nlp = spacy.load(SPACY_MODEL_PATH)
             logger.info("SpaCy model loaded successfully.")
         else:
-            logger.warning(f"SpaCy model directory not found at '{SPACY_MODEL_PATH}'. SpaCy functionality will be disabled.")
+            logger.warning("SpaCy model directory not found at '%s'. SpaCy functionality will be disabled.", SPACY_MODEL_PATH)
             spacy_nlp = None
     except Exception as e_spacy_load:
-        logger.error(f"CRITICAL ERROR loading spaCy model: {e_spacy_load}", exc_info=True)
+        logger.error("CRITICAL ERROR loading spaCy model: %s", e_spacy_load, exc_info=True)
         spacy_nlp = None
+    return spacy_nlp
+
+def _bilstm_artifact_paths() -> Tuple[str, List[str]]:
+    """
+    The weights file and vocabulary files the BiLSTM backend loads: the memory-mappable artifacts
+    when they have been exported (and BILSTM_MMAP_ARTIFACTS is on), else the original files.
+    """
+    if BILSTM_MMAP_ARTIFACTS and os.path.exists(SAFETENSORS_WEIGHTS_PATH):
+        weights_path = SAFETENSORS_WEIGHTS_PATH
+    else:
+        weights_path = NUMPY_WEIGHTS_PATH if BILSTM_INFERENCE_BACKEND == "numpy" else MODEL_WEIGHTS_PATH
+    trie_paths = [WORD2IDX_TRIE_PATH, WORD2IDX_TRIE_INDICES_PATH]
+    if BILSTM_MMAP_ARTIFACTS and all(os.path.exists(path) for path in trie_paths):
+        return weights_path, trie_paths
+    return weights_path, [WORD2IDX_PATH]
+
+def read_pickled_word2idx(path: str = WORD2IDX_PATH) -> dict:
+    """Unpickles a word2idx dict and makes sure PAD_TOKEN and UNK_TOKEN sit at PAD_IDX and UNK_IDX."""
+    logger.info("Loading word2idx from %s", path)
+    with open(path, 'rb') as f:
+        word2idx = pickle.load(f)
+
+    if PAD_TOKEN not in word2idx or word2idx[PAD_TOKEN] != PAD_IDX:
+        logger.warning(
+            "'%s' not found at index %s in word2idx or index mismatch. Current: %s. Forcing %s to %s.",
+            PAD_TOKEN, PAD_IDX, word2idx.get(PAD_TOKEN), PAD_TOKEN, PAD_IDX
+        )
+        word2idx[PAD_TOKEN] = PAD_IDX
+
+    if UNK_TOKEN not in word2idx or word2idx[UNK_TOKEN] != UNK_IDX:
+        logger.warning(
+            "'%s' not found at index %s in word2idx or index mismatch. Current: %s. Forcing %s to %s.",
+            UNK_TOKEN, UNK_IDX, word2idx.get(UNK_TOKEN), UNK_TOKEN, UNK_IDX
+        )
+        current_token_at_unk_idx = next((token for token, idx in word2idx.items() if idx == UNK_IDX and token != UNK_TOKEN), None)
+        if current_token_at_unk_idx:
+             logger.error("Index %s intended for '%s' is already taken by '%s'. This is a critical issue.", UNK_IDX, UNK_TOKEN, current_token_at_unk_idx)
+        word2idx[UNK_TOKEN] = UNK_IDX
+    return word2idx
+
+def _load_word2idx(vocab_paths: List[str]):
+    """Loads the memory-mapped TrieVocab (exported from a checked dict) or the pickled word2idx."""
+    if vocab_paths == [WORD2IDX_PATH]:
+        return read_pickled_word2idx(WORD2IDX_PATH)
+    logger.info("Memory-mapping word2idx from %s", vocab_paths[0])
+    word2idx = TrieVocab.load(*vocab_paths)
+    if word2idx.get(PAD_TOKEN) != PAD_IDX or word2idx.get(UNK_TOKEN) != UNK_IDX:
+        raise RuntimeError(f"{vocab_paths[0]} does not map {PAD_TOKEN}/{UNK_TOKEN} to {PAD_IDX}/{UNK_IDX}. Export it again.")
+    return word2idx
+
+def _shared_spacy_tokenizer():
+    """The spaCy object the BiLSTM tokenizes with: the full pipeline when there is one, else a tokenizer-only load."""
+    if "spacy" in ENABLED_BACKENDS and MODEL_LOADING_MODE != "lazy":
+        load_model("spacy", WARMUP_ENABLED) # Waits for a load in progress; a no-op once it is done
+    if spacy_nlp is not None:
+        return spacy_nlp
+    logger.info("Loading tokenizer-only spaCy object from '%s' for BiLSTM preprocessing...", SPACY_MODEL_PATH)
+    return _load_spacy_tokenizer()
+
+def load_bilstm_model():
+    """
+    Loads the BiLSTM-CRF model, its mappings and the spaCy tokenizer it needs for preprocessing.
+    When the spaCy backend is enabled (outside lazy mode), the BiLSTM waits for its load, or loads it,
+    and shares its pipeline; in parallel mode spaCy is usually still loading at that point. Otherwise
+    the full pipeline is reused if it is already loaded, and a tokenizer-only spaCy object is loaded if not.
+    """
+    global spacy_tokenizer, bilstm_crf_model, bilstm_word2idx, bilstm_tag2idx, bilstm_idx2tag
 
     logger.info("--- Attempting to load BiLSTM-CRF model ---")
     try:
-        required_files = [WORD2IDX_PATH, TAG2IDX_PATH, MODEL_WEIGHTS_PATH]
+        weights_path, vocab_paths = _bilstm_artifact_paths()
+        required_files = [*vocab_paths, TAG2IDX_PATH, weights_path]
         if not all(os.path.exists(f) for f in required_files):
             missing = [f for f in required_files if not os.path.exists(f)]
             raise FileNotFoundError(f"Missing BiLSTM model files: {missing}. Searched in '{BILSTM_MODEL_DIR}'")
 
-        logger.info(f"Loading word2idx from {WORD2IDX_PATH}")
-        with open(WORD2IDX_PATH, 'rb') as f:
-            bilstm_word2idx = pickle.load(f)
-        logger.info(f"Loading tag2idx from {TAG2IDX_PATH}")
+        bilstm_word2idx = _load_word2idx(vocab_paths)
+        logger.info("Loading tag2idx from %s", TAG2IDX_PATH)
         with open(TAG2IDX_PATH, 'rb') as f:
             bilstm_tag2idx = pickle.load(f)
 
-        if PAD_TOKEN not in bilstm_word2idx or bilstm_word2idx[PAD_TOKEN] != PAD_IDX:
-            logger.warning(
-                f"'{PAD_TOKEN}' not found at index {PAD_IDX} in word2idx or index mismatch. "
-                f"Current: {bilstm_word2idx.get(PAD_TOKEN)}. Forcing {PAD_TOKEN} to {PAD_IDX}."
-            )
-            bilstm_word2idx[PAD_TOKEN] = PAD_IDX
-        
-        if UNK_TOKEN not in bilstm_word2idx or bilstm_word2idx[UNK_TOKEN] != UNK_IDX:
-            logger.warning(
-                f"'{UNK_TOKEN}' not found at index {UNK_IDX} in word2idx or index mismatch. "
-                f"Current: {bilstm_word2idx.get(UNK_TOKEN)}. Forcing {UNK_TOKEN} to {UNK_IDX}."
-            )
-            current_token_at_unk_idx = next((token for token, idx in bilstm_word2idx.items() if idx == UNK_IDX and token != UNK_TOKEN), None)
-            if current_token_at_unk_idx:
-                 logger.error(f"Index {UNK_IDX} intended for '{UNK_TOKEN}' is already taken by '{current_token_at_unk_idx}'. This is a critical issue.")
-            bilstm_word2idx[UNK_TOKEN] = UNK_IDX
-
         bilstm_idx2tag = {idx: tag for tag, idx in bilstm_tag2idx.items()}
-        logger.info(f"Created idx2tag mapping. Found {len(bilstm_idx2tag)} tags.")
+        logger.info("Created idx2tag mapping. Found %d tags.", len(bilstm_idx2tag))
 
         vocab_size = len(bilstm_word2idx)
         num_tags = len(bilstm_tag2idx)
-        logger.info(f"BiLSTM Params: vocab_size={vocab_size}, num_tags={num_tags}")
-
-        bilstm_crf_model = BiLSTM_CRF(
-            vocab_size=vocab_size,
-            embed_dim=BILSTM_EMBED_DIM,
-            lstm_units=BILSTM_LSTM_UNITS,
-            num_tags=num_tags,
-            dropout_rate=BILSTM_DROPOUT,
-            num_bilstm_layers=BILSTM_LAYERS,
-            padding_idx=bilstm_word2idx.get(PAD_TOKEN, PAD_IDX) 
-        )
+        logger.info("BiLSTM Params: vocab_size=%d, num_tags=%d", vocab_size, num_tags)
 
-        logger.info(f"Loading model weights from {MODEL_WEIGHTS_PATH}")
-        bilstm_crf_model.to(DEVICE)
-        bilstm_crf_model.load_state_dict(torch.load(MODEL_WEIGHTS_PATH, map_location=DEVICE))
-        bilstm_crf_model.eval()
+        if BILSTM_INFERENCE_BACKEND == "numpy":
+            bilstm_crf_model = _load_numpy_bilstm(vocab_size, num_tags, weights_path)
+        else:
+            bilstm_crf_model = _load_torch_bilstm(vocab_size, num_tags, bilstm_word2idx.get(PAD_TOKEN, PAD_IDX), weights_path)
+            bilstm_crf_model = _select_inference_backend(bilstm_crf_model, bilstm_word2idx)
 
-        logger.info("BiLSTM-CRF model loaded successfully and moved to device: %s.", DEVICE)
+        # Last, so the BiLSTM files load while spaCy is still loading in parallel mode
+        spacy_tokenizer = _shared_spacy_tokenizer()
 
     except FileNotFoundError as e_bilstm_file:
-        logger.error(f"ERROR loading BiLSTM model (file not found): {e_bilstm_file}")
+        logger.error("ERROR loading BiLSTM model (file not found): %s", e_bilstm_file)
         bilstm_crf_model = None
     except pickle.UnpicklingError as e_pickle:
-        logger.error(f"ERROR loading BiLSTM mappings (pickle error): {e_pickle}", exc_info=True)
+        logger.error("ERROR loading BiLSTM mappings (pickle error): %s", e_pickle, exc_info=True)
         bilstm_crf_model = None
     except RuntimeError as e_runtime:
-        logger.error(f"CRITICAL RUNTIME ERROR loading BiLSTM-CRF model state_dict: {e_runtime}", exc_info=True)
+        logger.error("CRITICAL RUNTIME ERROR loading BiLSTM-CRF model state_dict: %s", e_runtime, exc_info=True)
         logger.error(
             "This often indicates a mismatch between the saved model's architecture "
             "(hyperparameters like embed_dim, lstm_units, num_layers, num_tags) "
@@ -108,23 +305,208 @@ def load_all_models():
         )
         bilstm_crf_model = None
     except Exception as e_bilstm_load:
-        logger.error(f"CRITICAL ERROR loading BiLSTM-CRF model: {e_bilstm_load}", exc_info=True)
+        logger.error("CRITICAL ERROR loading BiLSTM-CRF model: %s", e_bilstm_load, exc_info=True)
         bilstm_crf_model = None
+    return bilstm_crf_model
+
+def _gazetteer_index_is_current() -> bool:
+    if not os.path.exists(GAZETTEER_INDEX_PATH):
+        return False
+    return not os.path.exists(GAZETTEER_PATH) or os.path.getmtime(GAZETTEER_INDEX_PATH) >= os.path.getmtime(GAZETTEER_PATH)
+
+def load_gazetteer():
+    """
+    Loads the gazetteer matcher by memory-mapping its prebuilt index. The index is built from the
+    gazetteer file first if it is missing, stale or was built with another GAZETTEER_FOLDING.
+    """
+    global gazetteer_matcher
 
-    if not spacy_nlp and not bilstm_crf_model:
+    logger.info("--- Attempting to load gazetteer ---")
+    try:
+        matcher = GazetteerMatcher.load(GAZETTEER_INDEX_PATH) if _gazetteer_index_is_current() else None
+        if matcher is None or matcher.folding != GAZETTEER_FOLDING:
+            logger.info("Building gazetteer index %s from %s", GAZETTEER_INDEX_PATH, GAZETTEER_PATH)
+            matcher = GazetteerMatcher.from_file(GAZETTEER_PATH, GAZETTEER_FOLDING)
+            try:
+                matcher.save(GAZETTEER_INDEX_PATH)
+            except OSError as e_save:
+                logger.warning("Could not save the gazetteer index (%s). Using the in-memory index.", e_save)
+        gazetteer_matcher = matcher
+        logger.info("Gazetteer loaded: %d names, '%s' folding.", len(matcher), matcher.folding)
+    except FileNotFoundError as e_gazetteer_file:
+        logger.error("ERROR loading gazetteer (file not found): %s", e_gazetteer_file)
+        gazetteer_matcher = None
+    except Exception as e_gazetteer_load:
+        logger.error("CRITICAL ERROR loading gazetteer: %s", e_gazetteer_load, exc_info=True)
+        gazetteer_matcher = None
+    return gazetteer_matcher
+
+def _files_fingerprint(paths: List[str], *extra: str) -> str:
+    """Short hash of the files' paths, sizes and modification times (plus any extra settings)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    for value in extra:
+        digest.update(value.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def _model_version(backend: str) -> str:
+    if backend == "spacy":
+        model_files = [
+            os.path.join(root, name)
+            for root, _, names in sorted(os.walk(SPACY_MODEL_PATH)) if "__pycache__" not in root
+            for name in sorted(names)
+        ]
+        return _files_fingerprint(model_files)
+    if backend == "gazetteer":
+        return _files_fingerprint([path for path in (GAZETTEER_PATH, GAZETTEER_INDEX_PATH) if os.path.exists(path)], GAZETTEER_FOLDING)
+    weights_path, vocab_paths = _bilstm_artifact_paths()
+    return _files_fingerprint([*vocab_paths, TAG2IDX_PATH, weights_path], BILSTM_INFERENCE_BACKEND)
+
+_BACKEND_LOADERS = {"spacy": load_spacy_model, "bilstm": load_bilstm_model, "gazetteer": load_gazetteer}
+
+def load_model(backend: str, warm_up: bool = False):
+    """
+    Loads one backend ("spacy", "bilstm" or "gazetteer") and records its status. Thread-safe and idempotent:
+    concurrent callers wait for the first load, and a backend is loaded at most once.
+    With `warm_up`, the loaded backend is "warming_up" until app/services/warmup.py has run it, then "ready".
+    """
+    if backend not in ENABLED_BACKENDS:
+        return None
+    with _load_locks[backend]:
+        if model_status[backend] == "not_loaded":
+            model_status[backend] = "loading"
+            started = time.perf_counter()
+            previous_version = model_versions.pop(backend, None)
+            loaded = _BACKEND_LOADERS[backend]()
+            if loaded is not None and warm_up:
+                model_status[backend] = "warming_up"
+                from app.services.warmup import warm_up as run_warmup # The services import this module
+                run_warmup(backend)
+            model_status[backend] = "ready" if loaded is not None else "failed"
+            if previous_version is not None:
+                # Results cached for the previous load of this backend must not be served for the new one
+                get_result_cache().invalidate(backend)
+                get_sentence_cache().invalidate(backend)
+            if loaded is not None:
+                model_versions[backend] = _model_version(backend)
+            logger.info("Backend '%s' is %s after %.2fs.", backend, model_status[backend], time.perf_counter() - started)
+    return _BACKEND_GETTERS[backend]()
+
+def reload_model(backend: str, warm_up: bool = False):
+    """Loads a backend again (e.g. after its model files were replaced) and invalidates its cached results."""
+    with _load_locks[backend]:
+        if model_status[backend] != "disabled":
+            model_status[backend] = "not_loaded"
+    return load_model(backend, warm_up)
+
+def _loaded_in_this_process(backend: str) -> bool:
+    return INFERENCE_ENGINE != "processes" or backend not in WORKER_BACKENDS
+
+def load_all_models():
+    """
+    Loads the enabled backends one after the other, spaCy first so the BiLSTM can reuse its tokenizer.
+    This function is intended to be called at application startup. With the process engine, the
+    spaCy and BiLSTM-CRF models are left to the worker processes.
+    """
+    backends = [backend for backend in ("spacy", "bilstm", "gazetteer") if _loaded_in_this_process(backend)]
+    for backend in backends:
+        load_model(backend, WARMUP_ENABLED)
+
+    if INFERENCE_ENGINE == "processes":
+        logger.info("Model loading sequence finished for %s; spaCy and BiLSTM-CRF load in the worker processes.", backends)
+    elif not spacy_nlp and not bilstm_crf_model:
         logger.warning("WARNING: NO MODELS WERE LOADED SUCCESSFULLY.")
-    elif not spacy_nlp:
+    elif not spacy_nlp and "spacy" in ENABLED_BACKENDS:
         logger.warning("WARNING: SpaCy model failed to load.")
-    elif not bilstm_crf_model:
+    elif not bilstm_crf_model and "bilstm" in ENABLED_BACKENDS:
         logger.warning("WARNING: BiLSTM-CRF model failed to load.")
     else:
-        logger.info("Model loading sequence finished. Both spaCy and BiLSTM-CRF models appear ready.")
+        logger.info("Model loading sequence finished. Enabled backends %s appear ready.", ENABLED_BACKENDS)
+
+def start_model_loading() -> List[threading.Thread]:
+    """
+    Starts loading the enabled backends according to MODEL_LOADING_MODE:
+    "sequential" loads them before returning, "parallel" loads each in its own background thread
+    (the returned threads), and "lazy" loads nothing until a backend's first request.
+    Except in lazy mode, each backend is warmed up before it is ready (WARMUP_ENABLED).
+    With the process engine, only the backends outside WORKER_BACKENDS are loaded here.
+    """
+    logger.info("Model loading mode '%s' for backends %s", MODEL_LOADING_MODE, ENABLED_BACKENDS)
+    if MODEL_LOADING_MODE == "sequential":
+        load_all_models()
+        return []
+    if MODEL_LOADING_MODE == "lazy":
+        return []
+
+    threads = [
+        threading.Thread(target=load_model, args=(backend, WARMUP_ENABLED), name=f"load-{backend}", daemon=True)
+        for backend in ENABLED_BACKENDS if _loaded_in_this_process(backend)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+async def ensure_model_loaded(backend: str) -> None:
+    """
+    Lazy loading: loads a backend on its first request, in a worker thread so the event loop keeps running.
+    Does nothing in the eager loading modes, where requests made during loading get a 503 instead.
+    """
+    if MODEL_LOADING_MODE == "lazy" and model_status.get(backend) in ("not_loaded", "loading") and _loaded_in_this_process(backend):
+        await asyncio.to_thread(load_model, backend)
+
+def mark_worker_models_loading(backends: Sequence[str] = WORKER_BACKENDS) -> None:
+    """Process engine: reports the worker backends as loading while a new pool of worker processes starts."""
+    for backend in backends:
+        if backend in WORKER_BACKENDS and model_status[backend] != "disabled":
+            model_status[backend] = "loading"
+            model_versions.pop(backend, None)
+
+def record_worker_models(worker_statuses: List[Dict], backends: Sequence[str] = WORKER_BACKENDS) -> None:
+    """
+    Process engine: records the status and version of the worker backends from the statuses the
+    workers reported at startup (see ProcessInferenceEngine.start), since this process does not load them.
+    A backend is ready only if every worker loaded it; with no statuses (the workers did not start), it failed.
+    """
+    for backend in backends:
+        if backend not in WORKER_BACKENDS or model_status[backend] == "disabled":
+            continue
+        statuses = {status["backends"][backend] for status in worker_statuses}
+        model_status[backend] = "ready" if statuses == {"ready"} else "failed"
+        versions = {status["versions"].get(backend) for status in worker_statuses}
+        if model_status[backend] == "ready" and len(versions) == 1:
+            model_versions[backend] = versions.pop()
+        else:
+            model_versions.pop(backend, None)
+        logger.info("Backend '%s' is %s in the inference worker processes.", backend, model_status[backend])
+
+def is_served_by_workers(backend: str) -> bool:
+    """True if the backend is ready in the inference worker processes rather than in this process (process engine)."""
+    return INFERENCE_ENGINE == "processes" and backend in WORKER_BACKENDS and model_status[backend] == "ready"
+
+def is_backend_usable(backend: str) -> bool:
+    """True if the backend can serve requests now, or will load on its first request in lazy mode."""
+    status = model_status.get(backend)
+    return status == "ready" or (MODEL_LOADING_MODE == "lazy" and status in ("not_loaded", "loading"))
+
+def get_model_version(backend: str) -> Optional[str]:
+    """Returns the version fingerprint of a loaded backend, or None if it is not loaded."""
+    return model_versions.get(backend)
+
+def get_model_status() -> Dict[str, str]:
+    """Returns the load status of each backend: disabled, not_loaded, loading, warming_up, ready or failed."""
+    return dict(model_status)
 
 # Functions to safely access loaded models/mappings
 def get_spacy_nlp():
     """Returns the loaded spaCy NLP object."""
     return spacy_nlp
 
+def get_spacy_tokenizer():
+    """Returns the spaCy object whose tokenizer is used for BiLSTM preprocessing."""
+    return spacy_tokenizer
+
 def get_bilstm_model():
     """Returns the loaded BiLSTM-CRF model object."""
     return bilstm_crf_model
@@ -140,3 +522,9 @@ def get_bilstm_idx2tag():
 def get_bilstm_tag2idx():
     """Returns the tag_to_index mapping for the BiLSTM model."""
     return bilstm_tag2idx
+
+def get_gazetteer():
+    """Returns the loaded gazetteer matcher."""
+    return gazetteer_matcher
+
+_BACKEND_GETTERS = {"spacy": get_spacy_nlp, "bilstm": get_bilstm_model, "gazetteer": get_gazetteer}
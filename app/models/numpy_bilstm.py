@@ -0,0 +1,232 @@
+"""
+Torch-free NumPy runtime for the BiLSTM-CRF model.
+
+The weights of a trained BiLSTM_CRF are exported once (with torch) to a flat .npz
+array file; at serving time NumpyBiLSTM_CRF runs the embedding lookup, the
+bidirectional LSTM stack, hidden2tag and Viterbi decoding with NumPy only.
+
+The first LSTM layer's input projection, W_ih @ embedding(word) + biases, only depends on the word.
+With an input projection table (one row per vocabulary entry, both directions), the embedding
+lookup and the first layer's input GEMM become a single row gather.
+
+Export:
+    python -m app.models.numpy_bilstm <weights.pth> <weights.npz>
+"""
+import argparse
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(x.sum(axis=-1, keepdims=True), np.finfo(x.dtype).tiny)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # tanh form avoids overflow warnings from np.exp on large negative inputs
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+class NumpyBiLSTM_CRF:
+    """
+    NumPy re-implementation of BiLSTM_CRF inference.
+    Takes the same state-dict keys as the PyTorch model and decodes with the same
+    semantics as BiLSTM_CRF.decode: padding is skipped (packed-sequence behaviour),
+    and the Viterbi decoder uses the crf.* transition weights.
+    """
+    def __init__(self, weights: Dict[str, np.ndarray]):
+        self.embedding = np.ascontiguousarray(weights["embedding.weight"], dtype=np.float32)
+        self.num_layers = len([key for key in weights if re.fullmatch(r"lstm\.weight_ih_l\d+", key)])
+        self.hidden_size = weights["lstm.weight_hh_l0"].shape[1]
+
+        # PyTorch stores the gates as (input, forget, cell, output); reorder them to
+        # (input, forget, output, cell) so the three sigmoid gates are one contiguous block.
+        hidden = self.hidden_size
+        gate_order = np.concatenate([np.arange(0, 2 * hidden), np.arange(3 * hidden, 4 * hidden), np.arange(2 * hidden, 3 * hidden)])
+
+        # Per layer and direction: input weights transposed for x @ W, recurrent weights, and the summed biases
+        self.layers = []
+        for layer in range(self.num_layers):
+            directions = []
+            for suffix in ("", "_reverse"):
+                w_ih = weights[f"lstm.weight_ih_l{layer}{suffix}"].astype(np.float32)[gate_order]
+                w_hh = weights[f"lstm.weight_hh_l{layer}{suffix}"].astype(np.float32)[gate_order]
+                bias = (weights[f"lstm.bias_ih_l{layer}{suffix}"] + weights[f"lstm.bias_hh_l{layer}{suffix}"]).astype(np.float32)[gate_order]
+                directions.append((np.ascontiguousarray(w_ih.T), np.ascontiguousarray(w_hh.T), bias))
+            self.layers.append(directions)
+
+        self.hidden2tag_weight = np.ascontiguousarray(weights["hidden2tag.weight"].T, dtype=np.float32)
+        self.hidden2tag_bias = weights["hidden2tag.bias"].astype(np.float32)
+        self.start_transitions = weights["crf.start_transitions"].astype(np.float32)
+        self.end_transitions = weights["crf.end_transitions"].astype(np.float32)
+        self.transitions = weights["crf.transitions"].astype(np.float32)
+        self.input_table: Optional[np.ndarray] = None # (vocab_size, 8 * hidden), see use_input_projection_table
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyBiLSTM_CRF":
+        """Loads a model from an .npz file written by export_bilstm_weights."""
+        with np.load(path) as archive:
+            return cls({key: archive[key] for key in archive.files})
+
+    @classmethod
+    def from_state_dict(cls, state_dict) -> "NumpyBiLSTM_CRF":
+        """Builds a model directly from a PyTorch BiLSTM_CRF state dict (requires torch)."""
+        return cls(state_dict_to_numpy(state_dict))
+
+    def input_projection_table(self) -> np.ndarray:
+        """
+        First-layer input gates of every vocabulary entry: (vocab_size, 8 * hidden), float32, with the
+        forward direction's 4 * hidden gate pre-activations (biases included) followed by the reverse direction's.
+        """
+        (w_ih, _, bias), (w_ih_reverse, _, bias_reverse) = self.layers[0]
+        return np.concatenate([self.embedding @ w_ih + bias, self.embedding @ w_ih_reverse + bias_reverse], axis=1)
+
+    def use_input_projection_table(self, table: np.ndarray) -> None:
+        """Makes forward() gather the first layer's input gates from `table` (see input_projection_table)."""
+        expected_shape = (self.embedding.shape[0], 8 * self.hidden_size)
+        if table.shape != expected_shape:
+            raise ValueError(f"Input projection table has shape {table.shape}, expected {expected_shape}.")
+        self.input_table = table
+
+    @staticmethod
+    def _project(inputs: np.ndarray, w_ih: np.ndarray, bias: np.ndarray) -> np.ndarray:
+        """Input projection for every timestep at once: one GEMM instead of one per step."""
+        batch_size, seq_len, _ = inputs.shape
+        return (inputs.reshape(batch_size * seq_len, -1) @ w_ih).reshape(batch_size, seq_len, -1) + bias
+
+    def _run_direction(self, projected: np.ndarray, valid: np.ndarray, w_hh: np.ndarray, reverse: bool) -> np.ndarray:
+        """
+        Runs one LSTM direction over (B, L, 4 * hidden) projected inputs and returns (B, L, hidden) outputs.
+        Padded positions output zeros; the reverse direction starts each sequence at its own last token.
+        """
+        batch_size, seq_len, _ = projected.shape
+        hidden = self.hidden_size
+
+        # Timesteps where no sequence is padded can skip the masking entirely
+        step_all_valid = valid.all(axis=0).tolist()
+
+        h = np.zeros((batch_size, hidden), dtype=np.float32)
+        c = np.zeros((batch_size, hidden), dtype=np.float32)
+        outputs = np.zeros((batch_size, seq_len, hidden), dtype=np.float32)
+        steps = range(seq_len - 1, -1, -1) if reverse else range(seq_len)
+        for t in steps:
+            gates = projected[:, t] + h @ w_hh
+            sigmoid_gates = _sigmoid(gates[:, :3 * hidden]) # input, forget, output
+            c_next = sigmoid_gates[:, hidden:2 * hidden] * c + sigmoid_gates[:, :hidden] * np.tanh(gates[:, 3 * hidden:])
+            h_next = sigmoid_gates[:, 2 * hidden:] * np.tanh(c_next)
+            if step_all_valid[t]:
+                c, h = c_next, h_next
+                outputs[:, t] = h_next
+                continue
+            step_valid = valid[:, t:t + 1]
+            # Padded steps leave the state at zero (reverse) or unchanged (forward) and output nothing
+            c = np.where(step_valid, c_next, 0.0 if reverse else c)
+            h = np.where(step_valid, h_next, 0.0 if reverse else h)
+            outputs[:, t] = np.where(step_valid, h_next, 0.0)
+        return outputs
+
+    def forward(self, word_ids: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """
+        Computes emissions.
+        word_ids shape: (batch_size, seq_len), integer
+        mask shape: (batch_size, seq_len), boolean, True for the leading real tokens
+        Returns emissions of shape (batch_size, seq_len, num_tags).
+        """
+        valid = np.asarray(mask, dtype=bool)
+        word_ids = np.asarray(word_ids)
+        gates = 4 * self.hidden_size
+        layer_input = None
+        for layer, ((w_ih, w_hh, bias), (w_ih_reverse, w_hh_reverse, bias_reverse)) in enumerate(self.layers):
+            if layer == 0 and self.input_table is not None:
+                projected = self.input_table[word_ids] # (B, L, 8 * hidden): both directions in one gather
+                forward_projected, backward_projected = projected[..., :gates], projected[..., gates:]
+            else:
+                if layer_input is None:
+                    layer_input = self.embedding[word_ids]
+                forward_projected = self._project(layer_input, w_ih, bias)
+                backward_projected = self._project(layer_input, w_ih_reverse, bias_reverse)
+            forward_out = self._run_direction(forward_projected, valid, w_hh, reverse=False)
+            backward_out = self._run_direction(backward_projected, valid, w_hh_reverse, reverse=True)
+            layer_input = np.concatenate([forward_out, backward_out], axis=2)
+        return layer_input @ self.hidden2tag_weight + self.hidden2tag_bias
+
+    def viterbi(self, emissions: np.ndarray, mask: np.ndarray, pad_tag: int = 0) -> np.ndarray:
+        """Batched Viterbi decoding; NumPy port of app.models.crf.viterbi_decode."""
+        batch_size, seq_len, num_tags = emissions.shape
+        valid = np.asarray(mask, dtype=bool)
+        identity = np.broadcast_to(np.arange(num_tags), (batch_size, num_tags))
+        batch_index = np.arange(batch_size)
+
+        score = self.start_transitions + emissions[:, 0]
+        history = []
+        for t in range(1, seq_len):
+            # (B, num_tags, 1) + (num_tags, num_tags) + (B, 1, num_tags) -> (B, from_tag, to_tag)
+            next_score = score[:, :, None] + self.transitions + emissions[:, t, None, :]
+            best_previous = next_score.argmax(axis=1)
+            next_score = np.take_along_axis(next_score, best_previous[:, None, :], axis=1)[:, 0]
+            step_valid = valid[:, t:t + 1]
+            score = np.where(step_valid, next_score, score)
+            history.append(np.where(step_valid, best_previous, identity))
+
+        score = score + self.end_transitions
+        tags = np.empty((batch_size, seq_len), dtype=np.int64)
+        current = score.argmax(axis=1)
+        tags[:, seq_len - 1] = current
+        for t in range(seq_len - 2, -1, -1):
+            current = history[t][batch_index, current]
+            tags[:, t] = current
+        tags[~valid] = pad_tag
+        return tags
+
+    def marginals(self, emissions: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Per-token tag marginals by scaled forward-backward; NumPy port of app.models.crf.crf_marginals."""
+        batch_size, seq_len, num_tags = emissions.shape
+        valid = np.asarray(mask, dtype=bool)
+        potentials = np.exp(emissions - emissions.max(axis=2, keepdims=True))
+        transition_potentials = np.exp(self.transitions - self.transitions.max())
+        end_potentials = _normalize(np.exp(self.end_transitions - self.end_transitions.max()))
+
+        alpha = np.empty((batch_size, seq_len, num_tags), dtype=np.float32)
+        alpha[:, 0] = _normalize(np.exp(self.start_transitions - self.start_transitions.max()) * potentials[:, 0])
+        for t in range(1, seq_len):
+            next_alpha = _normalize((alpha[:, t - 1] @ transition_potentials) * potentials[:, t])
+            alpha[:, t] = np.where(valid[:, t:t + 1], next_alpha, alpha[:, t - 1])
+
+        beta = np.empty((batch_size, seq_len, num_tags), dtype=np.float32)
+        beta[:, seq_len - 1] = end_potentials
+        for t in range(seq_len - 2, -1, -1):
+            next_beta = _normalize((potentials[:, t + 1] * beta[:, t + 1]) @ transition_potentials.T)
+            beta[:, t] = np.where(valid[:, t + 1:t + 2], next_beta, end_potentials)
+
+        marginals = _normalize(alpha * beta)
+        marginals[~valid] = 0.0
+        return marginals
+
+    def decode_padded(self, word_ids: np.ndarray, mask: np.ndarray, pad_tag: int = 0) -> np.ndarray:
+        """Same contract as BiLSTM_CRF.decode_padded, with NumPy arrays."""
+        return self.viterbi(self.forward(word_ids, mask), mask, pad_tag=pad_tag)
+
+    def decode(self, word_ids: np.ndarray, mask: np.ndarray) -> List[List[int]]:
+        """Same contract as BiLSTM_CRF.decode, with NumPy arrays."""
+        tags = self.decode_padded(word_ids, mask)
+        lengths = np.asarray(mask, dtype=bool).sum(axis=1).tolist()
+        return [row[:length] for row, length in zip(tags.tolist(), lengths)]
+
+def state_dict_to_numpy(state_dict) -> Dict[str, np.ndarray]:
+    """Converts a PyTorch state dict to float32 NumPy arrays, keeping the keys."""
+    return {key: value.detach().cpu().float().numpy() for key, value in state_dict.items()}
+
+def export_bilstm_weights(state_dict, path: str) -> None:
+    """Writes the weights of a BiLSTM_CRF state dict to a flat, uncompressed .npz array file."""
+    np.savez(path, **state_dict_to_numpy(state_dict))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export BiLSTM-CRF weights for the NumPy runtime.")
+    parser.add_argument("weights", help="PyTorch state dict (.pth) of a BiLSTM_CRF model")
+    parser.add_argument("output", help="Destination .npz file")
+    args = parser.parse_args()
+
+    import torch # Only needed for exporting
+    export_bilstm_weights(torch.load(args.weights, map_location="cpu"), args.output)
+    print(f"Exported BiLSTM-CRF weights from {args.weights} to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import logger
+from app.core.executor import InferenceExecutor, ExecutorSaturatedError
+from app.core.metrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_BUCKETS_SECONDS, registry, HistogramFamily
+
+MICROBATCH_SIZE = registry.register(HistogramFamily(
+    "microbatch_size", "Requests decoded together per micro-batch.", ("batcher",), BATCH_SIZE_BUCKETS))
+MICROBATCH_QUEUE_WAIT = registry.register(HistogramFamily(
+    "microbatch_queue_wait_seconds", "Time a request waited for its micro-batch to be flushed.", ("batcher",)))
+
+class MicroBatcher:
+    """
+    Dynamic micro-batcher.
+    An item submitted while no batch is running is run at once, on its own, so a lone request
+    never waits. Items submitted while a batch is running are collected until `max_batch_size`
+    items are pending, the oldest one has waited `max_wait_ms` or the running batches finish,
+    then `batch_fn` runs once on the whole batch and each caller's future gets its own result.
+
+    `batch_fn` takes a list of items and returns a list of results in the same order.
+    If an `executor` is given, `batch_fn` runs on it instead of on the event loop.
+    """
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int, max_wait_ms: float,
+                 name: str = "batcher", executor: Optional[InferenceExecutor] = None):
+        self.name = name
+        self._executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._batch_fn = batch_fn
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set() # Batches in flight (also keeps their tasks referenced)
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(LATENCY_BUCKETS_SECONDS)
+        MICROBATCH_SIZE.attach(self.batch_size_histogram, name)
+        MICROBATCH_QUEUE_WAIT.attach(self.queue_wait_histogram, name)
+
+    async def submit(self, item: Any) -> Any:
+        """Queues one item and waits for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size or not self._running:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Takes up to max_batch_size pending items and starts running them as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+
+        if self._pending: # Leftovers wait for the next batch
+            loop = asyncio.get_running_loop()
+            if len(self._pending) >= self.max_batch_size:
+                loop.call_soon(self._flush)
+            else:
+                self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        if self._pending and not self._running: # Items that queued behind the last batch need not wait longer
+            self._flush()
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        self.batch_size_histogram.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait_histogram.observe(started - enqueued)
+
+        # Callers that were cancelled while waiting do not need a result
+        live = [(item, future) for item, future, _ in batch if not future.done()]
+        if not live:
+            return
+
+        items = [item for item, _ in live]
+        try:
+            if self._executor is not None:
+                results = await self._executor.run(self._batch_fn, items)
+            else:
+                results = self._batch_fn(items)
+            if len(results) != len(live):
+                raise RuntimeError(f"{self.name}: batch function returned {len(results)} results for {len(live)} items")
+        except ExecutorSaturatedError as e:
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except Exception as e:
+            logger.error("%s: batch of %d failed: %s", self.name, len(live), e, exc_info=True)
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(live, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the achieved batch size and queue-wait (seconds) histograms."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+        }
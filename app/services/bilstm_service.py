@@ -1,119 +1,518 @@
-import torch
-from typing import List, Dict, Any
+import bisect
+import functools
+import numpy as np
+from typing import List, Dict, Any, Tuple
 
-from app.core.config import logger, DEVICE, BILSTM_MAX_SEQ_LEN, PAD_TOKEN, UNK_TOKEN, PAD_IDX, UNK_IDX
-from app.models.loaders import get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag, get_spacy_nlp
+from app.core.config import (
+    logger, request_logger, DEVICE, BILSTM_MAX_SEQ_LEN, BILSTM_WINDOW_OVERLAP, BILSTM_LENGTH_BUCKETS, PAD_TOKEN, UNK_TOKEN, PAD_IDX, UNK_IDX,
+    BILSTM_MICROBATCH_ENABLED, BILSTM_MICROBATCH_MAX_SIZE, BILSTM_MICROBATCH_MAX_WAIT_MS, RESULT_CACHE_ENABLED, INFERENCE_ENGINE
+)
+from app.core.cache import get_result_cache, result_cache_key
+from app.core.executor import get_inference_executor, ExecutorSaturatedError, overload_result
+from app.core.metrics import stage_timer, TOKEN_LENGTH, TRUNCATIONS, DECODE_BATCH_SIZE
+from app.core.process_engine import get_process_engine
+from app.models.loaders import (
+    get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag, get_spacy_tokenizer, ensure_model_loaded, get_model_version,
+    is_served_by_workers
+)
+from app.models.artifacts import TrieVocab
+from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+from app.services.batching import MicroBatcher
+from app.services.coalescing import bilstm_flights
+from app.services.prefilter import prefilter_skips, prefilter_candidates, fill_skipped
+from app.services.sentence_memo import extract_by_sentence
+from app.services.spans import make_span, unique_locations
 
-async def extract_locations_with_bilstm(text: str) -> Dict[str, Any]:
+BILSTM_SPAN_LABEL = "LOC" # Label of the B-LOC/I-LOC spans
+
+def _tokenize(spacy_tokenizer, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Tokenizes text with spaCy's tokenizer for consistency with training.
+    We only need the tokenizer part of spaCy here, not the full pipeline if it's heavy.
+    Returns the tokens and their (start, end) character offsets in `text`.
+    """
+    with stage_timer("bilstm", "tokenize"):
+        doc = spacy_tokenizer.tokenizer(text) # Use the tokenizer component
+        kept = [token for token in doc if token.text.strip()] # Ensure no empty string tokens
+        return [token.text for token in kept], [(token.idx, token.idx + len(token.text)) for token in kept]
+
+def _encode(tokens: List[str], word2idx: Dict[str, int], truncate: bool = True) -> List[int]:
+    """Converts tokens to IDs, handling unknown words and (unless `truncate` is False) truncating to BILSTM_MAX_SEQ_LEN."""
+    # Ensure UNK_TOKEN exists and has a valid index (UNK_IDX)
+    unk_idx_to_use = word2idx.get(UNK_TOKEN, UNK_IDX) # Fallback to configured UNK_IDX if UNK_TOKEN not in map
+    if UNK_TOKEN not in word2idx:
+         logger.warning("'%s' not in word2idx. Using default UNK_IDX: %s", UNK_TOKEN, unk_idx_to_use)
+
+    TOKEN_LENGTH.observe("bilstm", value=len(tokens))
+    if truncate and len(tokens) > BILSTM_MAX_SEQ_LEN:
+        TRUNCATIONS.inc("bilstm")
+        logger.warning("Input text truncated from %d to %d tokens for BiLSTM: '%.70s...'", len(tokens), BILSTM_MAX_SEQ_LEN, " ".join(tokens[:20]))
+        tokens = tokens[:BILSTM_MAX_SEQ_LEN]
+
+    if isinstance(word2idx, TrieVocab):
+        return word2idx.encode(tokens, unk_idx_to_use)
+    return [word2idx.get(token, unk_idx_to_use) for token in tokens]
+
+def _prepare(spacy_tokenizer, word2idx: Dict[str, int], text: str,
+             truncate: bool = True) -> Tuple[List[str], List[Tuple[int, int]], List[int]]:
+    """Tokenizes and encodes one text. Returns the (possibly truncated) tokens, their character offsets and their IDs."""
+    tokens, offsets = _tokenize(spacy_tokenizer, text)
+    if not tokens:
+        return [], [], []
+    word_ids = _encode(tokens, word2idx, truncate=truncate)
+    return tokens[:len(word_ids)], offsets[:len(word_ids)], word_ids # Also truncate original tokens list to match
+
+def _bucket_by_length(word_id_batch: List[List[int]]) -> List[List[int]]:
+    """Groups batch positions by BILSTM_LENGTH_BUCKETS, shortest bucket first."""
+    buckets: Dict[int, List[int]] = {}
+    for position, word_ids in enumerate(word_id_batch):
+        buckets.setdefault(bisect.bisect_left(BILSTM_LENGTH_BUCKETS, len(word_ids)), []).append(position)
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+def _decode_padded(bilstm_model, word_id_batch: List[List[int]], pad_idx: int) -> List[List[int]]:
+    """
+    Pads the sequences to the longest one, builds the mask and decodes them in one call.
+    The model runs as forward + viterbi, so both stages are timed.
+    """
+    DECODE_BATCH_SIZE.observe("bilstm", value=len(word_id_batch))
+    with stage_timer("bilstm", "tensors"):
+        pad_to = max(len(word_ids) for word_ids in word_id_batch)
+        padded_word_ids = [word_ids + [pad_idx] * (pad_to - len(word_ids)) for word_ids in word_id_batch]
+        mask = [[1] * len(word_ids) + [0] * (pad_to - len(word_ids)) for word_ids in word_id_batch]
+        lengths = [len(word_ids) for word_ids in word_id_batch]
+
+        word_id_array = np.array(padded_word_ids, dtype=np.int64)
+        mask_array = np.array(mask, dtype=bool) # CRF expects bool mask
+
+    if isinstance(bilstm_model, NumpyBiLSTM_CRF):
+        with stage_timer("bilstm", "forward"):
+            emissions = bilstm_model.forward(word_id_array, mask_array)
+        with stage_timer("bilstm", "viterbi"):
+            tags = bilstm_model.viterbi(emissions, mask_array)
+        return [row[:length] for row, length in zip(tags.tolist(), lengths)]
+
+    import torch # Only the torch backends need it
+    with stage_timer("bilstm", "tensors"):
+        input_tensor = torch.from_numpy(word_id_array).to(DEVICE)
+        mask_tensor = torch.from_numpy(mask_array).to(DEVICE)
+
+    with torch.no_grad():
+        with stage_timer("bilstm", "forward"):
+            emissions = bilstm_model(input_tensor, mask_tensor.sum(dim=1))
+        with stage_timer("bilstm", "viterbi"):
+            tags = bilstm_model.viterbi(emissions, mask_tensor)
+    return [row[:length] for row, length in zip(tags.tolist(), lengths)]
+
+def _decode_scored(bilstm_model, word_ids: List[int]) -> Tuple[List[int], List[float]]:
+    """
+    Decodes one unpadded sequence and scores it: returns the Viterbi tag IDs and, for each token,
+    the CRF marginal probability of its predicted tag (forward-backward over the same emissions).
+    """
+    word_id_array = np.array([word_ids], dtype=np.int64)
+    mask_array = np.ones_like(word_id_array, dtype=bool)
+
+    if isinstance(bilstm_model, NumpyBiLSTM_CRF):
+        with stage_timer("bilstm", "forward"):
+            emissions = bilstm_model.forward(word_id_array, mask_array)
+        with stage_timer("bilstm", "viterbi"):
+            tags = bilstm_model.viterbi(emissions, mask_array)[0]
+        with stage_timer("bilstm", "marginals"):
+            marginals = bilstm_model.marginals(emissions, mask_array)[0]
+        return tags.tolist(), marginals[np.arange(len(tags)), tags].tolist()
+
+    import torch # Only the torch backends need it
+    with torch.no_grad():
+        input_tensor = torch.from_numpy(word_id_array).to(DEVICE)
+        mask_tensor = torch.from_numpy(mask_array).to(DEVICE)
+        with stage_timer("bilstm", "forward"):
+            emissions = bilstm_model(input_tensor, mask_tensor.sum(dim=1))
+        with stage_timer("bilstm", "viterbi"):
+            tags = bilstm_model.viterbi(emissions, mask_tensor)
+        with stage_timer("bilstm", "marginals"):
+            marginals = bilstm_model.marginals(emissions, mask_tensor)
+        confidences = marginals.gather(2, tags.unsqueeze(2))[0, :, 0]
+    return tags[0].tolist(), confidences.tolist()
+
+def _decode_batch(bilstm_model, word_id_batch: List[List[int]], word2idx: Dict[str, int]) -> List[List[int]]:
+    """
+    Decodes a batch of encoded sequences with one decode call per length bucket.
+    Each bucket is only padded to its own longest sequence, and the model skips the
+    padding, so short texts never pay for BILSTM_MAX_SEQ_LEN positions.
+    Returns the predicted tag IDs of each sequence, in input order.
+    """
+    pad_idx_to_use = word2idx.get(PAD_TOKEN, PAD_IDX) # Fallback to configured PAD_IDX
+
+    predicted: List[List[int]] = [None] * len(word_id_batch)
+    for positions in _bucket_by_length(word_id_batch):
+        bucket_tags = _decode_padded(bilstm_model, [word_id_batch[position] for position in positions], pad_idx_to_use)
+        if len(bucket_tags) != len(positions):
+            raise RuntimeError(f"decode returned {len(bucket_tags)} sequences for a batch of {len(positions)}")
+        for position, tags in zip(positions, bucket_tags):
+            predicted[position] = tags
+    return predicted
+
+def _window_starts(num_tokens: int, window: int, overlap: int) -> List[int]:
+    """Start positions of overlapping windows covering `num_tokens` tokens. The last window ends at the last token."""
+    stride = max(1, window - overlap)
+    starts = list(range(0, max(num_tokens - window, 0) + 1, stride))
+    if starts[-1] + window < num_tokens:
+        starts.append(num_tokens - window)
+    return starts
+
+def _merge_window_tags(num_tokens: int, starts: List[int], window_tags: List[List[int]]) -> List[int]:
+    """
+    Merges per-window tag sequences into one tag per token.
+    In the overlaps, each token takes its tag from the window in which it is farthest
+    from a window edge (i.e. has the most context on both sides); ties go to the
+    earlier window, so the merge is deterministic.
+    """
+    merged = [0] * num_tokens
+    best_margin = [-1] * num_tokens
+    for start, tags in zip(starts, window_tags):
+        for offset, tag in enumerate(tags):
+            margin = min(offset, len(tags) - 1 - offset)
+            if margin > best_margin[start + offset]:
+                best_margin[start + offset] = margin
+                merged[start + offset] = tag
+    return merged
+
+def _decode_long_document(bilstm_model, word2idx: Dict[str, int], word_ids: List[int]) -> List[int]:
+    """
+    Sliding-window inference for texts longer than BILSTM_MAX_SEQ_LEN.
+    All windows of the document are decoded in one batched decode call and merged back
+    into a single tag sequence covering every token.
+    """
+    starts = _window_starts(len(word_ids), BILSTM_MAX_SEQ_LEN, BILSTM_WINDOW_OVERLAP)
+    windows = [word_ids[start:start + BILSTM_MAX_SEQ_LEN] for start in starts]
+    window_tags = _decode_batch(bilstm_model, windows, word2idx)
+    return _merge_window_tags(len(word_ids), starts, window_tags)
+
+def _decode_microbatch(word_id_batch: List[List[int]]) -> List[List[int]]:
+    """Batch function of the micro-batcher: decodes concurrent requests together."""
+    return _decode_batch(get_bilstm_model(), word_id_batch, get_bilstm_word2idx())
+
+bilstm_batcher = MicroBatcher(
+    _decode_microbatch,
+    max_batch_size=BILSTM_MICROBATCH_MAX_SIZE,
+    max_wait_ms=BILSTM_MICROBATCH_MAX_WAIT_MS,
+    name="bilstm-microbatcher",
+    executor=get_inference_executor()
+)
+
+def _tag_spans(tags: List[str]) -> List[Tuple[int, int]]:
+    """
+    Groups tag names into location spans using the B-LOC/I-LOC scheme.
+    Returns (start, end) token index ranges, end exclusive. An I-LOC without a preceding B-LOC starts a span.
+    """
+    spans = []
+    span_start = None
+    for i, tag in enumerate(tags):
+        if tag == 'B-LOC':
+            if span_start is not None: # Finalize previous location
+                spans.append((span_start, i))
+            span_start = i
+        elif tag == 'I-LOC':
+            if span_start is None: # I-LOC without B-LOC starts a new location
+                span_start = i
+        elif span_start is not None: # 'O' tag or other tags finalize the current location
+            spans.append((span_start, i))
+            span_start = None
+
+    if span_start is not None: # Add any trailing location
+        spans.append((span_start, len(tags)))
+    return spans
+
+def _tags_to_spans(offsets: List[Tuple[int, int]], predicted_tag_ids: List[int], idx2tag: Dict[int, str], text: str) -> List[Dict[str, Any]]:
+    """
+    Converts predicted tag IDs to location spans using the B-LOC/I-LOC scheme.
+    Span text is the exact input text between the first and last token of the location;
+    token indices refer to the model's token sequence (whitespace tokens excluded).
+    """
+    with stage_timer("bilstm", "postprocess"):
+        # Only convert tags for the actual tokens, not padding
+        actual_predicted_tags = [idx2tag.get(tag_id, 'O') for tag_id in predicted_tag_ids[:len(offsets)]]
+        spans = []
+        for start, end in _tag_spans(actual_predicted_tags):
+            start_char, end_char = offsets[start][0], offsets[end - 1][1]
+            spans.append(make_span(start_char, end_char, text[start_char:end_char], BILSTM_SPAN_LABEL, start, end))
+        return spans
+
+def _result_from_spans(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"locations": unique_locations(spans), "spans": spans, "model_used": "BiLSTM-CRF"}
+
+def _sentence_spans_batch_sync(bilstm_model, spacy_tokenizer, word2idx: Dict[str, int], idx2tag: Dict[int, str],
+                               sentences: List[str]) -> List[List[List[Any]]]:
+    """
+    Sentence-relative location spans and token count of each sentence. Blocking.
+    Sentences up to BILSTM_MAX_SEQ_LEN tokens share one bucketed decode; longer ones use sliding windows.
+    """
+    tokenized = [_tokenize(spacy_tokenizer, sentence) for sentence in sentences]
+    word_ids = [_encode(tokens, word2idx, truncate=False) for tokens, _ in tokenized]
+
+    short_positions = [i for i, ids in enumerate(word_ids) if 0 < len(ids) <= BILSTM_MAX_SEQ_LEN]
+    tag_ids: Dict[int, List[int]] = {}
+    if short_positions:
+        decoded = _decode_batch(bilstm_model, [word_ids[i] for i in short_positions], word2idx)
+        tag_ids.update(zip(short_positions, decoded))
+    for i, ids in enumerate(word_ids):
+        if len(ids) > BILSTM_MAX_SEQ_LEN:
+            tag_ids[i] = _decode_long_document(bilstm_model, word2idx, ids)
+
+    return [
+        {"spans": _tags_to_spans(offsets, tag_ids.get(i, []), idx2tag, sentence), "tokens": len(tokens)}
+        for i, (sentence, (tokens, offsets)) in enumerate(zip(sentences, tokenized))
+    ]
+
+def _extract_batch_sync(bilstm_model, spacy_tokenizer, word2idx: Dict[str, int], idx2tag: Dict[int, str], texts: List[str]) -> List[Dict[str, Any]]:
+    """Tokenizes and decodes a batch of texts. Blocking; called on the inference executor."""
+    results: List[Dict[str, Any]] = [None] * len(texts)
+    batch_positions: List[int] = [] # Input positions of the texts that go through the model
+    batch_offsets: List[List[Tuple[int, int]]] = []
+    batch_word_ids: List[List[int]] = []
+
+    for position, text in enumerate(texts):
+        try:
+            tokens, offsets, word_ids = _prepare(spacy_tokenizer, word2idx, text)
+            if not tokens:
+                results[position] = _result_from_spans([])
+                continue
+            batch_positions.append(position)
+            batch_offsets.append(offsets)
+            batch_word_ids.append(word_ids)
+        except Exception as e:
+            logger.error("Error during BiLSTM-CRF preprocessing: %s", e, exc_info=True)
+            results[position] = {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+
+    if batch_word_ids:
+        try:
+            predicted_tag_ids_batch = _decode_batch(bilstm_model, batch_word_ids, word2idx)
+
+            for position, offsets, predicted_tag_ids in zip(batch_positions, batch_offsets, predicted_tag_ids_batch):
+                results[position] = _result_from_spans(_tags_to_spans(offsets, predicted_tag_ids, idx2tag, texts[position]))
+        except Exception as e:
+            logger.error("Error during BiLSTM-CRF batch processing: %s", e, exc_info=True)
+            for position in batch_positions:
+                results[position] = {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+
+    return results
+
+def _spans_sync(bilstm_model, spacy_tokenizer, word2idx: Dict[str, int], idx2tag: Dict[int, str], text: str) -> List[Dict[str, Any]]:
+    """Location spans of one (truncated) text. Blocking; used by the pre-filter's audits."""
+    return _extract_batch_sync(bilstm_model, spacy_tokenizer, word2idx, idx2tag, [text])[0].get("spans", [])
+
+def _worker_models_missing_result() -> Dict[str, Any]:
+    return {"error": "BiLSTM-CRF model or its mappings are not available in the inference worker.", "status_code": 503}
+
+def _extract_batch_in_worker(texts: List[str]) -> List[Dict[str, Any]]:
+    """Process-engine job: results of a chunk of texts (truncated), with the worker's own BiLSTM-CRF replica."""
+    bilstm_model, spacy_tokenizer = get_bilstm_model(), get_spacy_tokenizer()
+    if bilstm_model is None or spacy_tokenizer is None:
+        return [_worker_models_missing_result() for _ in texts]
+    return _extract_batch_sync(bilstm_model, spacy_tokenizer, get_bilstm_word2idx(), get_bilstm_idx2tag(), texts)
+
+def _worker_models():
+    """The worker's own BiLSTM-CRF replica, tokenizer and mappings, as the leading arguments of the blocking functions."""
+    bilstm_model, spacy_tokenizer = get_bilstm_model(), get_spacy_tokenizer()
+    if bilstm_model is None or spacy_tokenizer is None:
+        raise RuntimeError(_worker_models_missing_result()["error"])
+    return bilstm_model, spacy_tokenizer, get_bilstm_word2idx(), get_bilstm_idx2tag()
+
+def _spans_in_worker(text: str) -> List[Dict[str, Any]]:
+    """Process-engine job: location spans of one (truncated) text, for the pre-filter's audits."""
+    return _spans_sync(*_worker_models(), text)
+
+def _sentence_spans_batch_in_worker(sentences: List[str]) -> List[Dict[str, Any]]:
+    """Process-engine job: _sentence_spans_batch_sync with the worker's own BiLSTM-CRF replica."""
+    return _sentence_spans_batch_sync(*_worker_models(), sentences)
+
+def _model_jobs(bilstm_model, spacy_tokenizer, word2idx: Dict[str, int], idx2tag: Dict[int, str]):
+    """
+    Executor and blocking jobs for the pre-filter's audits and sentence mode: the worker jobs with the
+    process engine, otherwise the in-process functions bound to the given model and mappings.
+    """
+    if INFERENCE_ENGINE == "processes":
+        return get_process_engine(), _spans_in_worker, _sentence_spans_batch_in_worker
+    models = (bilstm_model, spacy_tokenizer, word2idx, idx2tag)
+    return get_inference_executor(), functools.partial(_spans_sync, *models), functools.partial(_sentence_spans_batch_sync, *models)
+
+def _extract_long_document_in_worker(text: str) -> Dict[str, Any]:
+    """Process-engine job: result of one text in long-document mode, with the worker's own BiLSTM-CRF replica."""
+    bilstm_model, spacy_tokenizer, word2idx = get_bilstm_model(), get_spacy_tokenizer(), get_bilstm_word2idx()
+    if bilstm_model is None or spacy_tokenizer is None:
+        return _worker_models_missing_result()
+    tokens, offsets, word_ids = _prepare(spacy_tokenizer, word2idx, text, truncate=False)
+    if not tokens:
+        return _result_from_spans([])
+    if len(word_ids) > BILSTM_MAX_SEQ_LEN:
+        predicted_tag_ids = _decode_long_document(bilstm_model, word2idx, word_ids)
+    else:
+        predicted_tag_ids = _decode_batch(bilstm_model, [word_ids], word2idx)[0]
+    return _result_from_spans(_tags_to_spans(offsets, predicted_tag_ids, get_bilstm_idx2tag(), text))
+
+# With the process engine, concurrent single texts are micro-batched as raw texts and each batch is
+# tokenized, decoded and post-processed in one worker process.
+bilstm_process_batcher = MicroBatcher(
+    _extract_batch_in_worker,
+    max_batch_size=BILSTM_MICROBATCH_MAX_SIZE,
+    max_wait_ms=BILSTM_MICROBATCH_MAX_WAIT_MS,
+    name="bilstm-process-microbatcher",
+    executor=get_process_engine()
+) if INFERENCE_ENGINE == "processes" else None
+
+async def _extract_in_processes(text: str, long_document: bool, cache_key) -> Dict[str, Any]:
+    """Single-text extraction on the process engine (INFERENCE_ENGINE = "processes")."""
+    try:
+        if long_document:
+            result = await get_process_engine().run(_extract_long_document_in_worker, text)
+        elif BILSTM_MICROBATCH_ENABLED:
+            result = await bilstm_process_batcher.submit(text)
+        else:
+            result = (await get_process_engine().run(_extract_batch_in_worker, [text]))[0]
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during BiLSTM-CRF model processing in a worker process: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+
+    if "error" not in result:
+        request_logger.info("BiLSTM extracted: %s from text: '%.70s...'", result["locations"], text)
+        if cache_key is not None:
+            await get_result_cache().aset(cache_key, result)
+    return result
+
+async def extract_locations_with_bilstm(text: str, long_document: bool = False, by_sentence: bool = False) -> Dict[str, Any]:
     """
     Extracts locations using the loaded BiLSTM-CRF model.
     Uses spaCy for initial tokenization.
+    Texts longer than BILSTM_MAX_SEQ_LEN tokens are truncated, unless `long_document`
+    is set, in which case the whole text is processed with sliding-window inference.
+    With `by_sentence`, the text is processed sentence by sentence with per-sentence memoization
+    (see app/services/sentence_memo.py); sentences are never truncated, and the result also
+    carries document-level spans.
+    Concurrent calls with the same text and options share one extraction (see app/services/coalescing.py).
     """
+    return await bilstm_flights.run((text, long_document, by_sentence), _extract_locations_with_bilstm, text, long_document, by_sentence)
+
+async def _extract_locations_with_bilstm(text: str, long_document: bool, by_sentence: bool) -> Dict[str, Any]:
+    await ensure_model_loaded("bilstm")
     bilstm_model = get_bilstm_model()
     word2idx = get_bilstm_word2idx()
     idx2tag = get_bilstm_idx2tag()
-    spacy_tokenizer = get_spacy_nlp() 
+    spacy_tokenizer = get_spacy_tokenizer()
 
-    if bilstm_model is None or word2idx is None or idx2tag is None:
+    in_workers = is_served_by_workers("bilstm") # The worker processes hold the model, its mappings and the tokenizer
+    if not in_workers and (bilstm_model is None or word2idx is None or idx2tag is None):
         logger.warning("BiLSTM-CRF model, word2idx, or idx2tag requested but not loaded.")
         return {"error": "BiLSTM-CRF model or its mappings are not available.", "status_code": 503}
 
-    if spacy_tokenizer is None:
+    if not in_workers and spacy_tokenizer is None:
         logger.warning("SpaCy tokenizer (needed for BiLSTM preprocessing) is not loaded.")
         return {"error": "SpaCy tokenizer is not available, which is required for BiLSTM.", "status_code": 503}
 
+    executor, spans_fn, sentence_spans_batch_fn = _model_jobs(bilstm_model, spacy_tokenizer, word2idx, idx2tag)
+    if prefilter_skips("bilstm", text, spans_fn, executor):
+        return _result_from_spans([])
+
+    if by_sentence:
+        try:
+            result = await extract_by_sentence("bilstm", get_model_version("bilstm"), text, sentence_spans_batch_fn, executor=executor)
+            result["model_used"] = "BiLSTM-CRF"
+            return result
+        except ExecutorSaturatedError as e:
+            return overload_result(e)
+        except Exception as e:
+            logger.error("Error during BiLSTM-CRF sentence-mode processing: %s", e, exc_info=True)
+            return {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+
+    model_version = get_model_version("bilstm")
+    cache_key = result_cache_key("bilstm", model_version, text, long_document) if RESULT_CACHE_ENABLED and model_version else None
+    if cache_key is not None:
+        cached = await get_result_cache().aget(cache_key)
+        if cached is not None:
+            request_logger.info("BiLSTM result cache hit for text: '%.70s...'", text)
+            return cached
+
+    if INFERENCE_ENGINE == "processes":
+        return await _extract_in_processes(text, long_document, cache_key)
+
     try:
-        # 1. Tokenize using spaCy's tokenizer for consistency
-        # We only need the tokenizer part of spaCy here, not the full pipeline if it's heavy.
-        # If spacy_nlp is a full pipeline, spacy_nlp.tokenizer(text) is more direct.
-        # If it's loaded via spacy.load(), it includes the tokenizer.
-        doc = spacy_tokenizer.tokenizer(text) # Use the tokenizer component
-        tokens = [token.text for token in doc if token.text.strip()] # Ensure no empty string tokens
+        # 1-2. Tokenize using spaCy's tokenizer and convert tokens to IDs (truncated to BILSTM_MAX_SEQ_LEN)
+        tokens, offsets, word_ids = await executor.run(_prepare, spacy_tokenizer, word2idx, text, not long_document)
 
         if not tokens:
-            logger.info("BiLSTM: Input text resulted in no tokens after spaCy tokenization.")
-            return {"locations": [], "model_used": "BiLSTM-CRF"}
+            request_logger.info("BiLSTM: Input text resulted in no tokens after spaCy tokenization.")
+            return _result_from_spans([])
 
-        # 2. Convert tokens to IDs, handling unknown words
-        # Ensure UNK_TOKEN exists and has a valid index (UNK_IDX)
-        unk_idx_to_use = word2idx.get(UNK_TOKEN, UNK_IDX) # Fallback to configured UNK_IDX if UNK_TOKEN not in map
-        if UNK_TOKEN not in word2idx:
-             logger.warning(f"'{UNK_TOKEN}' not in word2idx. Using default UNK_IDX: {unk_idx_to_use}")
+        # 3. Build the tensors and perform inference, together with concurrent requests if micro-batching
+        if len(word_ids) > BILSTM_MAX_SEQ_LEN: # Only in long-document mode
+            predicted_tag_ids = await executor.run(_decode_long_document, bilstm_model, word2idx, word_ids)
+        elif BILSTM_MICROBATCH_ENABLED:
+            predicted_tag_ids = await bilstm_batcher.submit(word_ids)
+        else:
+            predicted_tag_ids_batch = await executor.run(_decode_batch, bilstm_model, [word_ids], word2idx)
 
+            if not predicted_tag_ids_batch: # Should not happen if decode is successful
+                logger.error("BiLSTM model decode returned an empty list.")
+                return {"error": "BiLSTM model decoding failed.", "status_code": 500}
 
-        word_ids = [word2idx.get(token, unk_idx_to_use) for token in tokens]
+            predicted_tag_ids = predicted_tag_ids_batch[0] # Get first (and only) item for batch size 1
 
-        # 3. Pad sequence and create mask
-        seq_len = len(word_ids)
-        pad_idx_to_use = word2idx.get(PAD_TOKEN, PAD_IDX) # Fallback to configured PAD_IDX
+        # 4. Extract location spans (B-LOC, I-LOC scheme)
+        result = _result_from_spans(_tags_to_spans(offsets, predicted_tag_ids, idx2tag, text))
 
-        if seq_len < BILSTM_MAX_SEQ_LEN:
-            padded_word_ids = word_ids + [pad_idx_to_use] * (BILSTM_MAX_SEQ_LEN - seq_len)
-            mask = [1] * seq_len + [0] * (BILSTM_MAX_SEQ_LEN - seq_len)
-        else:
-            padded_word_ids = word_ids[:BILSTM_MAX_SEQ_LEN]
-            mask = [1] * BILSTM_MAX_SEQ_LEN
-            logger.warning(f"Input text truncated to {BILSTM_MAX_SEQ_LEN} tokens for BiLSTM: '{' '.join(tokens[:BILSTM_MAX_SEQ_LEN])}'")
-            tokens = tokens[:BILSTM_MAX_SEQ_LEN] # Also truncate original tokens list to match
-
-        # 4. Convert to Tensors and move to device
-        input_tensor = torch.tensor([padded_word_ids], dtype=torch.long).to(DEVICE)
-        mask_tensor = torch.tensor([mask], dtype=torch.bool).to(DEVICE) # CRF expects bool mask
-
-        # 5. Perform Inference
-        with torch.no_grad():
-            predicted_tag_ids_batch = bilstm_model.decode(input_tensor, mask_tensor)
-
-        if not predicted_tag_ids_batch: # Should not happen if decode is successful
-            logger.error("BiLSTM model decode returned an empty list.")
-            return {"error": "BiLSTM model decoding failed.", "status_code": 500}
-
-        predicted_tag_ids = predicted_tag_ids_batch[0] # Get first (and only) item for batch size 1
-
-        # Ensure predicted_tag_ids matches the length of original (potentially truncated) tokens
-        # The CRF decode should return a list of tags for each item in the batch,
-        # and each list of tags should correspond to the unmasked part of the sequence.
-        # However, some implementations might return tags for the full MAX_SEQ_LEN.
-        # We should only consider tags up to the original (or truncated) sequence length.
-        
-        # 6. Convert tag IDs back to tag names
-        # Only convert tags for the actual tokens, not padding
-        actual_predicted_tags = [idx2tag.get(tag_id, 'O') for tag_id in predicted_tag_ids[:len(tokens)]]
-
-        # 7. Extract location spans (B-LOC, I-LOC scheme)
-        locations = []
-        current_location_tokens = []
-        for i, token_text in enumerate(tokens): # Iterate over original (or truncated) tokens
-            if i >= len(actual_predicted_tags): # Safety break if tags are shorter than tokens
-                break
-            tag = actual_predicted_tags[i]
-
-            if tag == 'B-LOC':
-                if current_location_tokens: # Finalize previous location
-                    locations.append(" ".join(current_location_tokens))
-                current_location_tokens = [token_text]
-            elif tag == 'I-LOC':
-                if current_location_tokens: # Continue current location
-                    current_location_tokens.append(token_text)
-                else: 
-                    current_location_tokens = [token_text]
-            else: # 'O' tag or other tags
-                if current_location_tokens: # Finalize current location
-                    locations.append(" ".join(current_location_tokens))
-                    current_location_tokens = []
-
-        if current_location_tokens: # Add any trailing location
-            locations.append(" ".join(current_location_tokens))
-
-        # Remove duplicates and sort by appearance
-        unique_locs = sorted(list(set(locations)), key=lambda loc: text.find(loc))
-
-        logger.info(f"BiLSTM extracted: {unique_locs} from text: '{text[:70]}...'")
-        return {
-            "locations": unique_locs,
-            "model_used": "BiLSTM-CRF"
-        }
+        request_logger.info("BiLSTM extracted: %s from text: '%.70s...'", result["locations"], text)
+        if cache_key is not None:
+            await get_result_cache().aset(cache_key, result)
+        return result
+
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during BiLSTM-CRF model processing: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+
+async def extract_locations_with_bilstm_batch(texts: List[str]) -> Dict[str, Any]:
+    """
+    Extracts locations from several texts in one batch, with one BiLSTM-CRF decode
+    call per length bucket (each padded to its own longest item).
+    Returns one result per text, in input order; a text that fails to preprocess
+    is reported as an error entry without failing the rest of the batch.
+    """
+    await ensure_model_loaded("bilstm")
+    bilstm_model = get_bilstm_model()
+    word2idx = get_bilstm_word2idx()
+    idx2tag = get_bilstm_idx2tag()
+    spacy_tokenizer = get_spacy_tokenizer()
+
+    in_workers = is_served_by_workers("bilstm") # The worker processes hold the model, its mappings and the tokenizer
+    if not in_workers and (bilstm_model is None or word2idx is None or idx2tag is None):
+        logger.warning("BiLSTM-CRF model, word2idx, or idx2tag requested but not loaded.")
+        return {"error": "BiLSTM-CRF model or its mappings are not available.", "status_code": 503}
 
+    if not in_workers and spacy_tokenizer is None:
+        logger.warning("SpaCy tokenizer (needed for BiLSTM preprocessing) is not loaded.")
+        return {"error": "SpaCy tokenizer is not available, which is required for BiLSTM.", "status_code": 503}
+
+    executor, spans_fn, _ = _model_jobs(bilstm_model, spacy_tokenizer, word2idx, idx2tag)
+    positions = prefilter_candidates("bilstm", texts, spans_fn, executor)
+    model_texts = [texts[i] for i in positions]
+    try:
+        if not model_texts:
+            results = []
+        elif INFERENCE_ENGINE == "processes":
+            results = await get_process_engine().run_chunked(_extract_batch_in_worker, model_texts)
+        else:
+            results = await get_inference_executor().run(_extract_batch_sync, bilstm_model, spacy_tokenizer, word2idx, idx2tag, model_texts)
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
     except Exception as e:
-        logger.error(f"Error during BiLSTM-CRF model processing: {e}", exc_info=True)
+        logger.error("Error during BiLSTM-CRF batch processing: %s", e, exc_info=True)
         return {"error": f"An unexpected error occurred while processing with BiLSTM-CRF: {str(e)}", "status_code": 500}
+    if len(model_texts) < len(texts):
+        results = fill_skipped(len(texts), positions, results, _result_from_spans([]))
+
+    request_logger.info("BiLSTM batch processed %d texts.", len(texts))
+    return {
+        "results": results,
+        "model_used": "BiLSTM-CRF"
+    }
@@ -0,0 +1,144 @@
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.config import logger, request_logger, BILSTM_MAX_SEQ_LEN, CASCADE_CONFIDENCE_THRESHOLD, INFERENCE_ENGINE
+from app.core.executor import get_inference_executor, ExecutorSaturatedError, overload_result
+from app.core.metrics import registry, stage_timer, observe_stage, CounterFamily, HistogramFamily, STAGE_LATENCY
+from app.core.process_engine import get_process_engine
+from app.models.loaders import (
+    get_spacy_nlp, get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag, get_spacy_tokenizer, ensure_model_loaded,
+    is_served_by_workers
+)
+from app.services.bilstm_service import _tokenize, _encode, _decode_scored, _tags_to_spans, _worker_models
+from app.services.spacy_service import _extract_sync as _spacy_spans_sync, _worker_spacy_nlp
+from app.services.spans import unique_locations
+
+CONFIDENCE_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 0.999, 1.0)
+
+CASCADE_REQUESTS = registry.register(CounterFamily(
+    "cascade_requests_total", "Cascade requests, by outcome (accepted: BiLSTM-CRF result kept; escalated: re-run with spaCy).", ("outcome",)))
+CASCADE_CONFIDENCE = registry.register(HistogramFamily(
+    "cascade_confidence", "Document confidence of the BiLSTM-CRF result (lowest token marginal).", (), CONFIDENCE_BUCKETS))
+
+def _bilstm_scored_sync(bilstm_model, spacy_tokenizer, word2idx: Dict[str, int], idx2tag: Dict[int, str], text: str) -> Dict[str, Any]:
+    """
+    BiLSTM-CRF spans of one text with confidence scores. Blocking.
+    Each span's confidence is the lowest marginal probability of its tokens' predicted tags;
+    the document's is the lowest over all tokens, so an uncertain "O" (a possibly missed location) counts too.
+    """
+    with stage_timer("cascade", "bilstm"):
+        tokens, offsets = _tokenize(spacy_tokenizer, text)
+        if not tokens:
+            return {"spans": [], "confidence": 1.0, "truncated": False}
+        word_ids = _encode(tokens, word2idx)
+        tag_ids, confidences = _decode_scored(bilstm_model, word_ids)
+        spans = [
+            {**span, "confidence": min(confidences[span["token_start"]:span["token_end"]])}
+            for span in _tags_to_spans(offsets[:len(word_ids)], tag_ids, idx2tag, text)
+        ]
+    return {"spans": spans, "confidence": min(confidences), "truncated": len(tokens) > BILSTM_MAX_SEQ_LEN}
+
+def _spacy_escalation_sync(spacy_nlp_instance, text: str) -> List[Dict[str, Any]]:
+    """spaCy spans of an escalated text (no confidence score). Blocking."""
+    with stage_timer("cascade", "spacy"):
+        return [{**span, "confidence": None} for span in _spacy_spans_sync(spacy_nlp_instance, text)]
+
+# Stage metrics recorded in a worker process stay there, so the worker jobs also return their duration
+# and the API process records it, for the same /stats/cascade figures with either inference engine.
+
+def _bilstm_scored_in_worker(text: str) -> Tuple[Dict[str, Any], float]:
+    """Process-engine job: _bilstm_scored_sync with the worker's own BiLSTM-CRF replica, and its duration."""
+    models = _worker_models()
+    started = time.perf_counter()
+    return _bilstm_scored_sync(*models, text), time.perf_counter() - started
+
+def _spacy_escalation_in_worker(text: str) -> Tuple[List[Dict[str, Any]], float]:
+    """Process-engine job: _spacy_escalation_sync with the worker's own spaCy replica, and its duration."""
+    spacy_nlp_instance = _worker_spacy_nlp()
+    started = time.perf_counter()
+    return _spacy_escalation_sync(spacy_nlp_instance, text), time.perf_counter() - started
+
+async def extract_locations_with_cascade(text: str, threshold: float = CASCADE_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """
+    Extracts locations with the BiLSTM-CRF and escalates to spaCy only when the BiLSTM-CRF is unsure:
+    when the document confidence (see _bilstm_scored_sync) is below `threshold`, or the text was truncated.
+    If spaCy is not available, the BiLSTM-CRF result is returned as is.
+    """
+    await ensure_model_loaded("bilstm")
+    bilstm_model = get_bilstm_model()
+    word2idx = get_bilstm_word2idx()
+    idx2tag = get_bilstm_idx2tag()
+    spacy_tokenizer = get_spacy_tokenizer()
+
+    if not is_served_by_workers("bilstm") and (bilstm_model is None or word2idx is None or idx2tag is None or spacy_tokenizer is None):
+        logger.warning("Cascade extraction requested but the BiLSTM-CRF model or its tokenizer is not loaded.")
+        return {"error": "Cascade extraction needs the BiLSTM-CRF model, which is not available.", "status_code": 503}
+
+    try:
+        if INFERENCE_ENGINE == "processes":
+            scored, seconds = await get_process_engine().run(_bilstm_scored_in_worker, text)
+            observe_stage("cascade", "bilstm", seconds)
+        else:
+            scored = await get_inference_executor().run(_bilstm_scored_sync, bilstm_model, spacy_tokenizer, word2idx, idx2tag, text)
+        CASCADE_CONFIDENCE.observe(value=scored["confidence"])
+        spans, model_used, escalated = scored["spans"], "Cascade (BiLSTM-CRF)", False
+
+        if scored["confidence"] < threshold or scored["truncated"]:
+            await ensure_model_loaded("spacy")
+            spacy_nlp_instance = get_spacy_nlp()
+            if spacy_nlp_instance is None and not is_served_by_workers("spacy"):
+                logger.warning("Cascade could not escalate to spaCy because it is not loaded; keeping the BiLSTM-CRF result.")
+                CASCADE_REQUESTS.inc("escalation_unavailable")
+            else:
+                if INFERENCE_ENGINE == "processes":
+                    spans, seconds = await get_process_engine().run(_spacy_escalation_in_worker, text)
+                    observe_stage("cascade", "spacy", seconds)
+                else:
+                    spans = await get_inference_executor().run(_spacy_escalation_sync, spacy_nlp_instance, text)
+                model_used, escalated = "Cascade (BiLSTM-CRF → spaCy)", True
+                CASCADE_REQUESTS.inc("escalated")
+        else:
+            CASCADE_REQUESTS.inc("accepted")
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during cascade processing: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred during cascade extraction: {str(e)}", "status_code": 500}
+
+    locations = unique_locations(spans)
+    request_logger.info(
+        "Cascade extracted: %s from text: '%.70s...' (confidence %.3f, escalated: %s)",
+        locations, text, scored["confidence"], escalated
+    )
+    return {
+        "locations": locations,
+        "spans": spans,
+        "model_used": model_used,
+        "confidence": scored["confidence"],
+        "escalated": escalated
+    }
+
+def _mean_stage_seconds(stage: str) -> Optional[float]:
+    snapshot = STAGE_LATENCY.labels("cascade", stage).snapshot()
+    return snapshot["sum"] / snapshot["count"] if snapshot["count"] else None
+
+def cascade_stats() -> Dict[str, Any]:
+    """
+    Escalation rate and latency of the cascade. The latency saved is estimated as the mean spaCy time of
+    escalated requests, times the requests that did not need spaCy.
+    """
+    accepted, escalated = CASCADE_REQUESTS.value("accepted"), CASCADE_REQUESTS.value("escalated")
+    unavailable = CASCADE_REQUESTS.value("escalation_unavailable")
+    requests = accepted + escalated + unavailable
+    bilstm_seconds, spacy_seconds = _mean_stage_seconds("bilstm"), _mean_stage_seconds("spacy")
+    return {
+        "threshold": CASCADE_CONFIDENCE_THRESHOLD,
+        "requests": int(requests),
+        "accepted": int(accepted),
+        "escalated": int(escalated),
+        "escalation_unavailable": int(unavailable),
+        "escalation_rate": escalated / requests if requests else 0.0,
+        "mean_bilstm_seconds": bilstm_seconds,
+        "mean_spacy_seconds": spacy_seconds,
+        "estimated_saved_seconds": accepted * spacy_seconds if spacy_seconds is not None else None,
+    }
@@ -0,0 +1,67 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core.config import request_logger, REQUEST_COALESCING_ENABLED
+from app.core.metrics import registry, CounterFamily, CallbackFamily
+
+COALESCED_REQUESTS = registry.register(CounterFamily(
+    "coalesced_requests_total", "Requests answered by an identical request that was already in flight, instead of running their own extraction.", ("backend",)))
+
+class SingleFlight:
+    """
+    Request coalescing ("single flight").
+    The first caller of run() with a given key starts the extraction as its own task; callers with the
+    same key that arrive while it is running await that task instead of starting another one, and get
+    a copy of its result. The key is forgotten as soon as the task finishes, so this only merges
+    requests that overlap in time: later repeats go to the result cache.
+
+    The shared task is shielded, so a caller that disconnects does not cancel the extraction for the others.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    async def run(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Returns the result of `fn(*args)`, shared with every concurrent call with the same key."""
+        if not REQUEST_COALESCING_ENABLED:
+            return await fn(*args)
+
+        task = self._in_flight.get(key)
+        if task is not None and not task.done():
+            self._coalesced += 1
+            COALESCED_REQUESTS.inc(self.name)
+            request_logger.info("%s request coalesced with an identical in-flight request.", self.name)
+            return copy.deepcopy(await asyncio.shield(task)) # Callers own their result
+
+        task = asyncio.get_running_loop().create_task(fn(*args))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        self._leaders += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Extractions started, requests that joined one in flight, and keys in flight right now."""
+        total = self._leaders + self._coalesced
+        return {
+            "extractions": self._leaders,
+            "coalesced": self._coalesced,
+            "coalesced_rate": self._coalesced / total if total else 0.0,
+            "in_flight": len(self._in_flight),
+        }
+
+spacy_flights = SingleFlight("spacy")
+bilstm_flights = SingleFlight("bilstm")
+
+def coalescing_stats() -> Dict[str, Any]:
+    return {"enabled": REQUEST_COALESCING_ENABLED, "spacy": spacy_flights.stats(), "bilstm": bilstm_flights.stats()}
+
+registry.register(CallbackFamily(
+    "coalescing_in_flight", "Distinct extractions in flight that identical requests can join.", ("backend",),
+    lambda: [((flights.name,), flights.stats()["in_flight"]) for flights in (spacy_flights, bilstm_flights)]))
@@ -0,0 +1,155 @@
+import asyncio
+from typing import List, Dict, Any, Tuple
+
+from app.core.config import (
+    logger, request_logger, BILSTM_MAX_SEQ_LEN, ENSEMBLE_DEFAULT_POLICY, ENSEMBLE_VOTE_WEIGHTS, ENSEMBLE_VOTE_THRESHOLD,
+    INFERENCE_ENGINE
+)
+from app.core.executor import get_ensemble_executor, ExecutorSaturatedError, overload_result
+from app.core.metrics import stage_timer
+from app.core.process_engine import get_process_engine
+from app.models.loaders import (
+    get_spacy_nlp, get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag, ensure_model_loaded, is_served_by_workers
+)
+from app.services.bilstm_service import _encode, _decode_batch, _decode_long_document, _tags_to_spans, _worker_models
+from app.services.spacy_service import _spans_from_doc, _worker_spacy_nlp
+from app.services.spans import unique_locations
+
+ENSEMBLE_POLICIES = ("union", "intersection", "vote")
+
+def _tokenize_sync(spacy_nlp_instance, word2idx: Dict[str, int], text: str):
+    """
+    Tokenizes once for both models. Returns the Doc (for spaCy NER), the Doc indices of the
+    non-whitespace tokens with their character offsets, and their BiLSTM word IDs. Blocking.
+    """
+    with stage_timer("ensemble", "tokenize"):
+        doc = spacy_nlp_instance.make_doc(text)
+        kept = [token for token in doc if token.text.strip()]
+        offsets = [(token.idx, token.idx + len(token.text)) for token in kept]
+    word_ids = _encode([token.text for token in kept], word2idx, truncate=False)
+    return doc, [token.i for token in kept], offsets, word_ids
+
+def _spacy_spans_sync(spacy_nlp_instance, doc) -> List[Dict[str, Any]]:
+    """Runs the spaCy pipeline components (NER) on an already tokenized Doc. Blocking."""
+    with stage_timer("spacy", "pipeline"):
+        for _, component in spacy_nlp_instance.pipeline:
+            doc = component(doc)
+    return _spans_from_doc(doc)
+
+def _bilstm_spans_sync(bilstm_model, word2idx: Dict[str, int], idx2tag: Dict[int, str], text: str,
+                       doc_indices: List[int], offsets: List[Tuple[int, int]], word_ids: List[int]) -> List[Dict[str, Any]]:
+    """Decodes the shared tokens with the BiLSTM-CRF (windowed beyond BILSTM_MAX_SEQ_LEN). Blocking."""
+    if not word_ids:
+        return []
+    if len(word_ids) > BILSTM_MAX_SEQ_LEN:
+        tag_ids = _decode_long_document(bilstm_model, word2idx, word_ids)
+    else:
+        tag_ids = _decode_batch(bilstm_model, [word_ids], word2idx)[0]
+    # Token indices of BiLSTM spans skip whitespace tokens; map them to Doc token indices like spaCy's
+    return [
+        {**span, "token_start": doc_indices[span["token_start"]], "token_end": doc_indices[span["token_end"] - 1] + 1}
+        for span in _tags_to_spans(offsets, tag_ids, idx2tag, text)
+    ]
+
+def _spacy_spans_in_worker(text: str) -> List[Dict[str, Any]]:
+    """Process-engine job: tokenizes `text` and runs spaCy NER on it, with the worker's own replica."""
+    spacy_nlp_instance = _worker_spacy_nlp()
+    with stage_timer("ensemble", "tokenize"):
+        doc = spacy_nlp_instance.make_doc(text)
+    return _spacy_spans_sync(spacy_nlp_instance, doc)
+
+def _bilstm_spans_in_worker(text: str) -> List[Dict[str, Any]]:
+    """
+    Process-engine job: tokenizes `text` and decodes it with the worker's own BiLSTM-CRF replica.
+    The worker's spaCy tokenizer splits the text exactly like the spaCy job's, so token indices agree.
+    """
+    bilstm_model, spacy_tokenizer, word2idx, idx2tag = _worker_models()
+    _, doc_indices, offsets, word_ids = _tokenize_sync(spacy_tokenizer, word2idx, text)
+    return _bilstm_spans_sync(bilstm_model, word2idx, idx2tag, text, doc_indices, offsets, word_ids)
+
+def merge_spans(spans_by_model: Dict[str, List[Dict[str, Any]]], policy: str = ENSEMBLE_DEFAULT_POLICY,
+                weights: Dict[str, float] = ENSEMBLE_VOTE_WEIGHTS, threshold: float = ENSEMBLE_VOTE_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Merges the spans of several models. Overlapping spans (from any model) form one cluster, and
+    each kept cluster yields one span: the one from the highest-weight model, longest on ties,
+    with a "sources" list of the models that found it.
+    - "union": every cluster is kept.
+    - "intersection": clusters found by every model are kept.
+    - "vote": clusters whose models' summed weights reach `threshold` are kept.
+    """
+    if policy not in ENSEMBLE_POLICIES:
+        raise ValueError(f"Unknown ensemble policy '{policy}'. Expected one of {ENSEMBLE_POLICIES}.")
+
+    ordered = sorted(
+        ((span["start"], -span["end"], model, span) for model, spans in spans_by_model.items() for span in spans),
+        key=lambda item: item[:2]
+    )
+    clusters: List[List[Tuple[str, Dict[str, Any]]]] = []
+    cluster_end = -1
+    for start, _, model, span in ordered:
+        if clusters and start < cluster_end:
+            clusters[-1].append((model, span))
+            cluster_end = max(cluster_end, span["end"])
+        else:
+            clusters.append([(model, span)])
+            cluster_end = span["end"]
+
+    merged = []
+    for cluster in clusters:
+        models = {model for model, _ in cluster}
+        if policy == "intersection" and len(models) < len(spans_by_model):
+            continue
+        if policy == "vote" and sum(weights.get(model, 0.0) for model in models) < threshold:
+            continue
+        _, best = max(cluster, key=lambda item: (weights.get(item[0], 0.0), item[1]["end"] - item[1]["start"]))
+        merged.append({**best, "sources": sorted(models)})
+    return merged
+
+async def extract_locations_with_ensemble(text: str, policy: str = ENSEMBLE_DEFAULT_POLICY) -> Dict[str, Any]:
+    """
+    Extracts locations with spaCy and the BiLSTM-CRF at the same time and merges their spans.
+    The text is tokenized once; spaCy NER runs on that Doc and the BiLSTM-CRF decodes its tokens,
+    each on its own executor, so latency follows the slower model rather than the sum of both.
+    With the process engine, each model runs as its own job in a worker process, which tokenizes the text itself.
+    """
+    await asyncio.gather(ensure_model_loaded("spacy"), ensure_model_loaded("bilstm"))
+    spacy_nlp_instance = get_spacy_nlp()
+    bilstm_model = get_bilstm_model()
+    word2idx = get_bilstm_word2idx()
+    idx2tag = get_bilstm_idx2tag()
+
+    in_workers = is_served_by_workers("spacy") and is_served_by_workers("bilstm")
+    if not in_workers and (spacy_nlp_instance is None or bilstm_model is None or word2idx is None or idx2tag is None):
+        logger.warning("Ensemble extraction requested but the spaCy or BiLSTM-CRF model is not loaded.")
+        return {"error": "Ensemble extraction needs both the spaCy and BiLSTM-CRF models, and at least one is not available.", "status_code": 503}
+
+    spacy_executor = get_ensemble_executor("spacy")
+    try:
+        if INFERENCE_ENGINE == "processes":
+            engine = get_process_engine()
+            spacy_spans, bilstm_spans = await asyncio.gather(
+                engine.run(_spacy_spans_in_worker, text), engine.run(_bilstm_spans_in_worker, text)
+            )
+        else:
+            doc, doc_indices, offsets, word_ids = await spacy_executor.run(_tokenize_sync, spacy_nlp_instance, word2idx, text)
+            spacy_spans, bilstm_spans = await asyncio.gather(
+                spacy_executor.run(_spacy_spans_sync, spacy_nlp_instance, doc),
+                get_ensemble_executor("bilstm").run(_bilstm_spans_sync, bilstm_model, word2idx, idx2tag, text, doc_indices, offsets, word_ids)
+            )
+        spans = merge_spans({"spacy": spacy_spans, "bilstm": bilstm_spans}, policy)
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during ensemble processing: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred during ensemble extraction: {str(e)}", "status_code": 500}
+
+    locations = unique_locations(spans)
+    request_logger.info(
+        "Ensemble (%s) extracted: %s from text: '%.70s...' (spaCy %d spans, BiLSTM-CRF %d spans)",
+        policy, locations, text, len(spacy_spans), len(bilstm_spans)
+    )
+    return {
+        "locations": locations,
+        "spans": spans,
+        "model_used": f"Ensemble (spaCy + BiLSTM-CRF, {policy})"
+    }
@@ -0,0 +1,44 @@
+# app/services/gazetteer_service.py
+from typing import List, Dict, Any
+from app.core.config import logger, request_logger, GAZETTEER_INLINE_MAX_CHARS
+from app.core.executor import get_inference_executor, ExecutorSaturatedError, overload_result
+from app.core.metrics import stage_timer
+from app.models.gazetteer import GazetteerMatcher
+from app.models.loaders import get_gazetteer, ensure_model_loaded
+from app.services.spans import unique_locations
+
+def _result_from_spans(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"locations": unique_locations(spans), "spans": spans, "model_used": "Gazetteer"}
+
+def _match_sync(matcher: GazetteerMatcher, text: str) -> List[Dict[str, Any]]:
+    """Location spans of the gazetteer names in one text."""
+    with stage_timer("gazetteer", "match"):
+        return matcher.find(text)
+
+async def extract_locations_with_gazetteer(text: str) -> Dict[str, Any]:
+    """
+    Extracts the known place names of the gazetteer from the text, without a model.
+    Short texts are matched on the event loop, since that is cheaper than handing them to
+    a worker thread; texts longer than GAZETTEER_INLINE_MAX_CHARS go to the inference executor.
+    """
+    await ensure_model_loaded("gazetteer")
+    matcher = get_gazetteer()
+
+    if matcher is None:
+        logger.warning("Gazetteer requested for extraction but not loaded.")
+        return {"error": "Gazetteer is not available or not loaded.", "status_code": 503}
+
+    try:
+        if len(text) <= GAZETTEER_INLINE_MAX_CHARS:
+            spans = _match_sync(matcher, text)
+        else:
+            spans = await get_inference_executor().run(_match_sync, matcher, text)
+        result = _result_from_spans(spans)
+
+        request_logger.info("Gazetteer extracted: %s from text: '%.70s...'", result["locations"], text)
+        return result
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during gazetteer matching: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred while matching the gazetteer: {str(e)}", "status_code": 500}
@@ -0,0 +1,160 @@
+"""
+Candidate pre-filter: answers texts that cannot contain a location with an empty result,
+without running spaCy or the BiLSTM-CRF.
+
+A text is a candidate if any of these cheap lexical signals fires:
+* a capitalized word that does not start a sentence (and is not "I", a weekday or a month);
+* a word of the location lexicon (PREFILTER_LEXICON_PATH), case-insensitively;
+* a gazetteer name, when the gazetteer backend is loaded.
+
+For a sample of the skipped texts (PREFILTER_AUDIT_SAMPLE_RATE), the full model still runs in the
+background, and any location it finds is counted as a false negative of the filter.
+
+Build the lexicon from a tagged training corpus (one "token tag" pair per line):
+    python -m app.services.prefilter train.conll
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from app.core.config import (
+    logger, PREFILTER_ENABLED, PREFILTER_LEXICON_PATH, PREFILTER_AUDIT_SAMPLE_RATE, WORD2IDX_PATH
+)
+from app.core.executor import InferenceExecutor, get_inference_executor, ExecutorSaturatedError
+from app.core.metrics import registry, stage_timer, CounterFamily
+from app.models.loaders import get_gazetteer
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+_SENTENCE_BREAK = re.compile(r"[.!?\n]")
+_NON_LOCATION_CAPITALIZED = frozenset({
+    "I", "I'm", "I’m", "I've", "I’ve", "I'll", "I’ll", "I'd", "I’d",
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+    "January", "February", "March", "April", "May", "June", "July", "August",
+    "September", "October", "November", "December",
+})
+
+PREFILTER_DECISIONS = registry.register(CounterFamily(
+    "prefilter_decisions_total", "Texts checked by the candidate pre-filter, by decision (skipped or passed).", ("backend", "decision")))
+PREFILTER_AUDITS = registry.register(CounterFamily(
+    "prefilter_audits_total", "Skipped texts re-checked with the full model, by outcome (true_negative or false_negative).", ("backend", "outcome")))
+
+_audit_tasks = set() # Keeps references to running background audits
+
+@functools.lru_cache(maxsize=1)
+def get_location_lexicon() -> FrozenSet[str]:
+    """Case-folded words that were tagged as (part of) a location in training, if the lexicon file exists."""
+    if not os.path.exists(PREFILTER_LEXICON_PATH):
+        return frozenset()
+    with open(PREFILTER_LEXICON_PATH, encoding="utf-8") as f:
+        lexicon = frozenset(line.strip().casefold() for line in f if line.strip())
+    logger.info("Loaded %d pre-filter lexicon words from %s", len(lexicon), PREFILTER_LEXICON_PATH)
+    return lexicon
+
+def has_location_candidate(text: str, lexicon: FrozenSet[str] = frozenset(), gazetteer=None) -> bool:
+    """True if any of the pre-filter's lexical signals fires on `text` (see the module docstring)."""
+    previous_end = 0
+    for match in _WORD_PATTERN.finditer(text):
+        word = match.group()
+        sentence_start = previous_end == 0 or _SENTENCE_BREAK.search(text, previous_end, match.start()) is not None
+        if word[0].isupper() and not sentence_start and word not in _NON_LOCATION_CAPITALIZED:
+            return True
+        if word.casefold() in lexicon:
+            return True
+        previous_end = match.end()
+    return gazetteer is not None and bool(gazetteer.find(text))
+
+def _skips(backend: str, text: str) -> bool:
+    with stage_timer(backend, "prefilter"):
+        skip = not has_location_candidate(text, get_location_lexicon(), get_gazetteer())
+    PREFILTER_DECISIONS.inc(backend, "skipped" if skip else "passed")
+    return skip
+
+async def _audit(backend: str, text: str, extract_spans: Callable[[str], List[Dict[str, Any]]],
+                 executor: Optional[InferenceExecutor]) -> None:
+    try:
+        spans = await (executor or get_inference_executor()).run(extract_spans, text)
+    except ExecutorSaturatedError:
+        return # Audits never take executor capacity that requests need
+    except Exception as e:
+        logger.warning("Pre-filter audit with %s failed: %s", backend, e)
+        return
+    PREFILTER_AUDITS.inc(backend, "false_negative" if spans else "true_negative")
+    if spans:
+        logger.warning("Pre-filter skipped a text in which %s finds %s: '%.70s...'", backend, [span["text"] for span in spans], text)
+
+def _maybe_audit(backend: str, text: str, extract_spans: Callable[[str], List[Dict[str, Any]]],
+                 executor: Optional[InferenceExecutor]) -> None:
+    if PREFILTER_AUDIT_SAMPLE_RATE > 0 and random.random() < PREFILTER_AUDIT_SAMPLE_RATE:
+        task = asyncio.get_running_loop().create_task(_audit(backend, text, extract_spans, executor))
+        _audit_tasks.add(task)
+        task.add_done_callback(_audit_tasks.discard)
+
+def prefilter_skips(backend: str, text: str, extract_spans: Callable[[str], List[Dict[str, Any]]],
+                    executor: Optional[InferenceExecutor] = None) -> bool:
+    """
+    True if the pre-filter is enabled and `text` has no location candidate, so `backend` can be skipped.
+    `extract_spans(text)` is the backend's blocking span extraction, used to audit a sample of skipped
+    texts on `executor` (the inference executor by default).
+    """
+    if not PREFILTER_ENABLED:
+        return False
+    skip = _skips(backend, text)
+    if skip:
+        _maybe_audit(backend, text, extract_spans, executor)
+    return skip
+
+def prefilter_candidates(backend: str, texts: List[str], extract_spans: Callable[[str], List[Dict[str, Any]]],
+                         executor: Optional[InferenceExecutor] = None) -> List[int]:
+    """Positions of the texts of a batch that need the model (all of them when the pre-filter is disabled)."""
+    return [i for i, text in enumerate(texts) if not prefilter_skips(backend, text, extract_spans, executor)]
+
+def fill_skipped(num_texts: int, positions: List[int], results: List[Any], empty_result: Dict[str, Any]) -> List[Any]:
+    """Merges the model results of `positions` with `empty_result` for the skipped texts, in input order."""
+    merged = [empty_result] * num_texts
+    for position, result in zip(positions, results):
+        merged[position] = result
+    return merged
+
+def prefilter_stats() -> Dict[str, Any]:
+    """Skip rate and audited false-negative rate per backend."""
+    stats = {"enabled": PREFILTER_ENABLED, "audit_sample_rate": PREFILTER_AUDIT_SAMPLE_RATE, "backends": {}}
+    for backend in ("spacy", "bilstm"):
+        skipped, passed = PREFILTER_DECISIONS.value(backend, "skipped"), PREFILTER_DECISIONS.value(backend, "passed")
+        false_negatives = PREFILTER_AUDITS.value(backend, "false_negative")
+        audited = false_negatives + PREFILTER_AUDITS.value(backend, "true_negative")
+        stats["backends"][backend] = {
+            "checked": int(skipped + passed),
+            "skipped": int(skipped),
+            "skip_rate": skipped / (skipped + passed) if skipped + passed else 0.0,
+            "audited": int(audited),
+            "false_negatives": int(false_negatives),
+            "false_negative_rate": false_negatives / audited if audited else None,
+        }
+    return stats
+
+def main():
+    from app.models.loaders import read_pickled_word2idx
+
+    parser = argparse.ArgumentParser(description="Build the pre-filter lexicon from a tagged training corpus.")
+    parser.add_argument("corpus", help="Tagged corpus: one 'token tag' pair per line (whitespace-separated), blank lines between sentences")
+    parser.add_argument("--output", default=PREFILTER_LEXICON_PATH)
+    args = parser.parse_args()
+
+    word2idx = read_pickled_word2idx(WORD2IDX_PATH)
+    words = set()
+    with open(args.corpus, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            # Only capitalized location tokens: "of" in "Gulf of Mexico" would make every text a candidate
+            if len(parts) >= 2 and "LOC" in parts[-1] and parts[0] in word2idx and parts[0][:1].isupper():
+                words.add(parts[0])
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("\n".join(sorted(words)) + "\n")
+    print(f"Wrote {len(words)} location words of the BiLSTM vocabulary to {args.output}")
+
+if __name__ == "__main__":
+    main()
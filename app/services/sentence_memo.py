@@ -0,0 +1,117 @@
+import asyncio
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.cache import get_sentence_cache, result_cache_key
+from app.core.config import request_logger, RESULT_CACHE_ENABLED
+from app.core.executor import InferenceExecutor, get_inference_executor
+from app.services.spans import shift_span, unique_locations
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by whitespace and an
+# upper-case letter, digit or opening quote; a line break always ends a sentence, so
+# datelines, bylines and footers on their own lines are memoized separately.
+_BOUNDARY = re.compile(r"([.!?]+[\"'”’)\]]*)\s+(?=[\"'“‘(\[]?[A-Z0-9])|\n+")
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "st", "sr", "jr", "mt", "ft", "gen", "col", "lt", "sgt", "capt",
+    "gov", "sen", "rep", "rev", "no", "vs", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "approx", "dept", "est", "fig",
+}
+
+def _is_abbreviation(word: str) -> bool:
+    """True for words like 'Mr', 'St', single initials ('J') and dotted abbreviations ('U.S')."""
+    word = word.lstrip("\"'(“‘[")
+    return word.lower() in _ABBREVIATIONS or len(word) == 1 and word.isalpha() or "." in word
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Rule-based sentence splitter. Returns (start, end) character ranges, stripped of surrounding whitespace."""
+    ranges: List[Tuple[int, int]] = []
+
+    def add(start: int, end: int) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            ranges.append((start, end))
+
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        if match.group(1) is not None:
+            if match.group(1) == ".":
+                preceding = text[start:match.start(1)].rsplit(None, 1)
+                if preceding and _is_abbreviation(preceding[-1]):
+                    continue
+            add(start, match.end(1))
+        else:
+            add(start, match.start())
+        start = match.end()
+    add(start, len(text))
+    return ranges
+
+async def extract_by_sentence(backend: str, model_version: Optional[str], text: str,
+                              spans_batch_fn: Callable[..., List[Dict[str, Any]]], *fn_args,
+                              executor: Optional[InferenceExecutor] = None,
+                              gap_tokens_fn: Optional[Callable[..., List[int]]] = None) -> Dict[str, Any]:
+    """
+    Sentence-level memoization for one document.
+    Splits `text` into sentences and looks each one up in the sentence cache. The missing sentences
+    (each distinct sentence once) go through `spans_batch_fn(*fn_args, sentences)` as one batch on
+    `executor` (the inference executor by default); it must return, per sentence, {"spans": [...],
+    "tokens": n} with span offsets and token indices relative to the sentence. Spans are shifted back
+    to document offsets (token indices count the tokens of the preceding sentences and gaps) and
+    returned together with the unique locations in order of appearance.
+    For tokenizers that turn whitespace into tokens (spaCy), `gap_tokens_fn(*fn_args, gaps)` runs on
+    the same executor and returns how many tokens the whitespace before each sentence makes; each gap
+    is that whitespace with the neighbouring character on both sides (so a lone space between two
+    sentences, which spaCy attaches to the preceding token, can be told apart from a token).
+    Without a model version (model not loaded through the loaders) or with RESULT_CACHE_ENABLED off,
+    nothing is cached.
+    """
+    cache = get_sentence_cache()
+    model_version = model_version if RESULT_CACHE_ENABLED else None
+    sentence_ranges = split_sentences(text)
+    sentences = [text[start:end] for start, end in sentence_ranges]
+
+    sentence_results: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for sentence in dict.fromkeys(sentences): # Distinct sentences, in order
+        cached = await cache.aget(result_cache_key(backend, model_version, sentence, "sentence")) if model_version else None
+        if cached is not None:
+            sentence_results[sentence] = cached
+        else:
+            missing.append(sentence)
+
+    executor = executor or get_inference_executor()
+    jobs = [executor.run(spans_batch_fn, *fn_args, missing)] if missing else []
+    count_gaps = gap_tokens_fn is not None and bool(sentences)
+    if count_gaps:
+        previous_ends = [0] + [end for _, end in sentence_ranges[:-1]]
+        gaps = [text[max(0, previous_end - 1):start + 1] for previous_end, (start, _) in zip(previous_ends, sentence_ranges)]
+        jobs.append(executor.run(gap_tokens_fn, *fn_args, gaps))
+    job_results = await asyncio.gather(*jobs)
+    computed = job_results[0] if missing else []
+    gap_tokens = job_results[-1] if count_gaps else [0] * len(sentences)
+
+    for sentence, sentence_result in zip(missing, computed):
+        sentence_results[sentence] = sentence_result
+        if model_version:
+            await cache.aset(result_cache_key(backend, model_version, sentence, "sentence"), sentence_result)
+
+    spans = []
+    token_offset = 0
+    for (sentence_start, _), sentence, preceding_tokens in zip(sentence_ranges, sentences, gap_tokens):
+        sentence_result = sentence_results[sentence]
+        token_offset += preceding_tokens
+        spans.extend(shift_span(span, sentence_start, token_offset) for span in sentence_result["spans"])
+        token_offset += sentence_result["tokens"]
+
+    request_logger.info(
+        "%s sentence mode: %d sentences, %d distinct cached, %d sent to the model.",
+        backend, len(sentences), len(sentence_results) - len(missing), len(missing)
+    )
+    return {
+        "locations": unique_locations(spans),
+        "spans": spans,
+        "sentences": len(sentences),
+        "sentences_computed": len(missing),
+    }
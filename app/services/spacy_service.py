@@ -1,30 +1,205 @@
-# app/services/spacy_service.py 
+# app/services/spacy_service.py
+import functools
 from typing import List, Dict, Any
-from app.core.config import logger
-from app.models.loaders import get_spacy_nlp
+from app.core.config import logger, request_logger, SPACY_BATCH_SIZE, RESULT_CACHE_ENABLED, INFERENCE_ENGINE
+from app.core.cache import get_result_cache, result_cache_key
+from app.core.executor import get_inference_executor, ExecutorSaturatedError, overload_result
+from app.core.metrics import stage_timer, TOKEN_LENGTH
+from app.core.process_engine import get_process_engine
+from app.models.loaders import get_spacy_nlp, ensure_model_loaded, get_model_version, is_served_by_workers
+from app.services.coalescing import spacy_flights
+from app.services.prefilter import prefilter_skips, prefilter_candidates, fill_skipped
+from app.services.sentence_memo import extract_by_sentence
+from app.services.spans import make_span, unique_locations
 
-async def extract_locations_with_spacy(text: str) -> Dict[str, Any]:
+SPACY_LOCATION_LABELS = ["LOCATION", "LOC", "GPE"]
+
+def _spans_from_doc(doc) -> List[Dict[str, Any]]:
+    """Returns the location entities of a processed doc as spans, in order of appearance."""
+    TOKEN_LENGTH.observe("spacy", value=len(doc))
+    with stage_timer("spacy", "postprocess"):
+        return [
+            make_span(ent.start_char, ent.end_char, ent.text, ent.label_, ent.start, ent.end)
+            for ent in doc.ents if ent.label_.upper() in SPACY_LOCATION_LABELS
+        ]
+
+def _result_from_spans(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"locations": unique_locations(spans), "spans": spans, "model_used": "spaCy"}
+
+def _extract_sync(spacy_nlp_instance, text: str) -> List[Dict[str, Any]]:
+    """Runs the spaCy pipeline on one text and returns its location spans. Blocking; called on the inference executor."""
+    with stage_timer("spacy", "pipeline"):
+        doc = spacy_nlp_instance(text)
+    return _spans_from_doc(doc)
+
+def _extract_batch_sync(spacy_nlp_instance, texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """Runs nlp.pipe over a batch of texts. Blocking; called on the inference executor."""
+    try:
+        with stage_timer("spacy", "pipeline"):
+            docs = list(spacy_nlp_instance.pipe(texts, batch_size=batch_size))
+        return [_result_from_spans(_spans_from_doc(doc)) for doc in docs]
+    except Exception as e_pipe:
+        # nlp.pipe fails the whole batch on a single bad text, so retry item by item
+        # to find out which texts are at fault.
+        logger.warning("SpaCy batch pipe failed (%s), falling back to per-text processing.", e_pipe)
+
+    results = []
+    for text in texts:
+        try:
+            results.append(_result_from_spans(_extract_sync(spacy_nlp_instance, text)))
+        except Exception as e:
+            logger.error("Error during spaCy model processing: %s", e, exc_info=True)
+            results.append({"error": f"An unexpected error occurred while processing with spaCy: {str(e)}", "status_code": 500})
+    return results
+
+def _worker_model_missing_result() -> Dict[str, Any]:
+    return {"error": "SpaCy model is not available in the inference worker.", "status_code": 503}
+
+def _extract_in_worker(text: str) -> Dict[str, Any]:
+    """Process-engine job: result of one text, with the worker's own spaCy replica."""
+    spacy_nlp_instance = get_spacy_nlp()
+    if spacy_nlp_instance is None:
+        return _worker_model_missing_result()
+    return _result_from_spans(_extract_sync(spacy_nlp_instance, text))
+
+def _extract_batch_in_worker(texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """Process-engine job: results of a chunk of texts, with the worker's own spaCy replica."""
+    spacy_nlp_instance = get_spacy_nlp()
+    if spacy_nlp_instance is None:
+        return [_worker_model_missing_result() for _ in texts]
+    return _extract_batch_sync(spacy_nlp_instance, texts, batch_size)
+
+def _sentence_spans_batch_sync(spacy_nlp_instance, sentences: List[str]) -> List[Dict[str, Any]]:
+    """Sentence-relative location spans and token count of each sentence, via nlp.pipe. Blocking."""
+    with stage_timer("spacy", "pipeline"):
+        docs = list(spacy_nlp_instance.pipe(sentences, batch_size=SPACY_BATCH_SIZE))
+    return [{"spans": _spans_from_doc(doc), "tokens": len(doc)} for doc in docs]
+
+def _gap_tokens_sync(spacy_nlp_instance, gaps: List[str]) -> List[int]:
+    """Whitespace tokens spaCy makes in each gap between sentences (see extract_by_sentence). Blocking."""
+    return [sum(token.is_space for token in spacy_nlp_instance.make_doc(gap)) for gap in gaps]
+
+def _worker_spacy_nlp():
+    spacy_nlp_instance = get_spacy_nlp()
+    if spacy_nlp_instance is None:
+        raise RuntimeError(_worker_model_missing_result()["error"])
+    return spacy_nlp_instance
+
+def _spans_in_worker(text: str) -> List[Dict[str, Any]]:
+    """Process-engine job: location spans of one text (for the pre-filter's audits), with the worker's own spaCy replica."""
+    return _extract_sync(_worker_spacy_nlp(), text)
+
+def _sentence_spans_batch_in_worker(sentences: List[str]) -> List[Dict[str, Any]]:
+    """Process-engine job: _sentence_spans_batch_sync with the worker's own spaCy replica."""
+    return _sentence_spans_batch_sync(_worker_spacy_nlp(), sentences)
+
+def _gap_tokens_in_worker(gaps: List[str]) -> List[int]:
+    """Process-engine job: _gap_tokens_sync with the worker's own spaCy replica."""
+    return _gap_tokens_sync(_worker_spacy_nlp(), gaps)
+
+def _model_jobs(spacy_nlp_instance):
+    """
+    Executor and blocking jobs for the pre-filter's audits and sentence mode (spans, gap tokens): the
+    worker jobs with the process engine, otherwise the in-process functions bound to `spacy_nlp_instance`.
+    """
+    if INFERENCE_ENGINE == "processes":
+        return get_process_engine(), _spans_in_worker, _sentence_spans_batch_in_worker, _gap_tokens_in_worker
+    return (get_inference_executor(), functools.partial(_extract_sync, spacy_nlp_instance),
+            functools.partial(_sentence_spans_batch_sync, spacy_nlp_instance), functools.partial(_gap_tokens_sync, spacy_nlp_instance))
+
+async def extract_locations_with_spacy(text: str, by_sentence: bool = False) -> Dict[str, Any]:
     """
     Extracts locations using the loaded spaCy model.
+    With `by_sentence`, the text is processed sentence by sentence with per-sentence memoization
+    (see app/services/sentence_memo.py), and the result also carries document-level spans.
+    Concurrent calls with the same text and options share one extraction (see app/services/coalescing.py).
     """
+    return await spacy_flights.run((text, by_sentence), _extract_locations_with_spacy, text, by_sentence)
+
+async def _extract_locations_with_spacy(text: str, by_sentence: bool) -> Dict[str, Any]:
+    await ensure_model_loaded("spacy")
     spacy_nlp_instance = get_spacy_nlp()
 
-    if spacy_nlp_instance is None:
+    if spacy_nlp_instance is None and not is_served_by_workers("spacy"):
         logger.warning("SpaCy model requested for extraction but not loaded.")
-        return {"error": "SpaCy model is not available or not loaded.", "status_code": 503} 
+        return {"error": "SpaCy model is not available or not loaded.", "status_code": 503}
+
+    executor, spans_fn, sentence_spans_batch_fn, gap_tokens_fn = _model_jobs(spacy_nlp_instance)
+    if prefilter_skips("spacy", text, spans_fn, executor):
+        return _result_from_spans([])
+
+    if by_sentence:
+        try:
+            result = await extract_by_sentence(
+                "spacy", get_model_version("spacy"), text, sentence_spans_batch_fn, executor=executor, gap_tokens_fn=gap_tokens_fn
+            )
+            result["model_used"] = "spaCy"
+            return result
+        except ExecutorSaturatedError as e:
+            return overload_result(e)
+        except Exception as e:
+            logger.error("Error during spaCy sentence-mode processing: %s", e, exc_info=True)
+            return {"error": f"An unexpected error occurred while processing with spaCy: {str(e)}", "status_code": 500}
+
+    model_version = get_model_version("spacy")
+    cache_key = result_cache_key("spacy", model_version, text) if RESULT_CACHE_ENABLED and model_version else None
+    if cache_key is not None:
+        cached = await get_result_cache().aget(cache_key)
+        if cached is not None:
+            request_logger.info("SpaCy result cache hit for text: '%.70s...'", text)
+            return cached
 
     try:
-        doc = spacy_nlp_instance(text)
-        spacy_found_locs = [ent.text for ent in doc.ents if ent.label_.upper() in ["LOCATION", "LOC", "GPE"]]
+        if INFERENCE_ENGINE == "processes":
+            result = await get_process_engine().run(_extract_in_worker, text)
+            if "error" in result:
+                return result
+        else:
+            result = _result_from_spans(await get_inference_executor().run(_extract_sync, spacy_nlp_instance, text))
+
+        request_logger.info("SpaCy extracted: %s from text: '%.70s...'", result["locations"], text)
+        if cache_key is not None:
+            await get_result_cache().aset(cache_key, result)
+        return result
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
+    except Exception as e:
+        logger.error("Error during spaCy model processing: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred while processing with spaCy: {str(e)}", "status_code": 500}
+
+async def extract_locations_with_spacy_batch(texts: List[str], batch_size: int = SPACY_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Extracts locations from several texts at once using spaCy's nlp.pipe.
+    Returns one result per text, in input order. A text that fails is reported
+    as an error entry without failing the rest of the batch.
+    """
+    await ensure_model_loaded("spacy")
+    spacy_nlp_instance = get_spacy_nlp()
 
-    
-        unique_locs = sorted(list(set(spacy_found_locs)), key=lambda loc: text.find(loc))
+    if spacy_nlp_instance is None and not is_served_by_workers("spacy"):
+        logger.warning("SpaCy model requested for batch extraction but not loaded.")
+        return {"error": "SpaCy model is not available or not loaded.", "status_code": 503}
 
-        logger.info(f"SpaCy extracted: {unique_locs} from text: '{text[:70]}...'")
-        return {
-            "locations": unique_locs,
-            "model_used": "spaCy"
-        }
+    executor, spans_fn, _, _ = _model_jobs(spacy_nlp_instance)
+    positions = prefilter_candidates("spacy", texts, spans_fn, executor)
+    model_texts = [texts[i] for i in positions]
+    try:
+        if not model_texts:
+            results = []
+        elif INFERENCE_ENGINE == "processes":
+            results = await get_process_engine().run_chunked(_extract_batch_in_worker, model_texts, batch_size)
+        else:
+            results = await get_inference_executor().run(_extract_batch_sync, spacy_nlp_instance, model_texts, batch_size)
+    except ExecutorSaturatedError as e:
+        return overload_result(e)
     except Exception as e:
-        logger.error(f"Error during spaCy model processing: {e}", exc_info=True)
-        return {"error": f"An unexpected error occurred while processing with spaCy: {str(e)}", "status_code": 500}
\ No newline at end of file
+        logger.error("Error during spaCy batch processing: %s", e, exc_info=True)
+        return {"error": f"An unexpected error occurred while processing with spaCy: {str(e)}", "status_code": 500}
+    if len(model_texts) < len(texts):
+        results = fill_skipped(len(texts), positions, results, _result_from_spans([]))
+
+    request_logger.info("SpaCy batch processed %d texts.", len(texts))
+    return {
+        "results": results,
+        "model_used": "spaCy"
+    }
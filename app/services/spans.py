@@ -0,0 +1,22 @@
+from typing import Any, Dict, List
+
+def make_span(start: int, end: int, text: str, label: str, token_start: int, token_end: int) -> Dict[str, Any]:
+    """
+    One extracted location: character offsets into the input (end exclusive), the exact
+    input text at those offsets, the entity label and token indices (end exclusive).
+    """
+    return {"start": start, "end": end, "text": text, "label": label, "token_start": token_start, "token_end": token_end}
+
+def shift_span(span: Dict[str, Any], char_offset: int, token_offset: int) -> Dict[str, Any]:
+    """Returns a copy of `span` moved by the given character and token offsets."""
+    return {
+        **span,
+        "start": span["start"] + char_offset,
+        "end": span["end"] + char_offset,
+        "token_start": span["token_start"] + token_offset,
+        "token_end": span["token_end"] + token_offset,
+    }
+
+def unique_locations(spans: List[Dict[str, Any]]) -> List[str]:
+    """Unique location names in order of first appearance, in one pass over spans sorted by start."""
+    return list(dict.fromkeys(span["text"] for span in spans))
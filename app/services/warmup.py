@@ -0,0 +1,86 @@
+"""
+Warmup: runs synthetic texts through a freshly loaded backend before it is reported ready.
+
+The texts cover every WARMUP_TOKEN_LENGTHS length (the BiLSTM length buckets by default) at every
+WARMUP_BATCH_SIZES size, through the same blocking functions the endpoints use: tokenization,
+encoding, bucketed decoding and span conversion for the BiLSTM-CRF, the single-text pipeline call
+and nlp.pipe for spaCy. Warmup calls are not recorded in the stage, token-length or batch-size metrics,
+so they never skew production latencies; their timings are kept in `warmup_results` instead.
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import logger, SPACY_BATCH_SIZE, WARMUP_TOKEN_LENGTHS, WARMUP_BATCH_SIZES
+from app.core.metrics import registry, suppress_metrics, CallbackFamily
+from app.models.loaders import get_spacy_nlp, get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag, get_spacy_tokenizer
+from app.services import bilstm_service, spacy_service
+
+# Whitespace-separated and without punctuation, so n words are n tokens for both backends
+_WARMUP_WORDS = "Delegates from Paris met officials in Berlin and Lagos to discuss new trade routes along the coast of Kenya".split()
+
+warmup_results: Dict[str, Dict[str, Any]] = {} # backend -> timings of its last warmup
+
+registry.register(CallbackFamily(
+    "warmup_seconds", "Duration of the last warmup of each backend.", ("backend",),
+    lambda: [((backend,), result["seconds"]) for backend, result in warmup_results.items()]))
+
+def synthetic_text(num_tokens: int) -> str:
+    """A text of exactly `num_tokens` tokens, with a few location names."""
+    return " ".join(_WARMUP_WORDS[i % len(_WARMUP_WORDS)] for i in range(num_tokens))
+
+def _warm_spacy(text: str, batch_size: int) -> None:
+    if batch_size == 1:
+        spacy_service._extract_sync(get_spacy_nlp(), text)
+    else:
+        spacy_service._extract_batch_sync(get_spacy_nlp(), [text] * batch_size, SPACY_BATCH_SIZE)
+
+def _warm_bilstm(text: str, batch_size: int) -> None:
+    results = bilstm_service._extract_batch_sync(
+        get_bilstm_model(), get_spacy_tokenizer(), get_bilstm_word2idx(), get_bilstm_idx2tag(), [text] * batch_size
+    )
+    errors = [result["error"] for result in results if "error" in result]
+    if errors:
+        raise RuntimeError(errors[0])
+
+_WARMUP_CALLS: Dict[str, Callable[[str, int], None]] = {"spacy": _warm_spacy, "bilstm": _warm_bilstm}
+
+def warm_up(backend: str) -> Optional[Dict[str, Any]]:
+    """
+    Warms up a loaded backend. Blocking. Returns its timings (also kept in `warmup_results`), or None
+    for backends without a warmup (the gazetteer). A failing warmup is logged and does not fail the backend.
+    """
+    warm_call = _WARMUP_CALLS.get(backend)
+    if warm_call is None:
+        return None
+
+    calls, error = [], None
+    started = time.perf_counter()
+    try:
+        with suppress_metrics():
+            for num_tokens in WARMUP_TOKEN_LENGTHS:
+                text = synthetic_text(num_tokens)
+                for batch_size in WARMUP_BATCH_SIZES:
+                    call_started = time.perf_counter()
+                    warm_call(text, batch_size)
+                    calls.append({"tokens": num_tokens, "batch_size": batch_size, "seconds": time.perf_counter() - call_started})
+    except Exception as e:
+        logger.warning("Warmup of backend '%s' failed after %d calls: %s", backend, len(calls), e)
+        error = str(e)
+
+    result = {
+        "seconds": time.perf_counter() - started,
+        "calls": calls,
+        "error": error,
+    }
+    warmup_results[backend] = result
+    slowest = max(calls, key=lambda call: call["seconds"], default=None)
+    logger.info(
+        "Backend '%s' warmed up with %d calls in %.2fs (slowest: %s).", backend, len(calls), result["seconds"],
+        f"{slowest['tokens']} tokens x {slowest['batch_size']} in {slowest['seconds'] * 1000.0:.1f} ms" if slowest else "none"
+    )
+    return result
+
+def warmup_stats() -> Dict[str, Any]:
+    """Total warmup time and error of each warmed-up backend."""
+    return {backend: {"seconds": result["seconds"], "calls": len(result["calls"]), "error": result["error"]}
+            for backend, result in warmup_results.items()}
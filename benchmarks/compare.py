@@ -0,0 +1,47 @@
+from typing import Any, Dict, List
+
+# Metric -> True if a higher value is better
+COMPARED_METRICS = {
+    "throughput_texts_per_s": True,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.15) -> List[Dict[str, Any]]:
+    """
+    Compares the cases present in both result files.
+    Returns one row per case and metric with the relative change (positive = worse) and whether
+    it is a regression, i.e. worse than the baseline by more than `tolerance` (0.15 = 15%).
+    """
+    rows = []
+    for case, current_metrics in current["cases"].items():
+        baseline_metrics = baseline["cases"].get(case)
+        if baseline_metrics is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = baseline_metrics.get(metric), current_metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = (before - after) / before if higher_is_better else (after - before) / before
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": change > tolerance,
+            })
+    return rows
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    """Renders comparison rows as a fixed-width table."""
+    lines = [f"{'case':<24} {'metric':<24} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['case']:<24} {row['metric']:<24} {row['baseline']:>12.2f} {row['current']:>12.2f} "
+            f"{row['change']:>+7.1%}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,60 @@
+import math
+import random
+from typing import Any, Dict, List
+
+LOCATIONS = [
+    "Paris", "London", "Tokyo", "Berlin", "Rome", "Madrid", "Lagos", "Nairobi", "Lima", "Cairo",
+    "Sydney", "Toronto", "Mumbai", "Istanbul", "Moscow", "Dakar", "Oslo", "Vienna", "Prague", "Seoul",
+    "New York", "Buenos Aires", "Cape Town", "Hong Kong", "Rio de Janeiro", "Kuala Lumpur",
+    "France", "Kenya", "Peru", "Japan", "Brazil", "Canada", "Nigeria", "Germany", "Egypt", "Norway",
+]
+FILLER_WORDS = [
+    "the", "a", "team", "visited", "after", "meeting", "with", "officials", "from", "and", "later",
+    "travelled", "to", "where", "they", "discussed", "new", "trade", "agreements", "during", "week",
+    "report", "said", "that", "prices", "rose", "in", "several", "markets", "last", "year", "while",
+    "analysts", "expect", "growth", "this", "quarter", "despite", "heavy", "rain", "near", "coast",
+    "students", "returned", "home", "before", "holiday", "season", "began", "on", "Monday", "morning",
+]
+
+# Token-length presets. "long" exceeds BILSTM_MAX_SEQ_LEN (100) to exercise long-document mode.
+CORPUS_PRESETS: Dict[str, Dict[str, Any]] = {
+    "short": {"distribution": "uniform", "min_tokens": 5, "max_tokens": 20},
+    "medium": {"distribution": "uniform", "min_tokens": 20, "max_tokens": 80},
+    "lognormal": {"distribution": "lognormal", "min_tokens": 3, "max_tokens": 100, "mu": 3.0, "sigma": 0.7},
+    "long": {"distribution": "uniform", "min_tokens": 150, "max_tokens": 400},
+}
+
+def _sample_length(rng: random.Random, spec: Dict[str, Any]) -> int:
+    if spec["distribution"] == "lognormal":
+        length = int(round(math.exp(rng.gauss(spec["mu"], spec["sigma"]))))
+    else:
+        length = rng.randint(spec["min_tokens"], spec["max_tokens"])
+    return max(spec["min_tokens"], min(spec["max_tokens"], length))
+
+def _generate_text(rng: random.Random, num_tokens: int, location_density: float) -> str:
+    """Builds sentences of filler words with roughly `location_density` of the tokens belonging to locations."""
+    words: List[str] = []
+    sentence_length = 0
+    while len(words) < num_tokens:
+        if rng.random() < location_density:
+            words.extend(rng.choice(LOCATIONS).split())
+        else:
+            word = rng.choice(FILLER_WORDS)
+            words.append(word.capitalize() if sentence_length == 0 else word)
+        sentence_length += 1
+        if sentence_length >= rng.randint(8, 20):
+            words[-1] += "."
+            sentence_length = 0
+    words = words[:num_tokens]
+    if not words[-1].endswith("."):
+        words[-1] += "."
+    return " ".join(words)
+
+def generate_corpus(preset: str, num_texts: int, location_density: float = 0.08, seed: int = 0) -> List[str]:
+    """
+    Generates `num_texts` synthetic texts whose whitespace token counts follow the `preset`
+    length distribution (see CORPUS_PRESETS). The same arguments always give the same corpus.
+    """
+    spec = CORPUS_PRESETS[preset]
+    rng = random.Random(f"{preset}:{num_texts}:{location_density}:{seed}")
+    return [_generate_text(rng, _sample_length(rng, spec), location_density) for _ in range(num_texts)]
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark of the NumPy runtime's first-layer input projection table.
+
+Times NumpyBiLSTM_CRF.forward with the embedding lookup + input GEMM and with the table gather,
+on random word IDs, and reports the time per token of each and the saving:
+
+    python -m benchmarks.input_projection
+    python -m benchmarks.input_projection --batch-sizes 1 8 32 --seq-len 40 --output table.json
+
+Uses a randomly initialised model of the production shape (vocabulary of ner_word2idx.pkl,
+BILSTM_* hyperparameters), since the timing does not depend on the weight values.
+"""
+import argparse
+import json
+import pickle
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core import config
+from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+def build_model() -> NumpyBiLSTM_CRF:
+    import torch
+    from app.models.bilstm import BiLSTM_CRF
+
+    with open(config.WORD2IDX_PATH, "rb") as f:
+        vocab_size = len(pickle.load(f))
+    with open(config.TAG2IDX_PATH, "rb") as f:
+        num_tags = len(pickle.load(f))
+    torch.manual_seed(0)
+    model = BiLSTM_CRF(
+        vocab_size=vocab_size, embed_dim=config.BILSTM_EMBED_DIM, lstm_units=config.BILSTM_LSTM_UNITS,
+        num_tags=num_tags, num_bilstm_layers=config.BILSTM_LAYERS
+    )
+    return NumpyBiLSTM_CRF.from_state_dict(model.state_dict())
+
+def _best_seconds(model: NumpyBiLSTM_CRF, table: np.ndarray, word_ids: np.ndarray, mask: np.ndarray, repeats: int):
+    """Fastest forward() without and with the table. Calls alternate, so drift in CPU speed hits both alike."""
+    timings = {False: [], True: []}
+    for repeat in range(repeats + 1):
+        for use_table in (False, True):
+            model.input_table = table if use_table else None
+            start = time.perf_counter()
+            model.forward(word_ids, mask)
+            if repeat: # The first round is a warm-up
+                timings[use_table].append(time.perf_counter() - start)
+    model.input_table = None
+    return min(timings[False]), min(timings[True])
+
+def run(batch_sizes: List[int], seq_len: int, repeats: int, seed: int) -> Dict[str, Any]:
+    model = build_model()
+    start = time.perf_counter()
+    table = model.input_projection_table()
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    cases = {}
+    for batch_size in batch_sizes:
+        word_ids = rng.integers(2, model.embedding.shape[0], size=(batch_size, seq_len))
+        mask = np.ones_like(word_ids, dtype=bool)
+        tokens = batch_size * seq_len
+
+        without_table, with_table = _best_seconds(model, table, word_ids, mask, repeats)
+        expected_tags = model.decode(word_ids, mask)
+        model.use_input_projection_table(table)
+        same_tags = model.decode(word_ids, mask) == expected_tags
+        model.input_table = None
+
+        cases[f"batch_{batch_size}"] = {
+            "tokens": tokens,
+            "forward_us_per_token": without_table / tokens * 1e6,
+            "fused_forward_us_per_token": with_table / tokens * 1e6,
+            "saving_us_per_token": (without_table - with_table) / tokens * 1e6,
+            "saving_fraction": 1.0 - with_table / without_table,
+            "same_tags": same_tags,
+        }
+    return {
+        "table_shape": list(table.shape),
+        "table_mb": table.nbytes / 2**20,
+        "table_build_s": build_seconds,
+        "seq_len": seq_len,
+        "cases": cases,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy BiLSTM runtime with and without the input projection table.")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32])
+    parser.add_argument("--seq-len", type=int, default=30, help="Tokens per sequence")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed calls per case (the fastest is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.batch_sizes, args.seq_len, args.repeats, args.seed)
+    print(f"Input projection table {tuple(results['table_shape'])}: {results['table_mb']:.1f} MB, built in {results['table_build_s']:.2f}s")
+    for case, metrics in results["cases"].items():
+        print(
+            f"{case:<10} forward {metrics['forward_us_per_token']:>7.2f} us/token  fused {metrics['fused_forward_us_per_token']:>7.2f} us/token  "
+            f"saving {metrics['saving_us_per_token']:>6.2f} us/token ({metrics['saving_fraction']:.0%})  same tags: {metrics['same_tags']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Load generator for the full FastAPI stack (middleware, request validation, services, response models).
+
+    python -m benchmarks.load                                    # in-process, through httpx's ASGI transport
+    python -m benchmarks.load --url http://127.0.0.1:8000        # against a running uvicorn
+    python -m benchmarks.load --concurrency 1 8 64 256 --mix spacy=0.45,bilstm=0.45,health=0.1 --output load.json
+
+For each concurrency level, that many clients send requests back to back for --duration seconds.
+The report gives throughput, latency percentiles (overall and per endpoint), error rates, status
+codes and event-loop lag: how late a 10 ms timer fires on the loop serving the app.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from contextlib import AsyncExitStack, nullcontext
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.corpus import generate_corpus
+
+ENDPOINTS = {
+    "spacy": ("POST", "/extract-with-spacy/"),
+    "bilstm": ("POST", "/extract-with-bilstm/"),
+    "ensemble": ("POST", "/extract-with-ensemble/"),
+    "gazetteer": ("POST", "/extract-with-gazetteer/"),
+    "cascade": ("POST", "/extract-with-cascade/"),
+    "health": ("GET", "/health"),
+}
+DEFAULT_MIX = "spacy=0.45,bilstm=0.45,health=0.1"
+LOOP_LAG_INTERVAL_S = 0.01
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parses "spacy=0.45,bilstm=0.45,health=0.1" into normalized endpoint weights."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in request mix. Expected one of {list(ENDPOINTS)}.")
+        weights[name.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Request mix weights must sum to a positive number.")
+    return {name: weight / total for name, weight in weights.items()}
+
+def _percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    values = np.array(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(values.max())}
+
+async def _monitor_loop_lag(lags: List[float], stop: asyncio.Event) -> None:
+    """Records how much later than scheduled a LOOP_LAG_INTERVAL_S sleep returns."""
+    while not stop.is_set():
+        scheduled = time.perf_counter() + LOOP_LAG_INTERVAL_S
+        await asyncio.sleep(LOOP_LAG_INTERVAL_S)
+        lags.append(max(0.0, time.perf_counter() - scheduled))
+
+async def _client(client: httpx.AsyncClient, rng: random.Random, mix: Dict[str, float], texts: List[str],
+                  deadline: float, samples: List[tuple]) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path = ENDPOINTS[name]
+        started = time.perf_counter()
+        try:
+            if method == "POST":
+                response = await client.post(path, json={"text": rng.choice(texts)})
+            else:
+                response = await client.get(path)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        samples.append((name, status, time.perf_counter() - started))
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, duration: float, mix: Dict[str, float],
+                    texts: List[str], seed: int) -> Dict[str, Any]:
+    """Runs `concurrency` clients for `duration` seconds and summarizes their requests."""
+    samples: List[tuple] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(lags, stop))
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client(client, random.Random(f"{seed}:{concurrency}:{i}"), mix, texts, deadline, samples)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    statuses = Counter(str(status) for _, status, _ in samples)
+    errors = sum(1 for _, status, _ in samples if not isinstance(status, int) or status >= 400)
+    per_endpoint = {}
+    for name in mix:
+        endpoint_samples = [sample for sample in samples if sample[0] == name]
+        endpoint_errors = sum(1 for _, status, _ in endpoint_samples if not isinstance(status, int) or status >= 400)
+        per_endpoint[name] = {
+            "requests": len(endpoint_samples),
+            "error_rate": endpoint_errors / len(endpoint_samples) if endpoint_samples else 0.0,
+            **_percentiles_ms([latency for *_, latency in endpoint_samples]),
+        }
+    lag_ms = np.array(lags or [0.0]) * 1000.0
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples) / elapsed,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "statuses": dict(statuses),
+        **_percentiles_ms([latency for *_, latency in samples]),
+        "loop_lag_p50_ms": float(np.percentile(lag_ms, 50)),
+        "loop_lag_p99_ms": float(np.percentile(lag_ms, 99)),
+        "loop_lag_max_ms": float(lag_ms.max()),
+        "endpoints": per_endpoint,
+    }
+
+async def run_load_test(levels: List[int], duration: float, mix: Dict[str, float], num_texts: int, seed: int,
+                        url: Optional[str] = None, use_cache: bool = False, allow_random_bilstm: bool = True,
+                        warmup: float = 1.0) -> Dict[str, Any]:
+    """
+    Drives the app at each concurrency level in turn. Without `url`, main.app runs in this process
+    (its lifespan included) behind httpx's ASGI transport, and the result cache is bypassed unless
+    `use_cache`; with `url`, requests go to that server and its loop lag is not visible here.
+    """
+    texts = generate_corpus("lognormal", num_texts, seed=seed)
+    async with AsyncExitStack() as stack:
+        models = None
+        if url is None:
+            from main import app
+            from benchmarks.run import bypass_result_cache, prepare_models
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            models = await asyncio.to_thread(prepare_models, allow_random_bilstm)
+            stack.enter_context(nullcontext() if use_cache else bypass_result_cache())
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://loadtest"
+        else:
+            transport, base_url = None, url
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60.0, limits=limits)
+        )
+
+        if warmup > 0:
+            await run_level(client, 1, warmup, mix, texts, seed)
+        results = []
+        for concurrency in levels:
+            results.append(await run_level(client, concurrency, duration, mix, texts, seed))
+            level = results[-1]
+            print(
+                f"c={concurrency:<4} {level['throughput_rps']:>8.1f} req/s  p50 {level['p50_ms']:>8.2f} ms  "
+                f"p95 {level['p95_ms']:>8.2f} ms  p99 {level['p99_ms']:>8.2f} ms  errors {level['error_rate']:>6.1%}  "
+                f"loop lag p99 {level['loop_lag_p99_ms']:>7.2f} ms  statuses {level['statuses']}"
+            )
+
+    return {
+        "target": url or "in-process (httpx ASGI transport)",
+        "settings": {"duration_s": duration, "mix": mix, "num_texts": num_texts, "seed": seed, "result_cache": use_cache, "models": models},
+        "levels": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the FastAPI app at several concurrency levels.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64, 256], help="Concurrent clients per level")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights, e.g. {DEFAULT_MIX} (endpoints: {', '.join(ENDPOINTS)})")
+    parser.add_argument("--num-texts", type=int, default=500, help="Distinct request texts (lognormal length corpus)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds of single-client warm-up before the first level")
+    parser.add_argument("--url", help="Base URL of a running server instead of the in-process app")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the result cache on (in-process only)")
+    parser.add_argument("--no-random-bilstm", action="store_true",
+                        help="Do not substitute a randomly initialised BiLSTM-CRF when the trained weights are missing")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(
+        args.concurrency, args.duration, parse_mix(args.mix), args.num_texts, args.seed,
+        url=args.url, use_cache=args.with_cache, allow_random_bilstm=not args.no_random_bilstm, warmup=args.warmup
+    ))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Reproducible benchmarks of the extraction services on synthetic corpora.
+
+    python -m benchmarks.run --output benchmarks/results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # exits with 1 on regressions
+
+Each case calls a service function (extract_locations_with_spacy, extract_locations_with_bilstm,
+their batch variants and long-document mode, extract_locations_with_gazetteer) directly, with the result cache bypassed, and
+reports throughput, p50/p95/p99 latency per call and peak RSS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import psutil
+
+from app.core import config
+from app.core.config import logger
+from app.models import loaders
+from app.services.spacy_service import extract_locations_with_spacy, extract_locations_with_spacy_batch
+from app.services.bilstm_service import extract_locations_with_bilstm, extract_locations_with_bilstm_batch
+from app.services.gazetteer_service import extract_locations_with_gazetteer
+from benchmarks.compare import compare_results, format_comparison
+from benchmarks.corpus import generate_corpus
+
+# Case -> (backend, corpus preset, how the service is called)
+BENCHMARK_CASES = {
+    "spacy_single": ("spacy", "lognormal", "single"),
+    "spacy_batch": ("spacy", "lognormal", "batch"),
+    "bilstm_single": ("bilstm", "lognormal", "single"),
+    "bilstm_batch": ("bilstm", "lognormal", "batch"),
+    "bilstm_long_document": ("bilstm", "long", "long_document"),
+    "gazetteer_single": ("gazetteer", "lognormal", "single"),
+}
+
+class PeakRssSampler:
+    """Samples the process RSS in a background thread and keeps the peak."""
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def __enter__(self) -> "PeakRssSampler":
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+@contextmanager
+def bypass_result_cache():
+    """Services only cache results of models with a version, so hiding the versions bypasses both caches."""
+    saved = dict(loaders.model_versions)
+    loaders.model_versions.clear()
+    try:
+        yield
+    finally:
+        loaders.model_versions.update(saved)
+
+def _install_random_bilstm() -> None:
+    """Installs a randomly initialised BiLSTM-CRF with the production shape when the trained weights are missing."""
+    import torch
+    from app.models.bilstm import BiLSTM_CRF
+    from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+    word2idx = loaders.read_pickled_word2idx(config.WORD2IDX_PATH)
+    with open(config.TAG2IDX_PATH, "rb") as f:
+        tag2idx = pickle.load(f)
+
+    torch.manual_seed(0)
+    model = BiLSTM_CRF(
+        vocab_size=len(word2idx), embed_dim=config.BILSTM_EMBED_DIM, lstm_units=config.BILSTM_LSTM_UNITS,
+        num_tags=len(tag2idx), dropout_rate=config.BILSTM_DROPOUT, num_bilstm_layers=config.BILSTM_LAYERS,
+        padding_idx=word2idx[config.PAD_TOKEN]
+    ).eval()
+    if config.BILSTM_INFERENCE_BACKEND == "numpy":
+        model = NumpyBiLSTM_CRF.from_state_dict(model.state_dict())
+        if config.BILSTM_INPUT_PROJECTION_TABLE:
+            loaders.attach_input_projection_table(model, cache_path=None) # Random weights are never cached
+    else:
+        model = loaders._select_inference_backend(model, word2idx)
+
+    loaders.spacy_tokenizer = loaders.spacy_nlp or loaders._load_spacy_tokenizer()
+    loaders.bilstm_word2idx, loaders.bilstm_tag2idx = word2idx, tag2idx
+    loaders.bilstm_idx2tag = {idx: tag for tag, idx in tag2idx.items()}
+    loaders.bilstm_crf_model = model
+    loaders.model_status["bilstm"] = "ready"
+
+def prepare_models(allow_random_bilstm: bool) -> Dict[str, str]:
+    """Loads the enabled backends. Returns how each one was loaded (ready, random, failed or disabled)."""
+    loaders.load_model("spacy")
+    loaders.load_model("bilstm")
+    loaders.load_model("gazetteer")
+    status = loaders.get_model_status()
+    if status["bilstm"] == "failed" and allow_random_bilstm:
+        logger.warning("BiLSTM-CRF weights are not available; benchmarking a randomly initialised model of the same shape.")
+        _install_random_bilstm()
+        status["bilstm"] = "random"
+    return status
+
+def _calls_for(mode: str, texts: List[str], batch_size: int) -> List[Tuple[tuple, dict, List[str]]]:
+    """Service calls of one case: (args, kwargs, texts covered by the call)."""
+    if mode == "batch":
+        return [((texts[i:i + batch_size],), {}, texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    kwargs = {"long_document": True} if mode == "long_document" else {}
+    return [((text,), kwargs, [text]) for text in texts]
+
+_SERVICE_FUNCTIONS = {
+    ("spacy", "single"): extract_locations_with_spacy,
+    ("spacy", "batch"): extract_locations_with_spacy_batch,
+    ("bilstm", "single"): extract_locations_with_bilstm,
+    ("bilstm", "batch"): extract_locations_with_bilstm_batch,
+    ("bilstm", "long_document"): extract_locations_with_bilstm,
+    ("gazetteer", "single"): extract_locations_with_gazetteer,
+}
+
+def _count_errors(result: Dict[str, Any]) -> int:
+    if "error" in result:
+        return 1
+    return sum(1 for item in result.get("results", []) if "error" in item)
+
+async def run_case(backend: str, mode: str, texts: List[str], batch_size: int, warmup: int) -> Dict[str, Any]:
+    """Runs one case sequentially and returns its metrics."""
+    fn = _SERVICE_FUNCTIONS[(backend, mode)]
+    calls = _calls_for(mode, texts, batch_size)
+    for args, kwargs, _ in calls[:warmup]:
+        await fn(*args, **kwargs)
+
+    latencies, errors, num_texts, num_tokens = [], 0, 0, 0
+    with bypass_result_cache(), PeakRssSampler() as rss:
+        started = time.perf_counter()
+        for args, kwargs, call_texts in calls:
+            call_started = time.perf_counter()
+            result = await fn(*args, **kwargs)
+            latencies.append(time.perf_counter() - call_started)
+            errors += _count_errors(result)
+            num_texts += len(call_texts)
+            num_tokens += sum(len(text.split()) for text in call_texts)
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "calls": len(calls),
+        "texts": num_texts,
+        "tokens": num_tokens,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_texts_per_s": num_texts / elapsed,
+        "throughput_tokens_per_s": num_tokens / elapsed,
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "peak_rss_mb": rss.peak / 2**20,
+    }
+
+def _environment() -> Dict[str, Any]:
+    import spacy
+    environment = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "spacy": spacy.__version__,
+        "bilstm_inference_backend": config.BILSTM_INFERENCE_BACKEND,
+        "bilstm_microbatch_enabled": config.BILSTM_MICROBATCH_ENABLED,
+        "bilstm_microbatch_max_wait_ms": config.BILSTM_MICROBATCH_MAX_WAIT_MS,
+        "inference_executor_workers": config.INFERENCE_EXECUTOR_WORKERS,
+    }
+    if config.DEVICE is not None:
+        import torch
+        environment.update({"torch": torch.__version__, "torch_threads": torch.get_num_threads(), "device": str(config.DEVICE)})
+    return environment
+
+async def run_benchmarks(cases: List[str], num_texts: int, long_texts: int, batch_size: int, warmup: int,
+                         seed: int, location_density: float, allow_random_bilstm: bool) -> Dict[str, Any]:
+    models = prepare_models(allow_random_bilstm)
+    results = {}
+    for case in cases:
+        backend, preset, mode = BENCHMARK_CASES[case]
+        if models[backend] not in ("ready", "random"):
+            logger.warning("Skipping benchmark case '%s': backend '%s' is %s.", case, backend, models[backend])
+            continue
+        texts = generate_corpus(preset, long_texts if preset == "long" else num_texts, location_density, seed)
+        logger.info("Benchmarking '%s' on %d '%s' texts...", case, len(texts), preset)
+        results[case] = {"corpus": preset, **await run_case(backend, mode, texts, batch_size, warmup)}
+    return {
+        "environment": _environment(),
+        "settings": {
+            "num_texts": num_texts, "long_texts": long_texts, "batch_size": batch_size, "warmup": warmup,
+            "seed": seed, "location_density": location_density, "models": models,
+        },
+        "cases": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the location extraction services on synthetic corpora.")
+    parser.add_argument("--cases", nargs="+", choices=list(BENCHMARK_CASES), default=list(BENCHMARK_CASES))
+    parser.add_argument("--num-texts", type=int, default=200, help="Texts per case (lognormal length corpus)")
+    parser.add_argument("--long-texts", type=int, default=20, help="Texts for the long-document case")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per call in the batch cases")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls before each case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--location-density", type=float, default=0.08, help="Share of tokens starting a location")
+    parser.add_argument("--no-random-bilstm", action="store_true",
+                        help="Skip the BiLSTM cases instead of using random weights when the trained weights are missing")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with a stored results file and exit with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(
+        args.cases, args.num_texts, args.long_texts, args.batch_size, args.warmup,
+        args.seed, args.location_density, not args.no_random_bilstm
+    ))
+    for case, metrics in results["cases"].items():
+        print(
+            f"{case:<24} {metrics['throughput_texts_per_s']:>9.1f} texts/s  p50 {metrics['latency_p50_ms']:>8.2f} ms  "
+            f"p95 {metrics['latency_p95_ms']:>8.2f} ms  p99 {metrics['latency_p99_ms']:>8.2f} ms  "
+            f"peak RSS {metrics['peak_rss_mb']:>7.1f} MB  errors {metrics['errors']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.tolerance)
+        print(format_comparison(rows))
+        if any(row["regression"] for row in rows):
+            print(f"Performance regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
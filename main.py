@@ -1,32 +1,56 @@
+import asyncio
+import time
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app.core.config import API_TITLE, API_DESCRIPTION, API_VERSION, ALLOWED_ORIGINS, logger
-from app.models.loaders import load_all_models
+from app.core.config import (
+    API_TITLE, API_DESCRIPTION, API_VERSION, ALLOWED_ORIGINS, ENABLED_BACKENDS, MODEL_LOADING_MODE,
+    LOG_REQUEST_SAMPLE_RATES, LOG_REQUEST_DEFAULT_SAMPLE_RATE, INFERENCE_ENGINE, WARMUP_ENABLED, logger, request_logger
+)
+from app.models.loaders import start_model_loading, record_worker_models, get_model_status, is_backend_usable
+from app.core.executor import get_inference_executor, ensemble_executors
+from app.core.cache import get_result_cache
+from app.core.process_engine import get_process_engine
+from app.core.metrics import REQUESTS, REQUEST_ERRORS, REQUEST_LATENCY
+from app.services.warmup import warmup_stats
+from app.core.logs import new_request_id, start_request_context, end_request_context, request_stage_timings
 from app.api.endpoints import router as api_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup actions
     logger.info("--- FastAPI application starting up ---")
-    load_all_models()
+    start_model_loading() # With the process engine, only the gazetteer loads in this process
+    if INFERENCE_ENGINE == "processes":
+        # Only the workers hold spaCy and BiLSTM-CRF replicas; they load in parallel with each other
+        record_worker_models(await asyncio.to_thread(get_process_engine().start))
     logger.info("--- FastAPI application startup sequence finished ---")
-    from app.models.loaders import get_spacy_nlp, get_bilstm_model
-    if not get_spacy_nlp() and not get_bilstm_model():
-        logger.critical("CRITICAL: NO MODELS WERE LOADED. API WILL NOT FUNCTION CORRECTLY.")
-    elif not get_spacy_nlp():
-        logger.warning("WARNING: SpaCy model failed to load. '/extract-with-spacy/' will not work.")
-    elif not get_bilstm_model():
-        logger.warning("WARNING: BiLSTM-CRF model failed to load. '/extract-with-bilstm/' will not work.")
+    if MODEL_LOADING_MODE == "sequential" or INFERENCE_ENGINE == "processes":
+        status = get_model_status()
+        if status["spacy"] != "ready" and status["bilstm"] != "ready":
+            logger.critical("CRITICAL: NO MODELS WERE LOADED. API WILL NOT FUNCTION CORRECTLY.")
+        elif status["spacy"] != "ready" and "spacy" in ENABLED_BACKENDS:
+            logger.warning("WARNING: SpaCy model failed to load. '/extract-with-spacy/' will not work.")
+        elif status["bilstm"] != "ready" and "bilstm" in ENABLED_BACKENDS:
+            logger.warning("WARNING: BiLSTM-CRF model failed to load. '/extract-with-bilstm/' will not work.")
+        else:
+            logger.info("All models loaded. API is ready.")
     else:
-        logger.info("All models loaded. API is ready.")
+        logger.info("Models load in '%s' mode. See /ready for their load and warmup status.", MODEL_LOADING_MODE)
     
     yield  # Application runs here
     
     # Shutdown actions
     logger.info("--- FastAPI application shutting down ---")
+    get_inference_executor().shutdown()
+    for executor in ensemble_executors.values():
+        executor.shutdown()
+    if INFERENCE_ENGINE == "processes":
+        get_process_engine().shutdown()
+    get_result_cache().close()
     logger.info("--- FastAPI application shutdown sequence finished ---")
 
 # Create FastAPI app instance with lifespan
@@ -46,14 +70,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """
+    Per-request observability:
+    - Request ID: taken from a valid X-Request-ID header or generated, echoed in the response and
+      attached to every log line of the request.
+    - Metrics: requests, errors and latency, labelled by route template (not raw path) to bound cardinality.
+    - Sampled completion log with status, duration and per-stage timings (LOG_REQUEST_SAMPLE_RATES).
+    """
+    start = time.perf_counter()
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    context_tokens = start_request_context(
+        request_id, LOG_REQUEST_SAMPLE_RATES.get(request.url.path, LOG_REQUEST_DEFAULT_SAMPLE_RATE)
+    )
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_label = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe(request.method, route_label, value=elapsed)
+        REQUESTS.inc(request.method, route_label, status)
+        if status >= 400:
+            REQUEST_ERRORS.inc(request.method, route_label, status)
+        request_logger.info(
+            "%s %s -> %d in %.1f ms", request.method, request.url.path, status, elapsed * 1000.0,
+            extra={"fields": {
+                "method": request.method, "path": request.url.path, "status": status,
+                "duration_ms": round(elapsed * 1000.0, 3), "stages_ms": request_stage_timings(),
+            }}
+        )
+        end_request_context(context_tokens)
+
 app.include_router(api_router, prefix="")
 
 # Health Check Endpoint
 @app.get("/health", tags=["Health Check"], summary="Check API health")
 async def health_check():
-    logger.info("Health check endpoint called.")
+    request_logger.info("Health check endpoint called.")
     return {"status": "ok", "message": "API is healthy"}
 
+# Readiness Endpoint
+@app.get("/ready", tags=["Health Check"], summary="Check whether a model backend can serve requests")
+async def readiness_check():
+    """
+    Returns 200 as soon as at least one enabled backend is usable, 503 otherwise.
+    Unlike /health (the process is up), this tells orchestrators when to route traffic.
+    With WARMUP_ENABLED, the instance is not ready while any backend is still loading or warming up
+    (see app/services/warmup.py), so traffic never reaches a cold backend.
+    """
+    backends = get_model_status()
+    usable = [backend for backend in ENABLED_BACKENDS if is_backend_usable(backend)]
+    starting = [backend for backend in ENABLED_BACKENDS if backends[backend] in ("loading", "warming_up")]
+    if not usable or (WARMUP_ENABLED and MODEL_LOADING_MODE != "lazy" and starting):
+        return JSONResponse(status_code=503, content={"status": "not_ready", "backends": backends, "warmup": warmup_stats()})
+    return {"status": "ready", "usable_backends": usable, "backends": backends, "warmup": warmup_stats()}
+
 if __name__ == "__main__":
     logger.info("Starting Uvicorn server directly from main.py...")
     uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
\ No newline at end of file
@@ -1,8 +1,10 @@
+import re
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from main import app
 from app.models.loaders import get_spacy_nlp, get_bilstm_model, get_bilstm_word2idx, get_bilstm_idx2tag
+from tests.test_services import RecordingModel, WORD2IDX, IDX2TAG
 
 @pytest.fixture
 def client():
@@ -131,4 +133,90 @@ def test_extract_with_bilstm_model_unavailable(client, mock_bilstm_model):
     payload = {"text": "I visited London and Paris."}
     response = client.post("/extract-with-bilstm/", json=payload)
     assert response.status_code == 503
-    assert response.json()["detail"] == "BiLSTM-CRF model or its mappings are not available."
\ No newline at end of file
+    assert response.json()["detail"] == "BiLSTM-CRF model or its mappings are not available."
+
+def test_extract_with_spacy_batch_keeps_input_order(client):
+    """Test the spaCy batch endpoint returns one result per text, in input order."""
+    class MockEntity:
+        def __init__(self, match, token_index, label):
+            self.text = match.group()
+            self.label_ = label
+            self.start_char, self.end_char = match.start(), match.end()
+            self.start, self.end = token_index, token_index + 1
+
+    class MockDoc:
+        def __init__(self, text):
+            words = list(re.finditer(r"\S+", text))
+            self.ents = [MockEntity(m, i, "GPE") for i, m in enumerate(words) if m.group().istitle()]
+            self.num_tokens = len(words)
+
+        def __len__(self):
+            return self.num_tokens
+
+    class MockNlp:
+        def __init__(self):
+            self.batch_sizes = []
+
+        def pipe(self, texts, batch_size=1):
+            self.batch_sizes.append(batch_size)
+            return (MockDoc(text) for text in texts)
+
+    mock_nlp = MockNlp()
+    with patch("app.services.spacy_service.get_spacy_nlp", return_value=mock_nlp):
+        payload = {"texts": ["from Paris to Rome", "nothing here", "hello Lima"]}
+        response = client.post("/extract-with-spacy/batch/?spans=true", json=payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["input_text"] for r in results] == payload["texts"]
+    assert [r["extracted_locations"] for r in results] == [["Paris", "Rome"], [], ["Lima"]]
+    assert mock_nlp.batch_sizes == [64]
+    assert results[0]["spans"] == [
+        {"start": 5, "end": 10, "text": "Paris", "label": "GPE", "token_start": 1, "token_end": 2},
+        {"start": 14, "end": 18, "text": "Rome", "label": "GPE", "token_start": 3, "token_end": 4},
+    ]
+
+def test_extract_with_bilstm_batch_single_decode_call(client):
+    """Test the BiLSTM batch endpoint decodes the whole batch at once, padded to the longest item."""
+    class MockToken:
+        def __init__(self, text, idx):
+            self.text = text
+            self.idx = idx
+
+    mock_tokenizer = type("MockSpacy", (), {
+        "tokenizer": staticmethod(lambda text: [MockToken(m.group(), m.start()) for m in re.finditer(r"\S+", text)])
+    })()
+
+    model = RecordingModel()
+    with patch("app.services.bilstm_service.get_spacy_tokenizer", return_value=mock_tokenizer), \
+         patch("app.services.bilstm_service.get_bilstm_model", return_value=model), \
+         patch("app.services.bilstm_service.get_bilstm_word2idx", return_value=WORD2IDX), \
+         patch("app.services.bilstm_service.get_bilstm_idx2tag", return_value=IDX2TAG):
+        payload = {"texts": ["I visited London", "London", "I visited"]}
+        response = client.post("/extract-with-bilstm/batch/", json=payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["extracted_locations"] for r in results] == [["London"], ["London"], []]
+    assert [r["spans"] for r in results] == [None, None, None] # Only returned with ?spans=true
+    assert model.calls == [(3, 3)]
+
+def test_extract_batch_rejects_empty_list(client):
+    """Test batch endpoints reject an empty list of texts."""
+    response = client.post("/extract-with-bilstm/batch/", json={"texts": []})
+    assert response.status_code == 422
+
+def test_metrics_endpoint_exposes_prometheus_text(client):
+    """Test /metrics reports request counters, stage latencies and process gauges in the Prometheus text format."""
+    response = client.post("/extract-with-bilstm/batch/", json={"texts": []})
+    assert response.status_code == 422
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE location_extractor_stage_latency_seconds histogram" in body
+    assert 'location_extractor_http_request_errors_total{method="POST",route="/extract-with-bilstm/batch/",status="422"}' in body
+    assert 'location_extractor_executor_queue_depth{executor="inference"} 0' in body
+    assert 'location_extractor_microbatch_size_count{batcher="bilstm-microbatcher"}' in body
+    assert "location_extractor_process_resident_memory_bytes " in body
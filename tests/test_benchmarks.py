@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.compare import compare_results
+from benchmarks.corpus import CORPUS_PRESETS, LOCATIONS, generate_corpus
+from benchmarks.load import parse_mix, run_level
+from main import app
+
+def test_corpus_is_reproducible_and_follows_the_length_preset():
+    """The same arguments give the same corpus, with token counts inside the preset bounds."""
+    corpus = generate_corpus("long", 20, location_density=0.1, seed=3)
+    assert corpus == generate_corpus("long", 20, location_density=0.1, seed=3)
+    assert corpus != generate_corpus("long", 20, location_density=0.1, seed=4)
+
+    spec = CORPUS_PRESETS["long"]
+    assert all(spec["min_tokens"] <= len(text.split()) <= spec["max_tokens"] for text in corpus)
+    assert all(any(location in text for location in LOCATIONS) for text in corpus)
+    assert not any(any(location in text for location in LOCATIONS) for text in generate_corpus("short", 20, location_density=0.0))
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    baseline = {"cases": {"spacy_single": {"throughput_texts_per_s": 100.0, "latency_p50_ms": 4.0, "latency_p95_ms": 8.0}}}
+    current = {"cases": {
+        "spacy_single": {"throughput_texts_per_s": 95.0, "latency_p50_ms": 5.0, "latency_p95_ms": 6.0},
+        "bilstm_single": {"throughput_texts_per_s": 1.0}, # Not in the baseline
+    }}
+
+    rows = {row["metric"]: row for row in compare_results(baseline, current, tolerance=0.15)}
+
+    assert set(rows) == {"throughput_texts_per_s", "latency_p50_ms", "latency_p95_ms"}
+    assert not rows["throughput_texts_per_s"]["regression"] # 5% slower
+    assert rows["latency_p50_ms"]["regression"] and rows["latency_p50_ms"]["change"] == 0.25
+    assert not rows["latency_p95_ms"]["regression"] and rows["latency_p95_ms"]["change"] < 0 # Faster
+
+def test_load_generator_reports_each_endpoint_of_the_mix():
+    """A short level against the in-process app reports throughput, statuses and loop lag."""
+    assert parse_mix("spacy=3,health=1") == {"spacy": 0.75, "health": 0.25}
+    with pytest.raises(ValueError):
+        parse_mix("unknown=1")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest") as client:
+            return await run_level(client, concurrency=4, duration=0.2, mix=parse_mix("health=1"), texts=["Paris"], seed=0)
+
+    level = asyncio.run(run())
+    assert level["requests"] > 0 and level["statuses"] == {"200": level["requests"]}
+    assert level["error_rate"] == 0.0 and level["throughput_rps"] > 0
+    assert level["endpoints"]["health"]["requests"] == level["requests"]
+    assert level["loop_lag_max_ms"] >= 0.0
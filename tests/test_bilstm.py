@@ -0,0 +1,214 @@
+import os
+
+import pytest
+import torch
+
+from app.models.bilstm import BiLSTM_CRF
+
+VOCAB_SIZE = 50
+NUM_TAGS = 5
+
+@pytest.fixture
+def bilstm_model():
+    """Small randomly initialised BiLSTM-CRF with the production layer layout."""
+    torch.manual_seed(0)
+    model = BiLSTM_CRF(vocab_size=VOCAB_SIZE, embed_dim=16, lstm_units=8, num_tags=NUM_TAGS,
+                       dropout_rate=0.35, num_bilstm_layers=2, padding_idx=0)
+    # Sharper emissions make Viterbi paths depend on the input rather than on near-ties
+    with torch.no_grad():
+        model.hidden2tag.weight.mul_(10)
+    return model.eval()
+
+def make_batch(lengths, seed=1):
+    """Random word IDs padded with 0 to the longest length, and the matching mask."""
+    generator = torch.Generator().manual_seed(seed)
+    max_len = max(lengths)
+    word_ids = torch.zeros(len(lengths), max_len, dtype=torch.long)
+    mask = torch.zeros(len(lengths), max_len, dtype=torch.bool)
+    for row, length in enumerate(lengths):
+        word_ids[row, :length] = torch.randint(2, VOCAB_SIZE, (length,), generator=generator)
+        mask[row, :length] = True
+    return word_ids, mask
+
+def test_packed_decode_matches_unpadded_sequences(bilstm_model):
+    """Decoding a padded batch gives the same emissions and tags as decoding each sequence unpadded."""
+    lengths = [7, 1, 19, 12, 19]
+    word_ids, mask = make_batch(lengths)
+
+    with torch.no_grad():
+        batch_tags = bilstm_model.decode(word_ids, mask)
+        batch_emissions = bilstm_model(word_ids, mask.sum(dim=1))
+        for row, length in enumerate(lengths):
+            single_ids = word_ids[row:row + 1, :length]
+            single_emissions = bilstm_model(single_ids)
+            assert torch.allclose(batch_emissions[row, :length], single_emissions[0], atol=1e-5)
+            assert batch_tags[row] == bilstm_model.decode(single_ids, mask[row:row + 1, :length])[0]
+
+def test_decode_is_independent_of_padding_amount(bilstm_model):
+    """Extra padding does not change the decoded tags."""
+    word_ids, mask = make_batch([9])
+    padded_ids = torch.nn.functional.pad(word_ids, (0, 91))
+    padded_mask = torch.nn.functional.pad(mask, (0, 91))
+
+    with torch.no_grad():
+        assert bilstm_model.decode(padded_ids, padded_mask) == bilstm_model.decode(word_ids, mask)
+
+def test_vectorized_viterbi_matches_torchcrf(bilstm_model):
+    """The batched Viterbi decoder returns the same paths as torchcrf.CRF.decode."""
+    with torch.no_grad():
+        bilstm_model.crf.transitions.normal_(0, 2)
+        bilstm_model.crf.start_transitions.normal_(0, 2)
+        bilstm_model.crf.end_transitions.normal_(0, 2)
+
+    for seed, lengths in enumerate([[1], [5], [7, 1, 19, 12, 19], list(range(1, 33))]):
+        word_ids, mask = make_batch(lengths, seed=seed)
+        with torch.no_grad():
+            assert bilstm_model.decode(word_ids, mask) == bilstm_model.decode_with_torchcrf(word_ids, mask)
+            padded = bilstm_model.decode_padded(word_ids, mask, pad_tag=-1)
+        assert padded.shape == word_ids.shape
+        assert bool((padded[~mask] == -1).all())
+
+def test_inference_backends_agree_with_fp32_on_reference_corpus(bilstm_model):
+    """Every inference backend decodes the reference corpus like the fp32 eager model."""
+    import re
+    from app.core.config import REFERENCE_CORPUS_PATH
+    from app.models.backends import BILSTM_BACKENDS, build_inference_model, check_backend_parity
+
+    word2idx = {"<PAD>": 0, "<UNK>": 1}
+    with open(REFERENCE_CORPUS_PATH, encoding="utf-8") as f:
+        for token in re.findall(r"\w+|[^\w\s]", f.read()):
+            if len(word2idx) < VOCAB_SIZE:
+                word2idx.setdefault(token, len(word2idx))
+
+    for backend in BILSTM_BACKENDS:
+        candidate = build_inference_model(bilstm_model, backend)
+        agreement = check_backend_parity(bilstm_model, candidate, word2idx, REFERENCE_CORPUS_PATH, backend)
+        assert agreement["sequences"] == 40
+        if backend == "dynamic_int8":
+            assert agreement["token_agreement"] >= 0.9
+        else:
+            assert agreement["token_agreement"] == 1.0
+
+def test_numpy_runtime_matches_torch_model(bilstm_model, tmp_path):
+    """The exported NumPy runtime reproduces the torch emissions and decoded tags."""
+    from app.models.numpy_bilstm import NumpyBiLSTM_CRF, export_bilstm_weights
+
+    weights_path = tmp_path / "bilstm_crf_weights.npz"
+    export_bilstm_weights(bilstm_model.state_dict(), str(weights_path))
+    numpy_model = NumpyBiLSTM_CRF.load(str(weights_path))
+
+    word_ids, mask = make_batch([7, 1, 19, 12, 19], seed=3)
+    with torch.no_grad():
+        torch_emissions = bilstm_model(word_ids, mask.sum(dim=1))
+        torch_tags = bilstm_model.decode(word_ids, mask)
+    numpy_emissions = numpy_model.forward(word_ids.numpy(), mask.numpy())
+
+    assert numpy_emissions[mask.numpy()] == pytest.approx(torch_emissions[mask].numpy(), abs=1e-4)
+    assert numpy_model.decode(word_ids.numpy(), mask.numpy()) == torch_tags
+
+def test_service_decode_times_forward_and_viterbi_separately(bilstm_model):
+    """The service decodes forward + viterbi as two timed stages, with the same tags as model.decode."""
+    from app.core.metrics import STAGE_LATENCY
+    from app.services.bilstm_service import _decode_padded
+
+    word_ids, mask = make_batch([6, 3, 9])
+    batch = [row[:length] for row, length in zip(word_ids.tolist(), mask.sum(dim=1).tolist())]
+    forward_before = STAGE_LATENCY.labels("bilstm", "forward").snapshot()["count"]
+    viterbi_before = STAGE_LATENCY.labels("bilstm", "viterbi").snapshot()["count"]
+
+    assert _decode_padded(bilstm_model, batch, pad_idx=0) == bilstm_model.decode(word_ids, mask)
+    assert STAGE_LATENCY.labels("bilstm", "forward").snapshot()["count"] == forward_before + 1
+    assert STAGE_LATENCY.labels("bilstm", "viterbi").snapshot()["count"] == viterbi_before + 1
+
+def test_safetensors_weights_are_memory_mapped_and_decode_identically(bilstm_model, tmp_path):
+    """Weights loaded from safetensors are views of the file mapping and give the same tags."""
+    import numpy as np
+    from app.models.artifacts import load_mmap_weights, save_weights
+
+    weights_path = tmp_path / "bilstm_crf_weights.safetensors"
+    save_weights(bilstm_model.state_dict(), str(weights_path))
+    weights = load_mmap_weights(str(weights_path))
+    assert all(isinstance(value.base, np.memmap) for value in weights.values())
+
+    mapped_model = BiLSTM_CRF(vocab_size=VOCAB_SIZE, embed_dim=16, lstm_units=8, num_tags=NUM_TAGS,
+                              dropout_rate=0.35, num_bilstm_layers=2, padding_idx=0)
+    mapped_model.load_state_dict({key: torch.from_numpy(value) for key, value in weights.items()}, assign=True)
+    mapped_model.eval()
+    embedding = weights["embedding.weight"]
+    assert mapped_model.embedding.weight.data_ptr() == embedding.__array_interface__["data"][0]
+
+    word_ids, mask = make_batch([7, 1, 19, 12], seed=4)
+    with torch.no_grad():
+        assert mapped_model.decode(word_ids, mask) == bilstm_model.decode(word_ids, mask)
+
+def test_crf_marginals_match_path_enumeration(bilstm_model):
+    """Forward-backward marginals equal the normalized sums over every tag path, in torch and NumPy."""
+    import itertools
+    from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+    lengths = [4, 1, 3]
+    word_ids, mask = make_batch(lengths, seed=5)
+    with torch.no_grad():
+        emissions = bilstm_model(word_ids, mask.sum(dim=1))
+        marginals = bilstm_model.marginals(emissions, mask)
+        crf = bilstm_model.crf
+        for row, length in enumerate(lengths):
+            expected = torch.zeros(length, NUM_TAGS, dtype=torch.float64)
+            for path in itertools.product(range(NUM_TAGS), repeat=length):
+                score = crf.start_transitions[path[0]] + crf.end_transitions[path[-1]]
+                score += sum(emissions[row, t, tag] for t, tag in enumerate(path))
+                score += sum(crf.transitions[a, b] for a, b in zip(path, path[1:]))
+                for t, tag in enumerate(path):
+                    expected[t, tag] += torch.exp(score.double())
+            expected /= expected[0].sum()
+            assert torch.allclose(marginals[row, :length].double(), expected, atol=1e-5)
+        assert bool((marginals[~mask] == 0).all())
+
+    numpy_model = NumpyBiLSTM_CRF.from_state_dict(bilstm_model.state_dict())
+    assert numpy_model.marginals(emissions.numpy(), mask.numpy()) == pytest.approx(marginals.numpy(), abs=1e-5)
+
+def test_input_projection_table_matches_embedding_and_input_gemm(bilstm_model, tmp_path):
+    """Gathering the first layer's input gates from the table gives the same emissions and tags, and the cached table is memory-mapped."""
+    import numpy as np
+    from app.models.loaders import attach_input_projection_table
+    from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+    numpy_model = NumpyBiLSTM_CRF.from_state_dict(bilstm_model.state_dict())
+    word_ids, mask = make_batch([7, 1, 19, 12, 19], seed=4)
+    word_ids, mask = word_ids.numpy(), mask.numpy()
+    expected_emissions = numpy_model.forward(word_ids, mask)
+    expected_tags = numpy_model.decode(word_ids, mask)
+
+    cache_path = str(tmp_path / "input_projection.npy")
+    attach_input_projection_table(numpy_model, cache_path=cache_path)
+    assert numpy_model.input_table.shape == (VOCAB_SIZE, 8 * 8)
+    assert numpy_model.forward(word_ids, mask)[mask] == pytest.approx(expected_emissions[mask], abs=1e-5)
+    assert numpy_model.decode(word_ids, mask) == expected_tags
+
+    reloaded = NumpyBiLSTM_CRF.from_state_dict(bilstm_model.state_dict())
+    attach_input_projection_table(reloaded, cache_path=cache_path)
+    assert isinstance(reloaded.input_table, np.memmap)
+    assert reloaded.decode(word_ids, mask) == expected_tags
+
+def test_input_projection_table_is_rebuilt_for_other_weights(bilstm_model, tmp_path):
+    """A cached table is only used with the weights it was built from, even if it is newer and has the right shape."""
+    import numpy as np
+    from app.models.loaders import attach_input_projection_table
+    from app.models.numpy_bilstm import NumpyBiLSTM_CRF
+
+    weights_path, cache_path = tmp_path / "weights.npz", str(tmp_path / "input_projection.npy")
+    weights_path.write_bytes(b"first weights")
+    attach_input_projection_table(NumpyBiLSTM_CRF.from_state_dict(bilstm_model.state_dict()), str(weights_path), cache_path)
+
+    state_dict = {name: tensor * 2 for name, tensor in bilstm_model.state_dict().items()}
+    weights_path.write_bytes(b"second, retrained weights")
+    os.utime(cache_path) # The stale table is newer than the weights
+    retrained = NumpyBiLSTM_CRF.from_state_dict(state_dict)
+    attach_input_projection_table(retrained, str(weights_path), cache_path)
+
+    assert not isinstance(retrained.input_table, np.memmap)
+    assert np.allclose(retrained.input_table, retrained.input_projection_table())
+    reloaded = NumpyBiLSTM_CRF.from_state_dict(state_dict)
+    attach_input_projection_table(reloaded, str(weights_path), cache_path)
+    assert isinstance(reloaded.input_table, np.memmap)
+    assert np.allclose(reloaded.input_table, retrained.input_table)
@@ -0,0 +1,79 @@
+import time
+
+from unittest.mock import patch
+
+from app.core.cache import ResultCache, result_cache_key
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    """The memory tier stays within max_bytes and evicts the least recently used entry first."""
+    value = {"locations": ["Paris"], "model_used": "spaCy"}
+    key_size = len(result_cache_key("spacy", "v1", "a"))
+    cache = ResultCache(max_bytes=3 * (key_size + 50), ttl_seconds=60)
+
+    for text in ("a", "b", "c"):
+        cache.set(result_cache_key("spacy", "v1", text), value)
+    assert cache.get(result_cache_key("spacy", "v1", "a")) == value # "a" is now most recently used
+    cache.set(result_cache_key("spacy", "v1", "d"), value)
+
+    assert cache.get(result_cache_key("spacy", "v1", "b")) is None
+    assert cache.get(result_cache_key("spacy", "v1", "a")) == value
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert (stats["memory_hits"], stats["misses"]) == (2, 1)
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=10)
+    key = result_cache_key("bilstm", "v1", "I visited Paris", False)
+    cache.set(key, {"locations": ["Paris"]})
+
+    with patch("app.core.cache.time.time", return_value=time.time() + 11):
+        assert cache.get(key) is None
+    assert cache.stats()["expirations"] == 1
+
+def test_disk_tier_is_shared_and_invalidated_per_backend(tmp_path):
+    """A second cache on the same SQLite file (another worker) sees stored results; invalidation is per backend."""
+    path = str(tmp_path / "cache.sqlite3")
+    writer = ResultCache(max_bytes=10_000, ttl_seconds=60, sqlite_path=path)
+    reader = ResultCache(max_bytes=10_000, ttl_seconds=60, sqlite_path=path)
+    spacy_key = result_cache_key("spacy", "v1", "Berlin")
+    bilstm_key = result_cache_key("bilstm", "v1", "Berlin", False)
+    writer.set(spacy_key, {"locations": ["Berlin"]})
+    writer.set(bilstm_key, {"locations": ["Berlin"]})
+
+    assert reader.get(spacy_key) == {"locations": ["Berlin"]}
+    assert reader.stats()["disk_hits"] == 1
+
+    writer.invalidate("spacy")
+    reader.invalidate("spacy")
+    assert reader.get(spacy_key) is None
+    assert reader.get(bilstm_key) == {"locations": ["Berlin"]}
+    writer.close()
+    reader.close()
+
+def test_key_uses_exact_text_and_options():
+    assert result_cache_key("spacy", "v1", "Paris") != result_cache_key("spacy", "v1", "paris")
+    assert result_cache_key("bilstm", "v1", "Paris", False) != result_cache_key("bilstm", "v1", "Paris", True)
+    assert result_cache_key("spacy", "v1", "Paris") != result_cache_key("spacy", "v2", "Paris")
+
+def test_busy_disk_tier_does_not_block_the_event_loop(tmp_path):
+    """While the disk tier is busy, aget() waits on a worker thread and memory hits are still served."""
+    import asyncio
+
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=60, sqlite_path=str(tmp_path / "cache.sqlite3"))
+    memory_key, missing_key = result_cache_key("spacy", "v1", "Berlin"), result_cache_key("spacy", "v1", "Lima")
+
+    async def run():
+        await cache.aset(memory_key, {"locations": ["Berlin"]})
+        cache._db_lock.acquire() # Another thread holds the SQLite file
+        disk_read = asyncio.ensure_future(cache.aget(missing_key))
+        await asyncio.sleep(0.05)
+        assert not disk_read.done()
+        assert await cache.aget(memory_key) == {"locations": ["Berlin"]}
+        cache._db_lock.release()
+        return await disk_read
+
+    assert asyncio.run(run()) is None
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
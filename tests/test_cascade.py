@@ -0,0 +1,72 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+import spacy
+import torch
+
+from app.models.bilstm import BiLSTM_CRF
+from app.services import cascade_service
+from tests.test_services import MockTokenizer, WORD2IDX, IDX2TAG
+
+@pytest.fixture
+def cascade_mocks():
+    torch.manual_seed(0)
+    model = BiLSTM_CRF(vocab_size=len(WORD2IDX), embed_dim=8, lstm_units=4, num_tags=len(IDX2TAG)).eval()
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "GPE", "pattern": "Paris"}])
+    with patch("app.services.cascade_service.get_spacy_tokenizer", return_value=MockTokenizer()), \
+         patch("app.services.cascade_service.get_bilstm_model", return_value=model), \
+         patch("app.services.cascade_service.get_bilstm_word2idx", return_value=WORD2IDX), \
+         patch("app.services.cascade_service.get_bilstm_idx2tag", return_value=IDX2TAG), \
+         patch("app.services.cascade_service.get_spacy_nlp", return_value=nlp):
+        yield model
+
+def test_confident_documents_keep_the_bilstm_result(cascade_mocks):
+    accepted_before = cascade_service.CASCADE_REQUESTS.value("accepted")
+    result = asyncio.run(cascade_service.extract_locations_with_cascade("I visited London and Paris", threshold=0.0))
+
+    assert not result["escalated"]
+    assert result["model_used"] == "Cascade (BiLSTM-CRF)"
+    assert 0.0 < result["confidence"] <= 1.0
+    assert all(span["confidence"] >= result["confidence"] for span in result["spans"])
+    assert cascade_service.CASCADE_REQUESTS.value("accepted") == accepted_before + 1
+
+def test_uncertain_documents_escalate_to_spacy(cascade_mocks):
+    escalated_before = cascade_service.CASCADE_REQUESTS.value("escalated")
+    result = asyncio.run(cascade_service.extract_locations_with_cascade("I visited London and Paris", threshold=1.01))
+
+    assert result["escalated"]
+    assert result["locations"] == ["Paris"]
+    assert result["spans"][0]["confidence"] is None
+    assert cascade_service.CASCADE_REQUESTS.value("escalated") == escalated_before + 1
+
+    stats = cascade_service.cascade_stats()
+    assert stats["escalated"] >= 1 and stats["mean_spacy_seconds"] > 0
+
+def test_process_engine_timings_reach_the_cascade_stats(cascade_mocks):
+    """With the process engine, the worker jobs' durations are recorded in the API process's stage latency histogram."""
+    from app.core.metrics import STAGE_LATENCY, suppress_metrics
+
+    class WorkerEngine:
+        """Runs jobs inline; like a worker process, whatever they record is not seen by this process."""
+        async def run(self, fn, *args):
+            with suppress_metrics():
+                return fn(*args)
+
+    def stage_count(stage):
+        return STAGE_LATENCY.labels("cascade", stage).snapshot()["count"]
+
+    before = stage_count("bilstm"), stage_count("spacy")
+    with patch("app.services.cascade_service.INFERENCE_ENGINE", "processes"), \
+         patch("app.services.cascade_service.is_served_by_workers", return_value=True), \
+         patch("app.services.cascade_service.get_process_engine", return_value=WorkerEngine()), \
+         patch("app.services.cascade_service._worker_models", return_value=(
+             cascade_mocks, MockTokenizer(), WORD2IDX, IDX2TAG)), \
+         patch("app.services.cascade_service._worker_spacy_nlp", return_value=cascade_service.get_spacy_nlp()):
+        result = asyncio.run(cascade_service.extract_locations_with_cascade("I visited London and Paris", threshold=1.01))
+
+    assert result["escalated"] and result["locations"] == ["Paris"]
+    assert (stage_count("bilstm"), stage_count("spacy")) == (before[0] + 1, before[1] + 1)
+    stats = cascade_service.cascade_stats()
+    assert stats["mean_bilstm_seconds"] > 0 and stats["mean_spacy_seconds"] > 0
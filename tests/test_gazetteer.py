@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.models.gazetteer import GazetteerMatcher
+from main import app
+
+ENTRIES = [("New York", "GPE"), ("New York City", "GPE"), ("São Paulo", "GPE"), ("Paris", "GPE"), ("Washington, D.C.", "GPE"), ("Nile", "LOC")]
+
+def _texts(spans):
+    return [(span["text"], span["label"]) for span in spans]
+
+def test_matches_longest_names_on_token_boundaries():
+    matcher = GazetteerMatcher.build(ENTRIES, folding="casefold")
+    text = "From New York City to new york, then Washington, D.C.; Parisian cafés and the Nile."
+    spans = matcher.find(text)
+
+    assert _texts(spans) == [("New York City", "GPE"), ("new york", "GPE"), ("Washington, D.C.", "GPE"), ("Nile", "LOC")]
+    assert all(text[span["start"]:span["end"]] == span["text"] for span in spans)
+    assert (spans[0]["token_start"], spans[0]["token_end"]) == (1, 4)
+
+def test_folding_modes():
+    text = "Sao Paulo and PARIS"
+    assert _texts(GazetteerMatcher.build(ENTRIES, folding="none").find(text)) == []
+    assert _texts(GazetteerMatcher.build(ENTRIES, folding="casefold").find(text)) == [("PARIS", "GPE")]
+    assert _texts(GazetteerMatcher.build(ENTRIES, folding="casefold_ascii").find(text)) == [("Sao Paulo", "GPE"), ("PARIS", "GPE")]
+
+def test_saved_index_loads_with_its_settings(tmp_path):
+    index_path = str(tmp_path / "locations.marisa")
+    GazetteerMatcher.build(ENTRIES, folding="casefold_ascii").save(index_path)
+    matcher = GazetteerMatcher.load(index_path)
+
+    assert (len(matcher), matcher.folding, matcher.max_tokens) == (len(ENTRIES), "casefold_ascii", 6)
+    assert _texts(matcher.find("Flights to são paulo")) == [("são paulo", "GPE")]
+
+def test_gazetteer_endpoint_returns_location_out():
+    matcher = GazetteerMatcher.build(ENTRIES)
+    with patch("app.services.gazetteer_service.get_gazetteer", return_value=matcher):
+        response = TestClient(app).post("/extract-with-gazetteer/?spans=true", json={"text": "Paris, then New York and Paris."})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["extracted_locations"] == ["Paris", "New York"]
+    assert data["model_used"] == "Gazetteer"
+    assert [span["start"] for span in data["spans"]] == [0, 12, 25]
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.core.config import SPACY_MODEL_PATH
+from app.models import loaders
+from main import app
+
+@pytest.fixture
+def fresh_status():
+    """Resets the backend load status to 'not_loaded' for the duration of a test."""
+    status = {"spacy": "not_loaded", "bilstm": "not_loaded", "gazetteer": "not_loaded"}
+    with patch.dict(loaders.model_status, status):
+        yield loaders.model_status
+
+def test_lazy_loading_loads_backend_once_on_first_use(fresh_status):
+    """Concurrent first requests in lazy mode trigger exactly one load of the backend."""
+    calls = []
+
+    def slow_loader():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return object()
+
+    async def first_requests():
+        await asyncio.gather(*(loaders.ensure_model_loaded("spacy") for _ in range(5)))
+
+    with patch.object(loaders, "MODEL_LOADING_MODE", "lazy"), \
+         patch.dict(loaders._BACKEND_LOADERS, {"spacy": slow_loader}), \
+         patch.object(loaders, "get_spacy_nlp", return_value=object()):
+        assert loaders.is_backend_usable("spacy")
+        asyncio.run(first_requests())
+
+    assert len(calls) == 1
+    assert fresh_status["spacy"] == "ready"
+    assert fresh_status["bilstm"] == "not_loaded"
+
+def test_ready_endpoint_reports_usable_backends(fresh_status):
+    """/ready is 503 until one enabled backend is ready, then 200 while the other is still loading."""
+    client = TestClient(app)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["backends"] == {"spacy": "not_loaded", "bilstm": "not_loaded", "gazetteer": "not_loaded"}
+
+    fresh_status.update({"spacy": "loading", "bilstm": "ready"})
+    with patch("main.WARMUP_ENABLED", False):
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["usable_backends"] == ["bilstm"]
+
+def test_backend_is_not_ready_until_warmup_finishes(fresh_status):
+    """A backend loaded with warm_up runs every length/batch size shape while /ready reports 503, even with another backend usable."""
+    from app.core.config import WARMUP_TOKEN_LENGTHS, WARMUP_BATCH_SIZES
+    from app.services import warmup
+
+    client = TestClient(app)
+    fresh_status["gazetteer"] = "ready" # Usable, but the instance is not ready while spaCy warms up
+    seen = []
+
+    def warm_call(text, batch_size):
+        seen.append((len(text.split()), batch_size, fresh_status["spacy"], client.get("/ready").status_code))
+
+    with patch.dict(loaders._BACKEND_LOADERS, {"spacy": lambda: object()}), \
+         patch.dict(loaders.model_versions), \
+         patch.dict(warmup._WARMUP_CALLS, {"spacy": warm_call}), \
+         patch.dict(warmup.warmup_results, clear=True):
+        loaders.load_model("spacy", warm_up=True)
+        response = client.get("/ready")
+
+    assert [(tokens, batch_size) for tokens, batch_size, _, _ in seen] == [
+        (tokens, batch_size) for tokens in WARMUP_TOKEN_LENGTHS for batch_size in WARMUP_BATCH_SIZES
+    ]
+    assert {(status, code) for _, _, status, code in seen} == {("warming_up", 503)}
+    assert fresh_status["spacy"] == "ready"
+    assert response.status_code == 200
+    assert response.json()["warmup"]["spacy"]["calls"] == len(seen)
+
+def test_warmup_is_not_recorded_in_production_metrics():
+    """Real warmup calls run the spaCy pipeline without adding samples to the stage latency or token length histograms."""
+    from app.core.metrics import STAGE_LATENCY, TOKEN_LENGTH
+    from app.services import warmup
+
+    loaders.load_model("spacy")
+    before = STAGE_LATENCY.labels("spacy", "pipeline").snapshot()["count"], TOKEN_LENGTH.labels("spacy").snapshot()["count"]
+    with patch.dict(warmup.warmup_results, clear=True):
+        result = warmup.warm_up("spacy")
+    after = STAGE_LATENCY.labels("spacy", "pipeline").snapshot()["count"], TOKEN_LENGTH.labels("spacy").snapshot()["count"]
+
+    assert result["error"] is None and result["calls"]
+    assert after == before
+
+def test_bilstm_shares_the_spacy_pipeline_loading_in_parallel(fresh_status):
+    """In parallel mode, the BiLSTM waits for the spaCy load in progress instead of loading a second spaCy."""
+    pipeline = object()
+    started = threading.Event()
+
+    def slow_spacy_loader():
+        started.set()
+        time.sleep(0.1)
+        loaders.spacy_nlp = pipeline
+        return pipeline
+
+    with patch.object(loaders, "MODEL_LOADING_MODE", "parallel"), \
+         patch.object(loaders, "spacy_nlp", None), \
+         patch.dict(loaders._BACKEND_LOADERS, {"spacy": slow_spacy_loader}), \
+         patch.dict(loaders.model_versions), \
+         patch.object(loaders, "_load_spacy_tokenizer") as load_tokenizer_only:
+        spacy_thread = threading.Thread(target=loaders.load_model, args=("spacy",))
+        spacy_thread.start()
+        started.wait(1)
+        assert loaders._shared_spacy_tokenizer() is pipeline
+        spacy_thread.join()
+
+    load_tokenizer_only.assert_not_called()
+    assert fresh_status["spacy"] == "ready"
+
+def test_process_engine_leaves_worker_backends_to_the_workers(fresh_status):
+    """With the process engine, the API process loads only the gazetteer and takes the models' status and version from the workers."""
+    loaded = []
+    worker_statuses = [
+        {"pid": pid, "backends": {"spacy": "ready", "bilstm": bilstm, "gazetteer": "not_loaded"},
+         "versions": {"spacy": "v1", "bilstm": "v2" if bilstm == "ready" else None, "gazetteer": None}}
+        for pid, bilstm in ((1, "ready"), (2, "failed"))
+    ]
+
+    with patch.object(loaders, "INFERENCE_ENGINE", "processes"), \
+         patch.object(loaders, "MODEL_LOADING_MODE", "sequential"), \
+         patch.object(loaders, "load_model", side_effect=lambda backend, warm_up=False: loaded.append(backend)), \
+         patch.dict(loaders.model_versions, clear=True):
+        loaders.start_model_loading()
+        loaders.record_worker_models(worker_statuses)
+        versions = dict(loaders.model_versions)
+        served = {backend: loaders.is_served_by_workers(backend) for backend in ("spacy", "bilstm", "gazetteer")}
+
+    assert loaded == ["gazetteer"]
+    assert fresh_status["spacy"] == "ready" and fresh_status["bilstm"] == "failed"
+    assert versions == {"spacy": "v1"}
+    assert served == {"spacy": True, "bilstm": False, "gazetteer": False}
+
+def test_tokenizer_only_spacy_matches_full_pipeline():
+    """The tokenizer-only spaCy object has no pipeline components but tokenizes like the full model."""
+    import spacy
+
+    text = "I flew from New York to St. Petersburg, then on to São Paulo!"
+    tokenizer_only = loaders._load_spacy_tokenizer()
+    full = spacy.load(SPACY_MODEL_PATH)
+
+    assert tokenizer_only.pipe_names == []
+    assert [t.text for t in tokenizer_only.tokenizer(text)] == [t.text for t in full.tokenizer(text)]
+
+def test_trie_vocab_matches_pickled_word2idx(tmp_path):
+    """The memory-mapped vocabulary exported from ner_word2idx.pkl maps every word like the dict."""
+    from app.core.config import WORD2IDX_PATH, UNK_IDX
+    from app.models.artifacts import TrieVocab
+
+    word2idx = loaders.read_pickled_word2idx(WORD2IDX_PATH)
+    TrieVocab.save(word2idx, str(tmp_path / "vocab.marisa"), str(tmp_path / "vocab.indices.npy"))
+    vocab = TrieVocab.load(str(tmp_path / "vocab.marisa"), str(tmp_path / "vocab.indices.npy"))
+
+    assert len(vocab) == len(word2idx)
+    assert dict(vocab.items()) == word2idx
+    words = list(word2idx)[:500] + ["not-a-word-in-the-vocabulary"]
+    assert vocab.encode(words, UNK_IDX) == [word2idx.get(word, UNK_IDX) for word in words]
+    assert vocab.get("not-a-word-in-the-vocabulary", -1) == -1
@@ -0,0 +1,74 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from app.core.logs import JsonFormatter, NonBlockingQueueHandler, SampledRequestLogger, log_sampled_var, new_request_id
+from main import app
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_queue_handler_merges_arguments_eagerly_and_drops_when_full():
+    """Records reach the queue with their arguments merged but not formatted, and a full queue drops records instead of blocking."""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.setFormatter(JsonFormatter())
+    test_logger = logging.getLogger("tests.queue")
+    test_logger.propagate = False
+    test_logger.addHandler(handler)
+    locations = ["Paris"]
+    try:
+        test_logger.warning("extracted %s", locations)
+        test_logger.warning("extracted %s", ["Rome"])
+    finally:
+        test_logger.removeHandler(handler)
+    locations.append("Rome") # Changed by the caller before the listener gets to the record
+
+    record = handler.queue.get_nowait()
+    assert (record.msg, record.args) == ("extracted ['Paris']", None)
+    assert not hasattr(record, "message") # The formatter has not run
+    assert handler.dropped == 1
+
+def test_sampled_request_logger_skips_unsampled_requests():
+    handler = ListHandler()
+    test_logger = logging.getLogger("tests.sampling")
+    test_logger.propagate = False
+    test_logger.setLevel(logging.INFO)
+    test_logger.addHandler(handler)
+    request_logger = SampledRequestLogger(test_logger)
+
+    token = log_sampled_var.set(False)
+    request_logger.info("not sampled %s", 1)
+    log_sampled_var.reset(token)
+    request_logger.info("sampled %s", 2)
+
+    assert [record.getMessage() for record in handler.records] == ["sampled 2"]
+
+def test_request_id_is_echoed_and_unsafe_ids_are_replaced():
+    assert new_request_id("req-42") == "req-42"
+    assert new_request_id("bad id\n") != "bad id\n"
+
+    client = TestClient(app)
+    assert client.get("/health", headers={"X-Request-ID": "req-42"}).headers["X-Request-ID"] == "req-42"
+    assert len(client.get("/health").headers["X-Request-ID"]) == 32
+
+def test_completion_log_carries_request_fields(caplog):
+    """The sampled completion line has the request ID, status, duration and stage timings as JSON fields."""
+    client = TestClient(app)
+    with caplog.at_level(logging.INFO):
+        client.post("/extract-with-spacy/batch/", json={"texts": []}, headers={"X-Request-ID": "req-7"})
+
+    completed = [record for record in caplog.records if getattr(record, "fields", None)]
+    assert completed and completed[-1].request_id == "req-7"
+    fields = completed[-1].fields
+    assert (fields["method"], fields["path"], fields["status"]) == ("POST", "/extract-with-spacy/batch/", 422)
+    assert fields["duration_ms"] >= 0 and fields["stages_ms"] == {}
+
+    entry = json.loads(JsonFormatter().format(completed[-1]))
+    assert entry["request_id"] == "req-7" and entry["status"] == 422 and entry["message"].startswith("POST ")
@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import patch
+
+import spacy
+
+from app.services import prefilter
+from app.services.prefilter import has_location_candidate, prefilter_skips
+from app.services.spacy_service import extract_locations_with_spacy_batch
+
+def _ruler_nlp():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "GPE", "pattern": "Paris"}, {"label": "GPE", "pattern": "paris"}])
+    return nlp
+
+def test_candidate_signals():
+    assert not has_location_candidate("The meeting was moved to Friday. I will call back.")
+    assert not has_location_candidate("Prices rose 3% in March.")
+    assert has_location_candidate("Flights to Paris were cancelled.")
+    assert has_location_candidate("flights to paris", lexicon=frozenset({"paris"}))
+    assert not has_location_candidate("flights to paris")
+
+def test_batch_runs_the_model_only_on_candidates():
+    nlp = _ruler_nlp()
+    texts = ["nothing to see here.", "We flew to Paris.", "all lower case again."]
+    with patch("app.services.prefilter.PREFILTER_ENABLED", True), \
+         patch("app.services.prefilter.PREFILTER_AUDIT_SAMPLE_RATE", 0.0), \
+         patch("app.services.spacy_service.get_spacy_nlp", return_value=nlp), \
+         patch.object(nlp, "pipe", wraps=nlp.pipe) as pipe:
+        result = asyncio.run(extract_locations_with_spacy_batch(texts))
+
+    assert list(pipe.call_args.args[0]) == ["We flew to Paris."]
+    assert [r["locations"] for r in result["results"]] == [[], ["Paris"], []]
+
+def test_audit_counts_false_negatives():
+    nlp = _ruler_nlp()
+    extract_spans = lambda text: [{"text": ent.text} for ent in nlp(text).ents]
+    before = prefilter.PREFILTER_AUDITS.value("spacy", "false_negative")
+
+    async def skip_and_audit():
+        skipped = prefilter_skips("spacy", "we flew to paris.", extract_spans)
+        await asyncio.gather(*prefilter._audit_tasks)
+        return skipped
+
+    with patch("app.services.prefilter.PREFILTER_ENABLED", True), \
+         patch("app.services.prefilter.PREFILTER_AUDIT_SAMPLE_RATE", 1.0), \
+         patch("app.services.prefilter.get_gazetteer", return_value=None):
+        assert asyncio.run(skip_and_audit())
+
+    assert prefilter.PREFILTER_AUDITS.value("spacy", "false_negative") == before + 1
+    assert prefilter.prefilter_stats()["backends"]["spacy"]["false_negatives"] >= 1
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from unittest.mock import patch
+
+from app.core.config import INFERENCE_PROCESS_START_TIMEOUT_SECONDS
+from app.core.process_engine import ProcessInferenceEngine
+from app.models import loaders
+from app.models.loaders import get_model_status, get_spacy_nlp, load_model
+from app.services import spacy_service
+
+TEXTS = ["I flew from Paris to Berlin.", "Nothing here.", "Rome is lovely.", "Visiting Madrid and Lisbon."]
+
+def test_process_engine_matches_thread_results_and_keeps_order():
+    """A spaCy worker process returns the same spans as the in-process pipeline, and chunked runs keep input order."""
+    load_model("spacy")
+    expected = [spacy_service._extract_sync(get_spacy_nlp(), text) for text in TEXTS]
+
+    engine = ProcessInferenceEngine(max_workers=2, torch_threads=1, backends=("spacy",), name="test-process")
+    try:
+        statuses = engine.start()
+        assert len({status["pid"] for status in statuses}) == 2
+        assert all(status["backends"]["spacy"] == "ready" for status in statuses)
+
+        async def run():
+            single = await engine.run(spacy_service._extract_in_worker, TEXTS[0])
+            batch = await engine.run_chunked(spacy_service._extract_batch_in_worker, TEXTS, 8)
+            return single, batch
+
+        single, batch = asyncio.run(run())
+    finally:
+        engine.shutdown()
+
+    assert single["spans"] == expected[0]
+    assert [result["spans"] for result in batch] == expected
+
+def test_process_engine_replaces_a_broken_pool():
+    """After a worker process dies, the failed job raises BrokenProcessPool, new workers start at once and report their models."""
+    engine = ProcessInferenceEngine(max_workers=1, torch_threads=1, backends=("spacy",), name="test-broken")
+    with patch.dict(loaders.model_status, {"spacy": "ready"}), patch.dict(loaders.model_versions):
+        try:
+            async def run():
+                first_pid = await engine.run(os.getpid)
+                with pytest.raises(BrokenProcessPool):
+                    await engine.run(os._exit, 1)
+                status_during_restart = get_model_status()["spacy"]
+                engine._restart_thread.join(INFERENCE_PROCESS_START_TIMEOUT_SECONDS)
+                return first_pid, status_during_restart, await engine.run(os.getpid)
+
+            first_pid, status_during_restart, second_pid = asyncio.run(run())
+            status_after_restart, version = get_model_status()["spacy"], loaders.get_model_version("spacy")
+        finally:
+            engine.shutdown()
+
+    assert first_pid != second_pid
+    assert engine.stats()["restarts"] == 1
+    assert status_during_restart == "loading"
+    assert status_after_restart == "ready" and version is not None
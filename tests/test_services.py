@@ -0,0 +1,327 @@
+import asyncio
+import re
+import pytest
+import torch
+from unittest.mock import patch
+
+from app.models.bilstm import BiLSTM_CRF
+from app.services import bilstm_service
+from app.services.batching import MicroBatcher
+
+class MockToken:
+    def __init__(self, text, idx=0):
+        self.text = text
+        self.idx = idx
+
+class MockTokenizer:
+    """Whitespace tokenizer standing in for spacy_nlp.tokenizer."""
+    @staticmethod
+    def tokenizer(text):
+        return [MockToken(m.group(), m.start()) for m in re.finditer(r"\S+", text)]
+
+WORD2IDX = {"<PAD>": 0, "<UNK>": 1, "I": 2, "visited": 3, "London": 4, "and": 5, "Paris": 6}
+IDX2TAG = {0: "O", 1: "B-LOC", 2: "I-LOC"}
+
+class RecordingModel(BiLSTM_CRF):
+    """
+    Small real BiLSTM-CRF whose weights tag London and Paris as B-LOC and every other word as O.
+    Records the shape of every forward call.
+    """
+    def __init__(self):
+        super().__init__(vocab_size=len(WORD2IDX), embed_dim=1, lstm_units=1, num_tags=len(IDX2TAG))
+        with torch.no_grad():
+            for parameter in self.parameters():
+                parameter.zero_()
+            self.embedding.weight[[WORD2IDX["London"], WORD2IDX["Paris"]]] = 1.0
+            for direction in ("", "_reverse"):
+                # Input and output gates open, forget gate closed: each hidden state depends only on its own word
+                getattr(self.lstm, f"bias_ih_l0{direction}")[:] = torch.tensor([10.0, -10.0, 0.0, 10.0])
+                getattr(self.lstm, f"weight_ih_l0{direction}")[2, 0] = 3.0
+            self.hidden2tag.weight[1] = 5.0
+            self.hidden2tag.bias[:] = torch.tensor([0.0, -2.5, -10.0])
+        self.calls = []
+        self.eval()
+
+    def forward(self, word_ids, lengths=None):
+        self.calls.append(tuple(word_ids.shape))
+        return super().forward(word_ids, lengths)
+
+@pytest.fixture
+def bilstm_mocks():
+    model = RecordingModel()
+    with patch("app.services.bilstm_service.get_spacy_tokenizer", return_value=MockTokenizer()), \
+         patch("app.services.bilstm_service.get_bilstm_model", return_value=model), \
+         patch("app.services.bilstm_service.get_bilstm_word2idx", return_value=WORD2IDX), \
+         patch("app.services.bilstm_service.get_bilstm_idx2tag", return_value=IDX2TAG):
+        yield model
+
+def test_concurrent_bilstm_requests_share_one_decode(bilstm_mocks):
+    """The first call is decoded at once; the calls that arrive while it runs are micro-batched into one padded decode call."""
+    texts = ["I visited London", "Paris", "I visited London and Paris", "nothing"]
+
+    async def run():
+        return await asyncio.gather(*(bilstm_service.extract_locations_with_bilstm(t) for t in texts))
+
+    results = asyncio.run(run())
+
+    assert [r["locations"] for r in results] == [["London"], ["Paris"], ["London", "Paris"], []]
+    assert bilstm_mocks.calls == [(1, 3), (3, 5)]
+
+def test_identical_concurrent_requests_share_one_extraction(bilstm_mocks):
+    """Concurrent calls with the same text and options run one extraction; each gets its own copy."""
+    from app.services.coalescing import COALESCED_REQUESTS
+
+    coalesced_before = COALESCED_REQUESTS.value("bilstm")
+
+    async def run():
+        same = [bilstm_service.extract_locations_with_bilstm("I visited London") for _ in range(5)]
+        return await asyncio.gather(*same, bilstm_service.extract_locations_with_bilstm("I visited London", long_document=True))
+
+    results = asyncio.run(run())
+
+    assert [r["locations"] for r in results] == [["London"]] * 6
+    assert bilstm_mocks.calls == [(1, 3), (1, 3)] # One sequence per distinct (text, options)
+    assert COALESCED_REQUESTS.value("bilstm") == coalesced_before + 4
+    results[1]["locations"].append("Paris")
+    assert results[0]["locations"] == ["London"]
+
+def test_micro_batcher_splits_at_max_batch_size():
+    """
+    A lone item runs at once; items submitted while it runs are flushed as soon as max_batch_size
+    of them are pending. Batch sizes are recorded.
+    """
+    seen_batches = []
+    def double(items):
+        seen_batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=3, max_wait_ms=50, name="test")
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8, 10, 12]
+    assert seen_batches == [[0], [1, 2, 3], [4, 5, 6]]
+    stats = batcher.stats()
+    assert stats["batch_size"]["count"] == 3
+    assert stats["queue_wait_seconds"]["count"] == 7
+    assert stats["running"] == 0
+
+def test_micro_batcher_does_not_delay_a_lone_request():
+    """Without other batches pending or in flight, an item is run at once instead of waiting max_wait_ms."""
+    import time
+    batcher = MicroBatcher(lambda items: [item + 1 for item in items], max_batch_size=8, max_wait_ms=10_000, name="test")
+
+    async def run():
+        return [await batcher.submit(i) for i in range(3)]
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == [1, 2, 3]
+    assert time.perf_counter() - started < 1.0
+    assert batcher.stats()["batch_size"]["count"] == 3
+
+def test_inference_executor_rejects_when_saturated():
+    """Jobs beyond max_workers + queue_limit are rejected instead of queueing without bound."""
+    import threading
+    from app.core.executor import InferenceExecutor, ExecutorSaturatedError
+
+    executor = InferenceExecutor(max_workers=1, queue_limit=1, name="test")
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.01)
+        assert executor.queue_depth == 1
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(lambda: "rejected")
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(run()) == (True, "queued")
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
+
+def test_long_document_mode_decodes_all_windows_in_one_call(bilstm_mocks):
+    """Long-document mode covers every token with overlapping windows decoded in one batch."""
+    words = ["and"] * 250
+    words[5], words[150], words[240] = "London", "Paris", "London"
+    text = " ".join(words)
+
+    truncated = asyncio.run(bilstm_service.extract_locations_with_bilstm(text))
+    assert truncated["locations"] == ["London"]
+
+    bilstm_mocks.calls.clear()
+    result = asyncio.run(bilstm_service.extract_locations_with_bilstm(text, long_document=True))
+    assert result["locations"] == ["London", "Paris"]
+    assert bilstm_mocks.calls == [(3, 100)]
+
+def test_window_merge_prefers_the_most_central_window():
+    """Overlapping tokens take the tag of the window where they have the most context."""
+    starts = bilstm_service._window_starts(8, window=5, overlap=3)
+    assert starts == [0, 2, 3]
+    merged = bilstm_service._merge_window_tags(8, starts, [[0, 0, 0, 0, 1], [2, 2, 2, 2, 2], [3, 3, 3, 3, 3]])
+    assert merged == [0, 0, 0, 0, 2, 3, 3, 3]
+
+def test_repeated_bilstm_text_is_served_from_result_cache(bilstm_mocks):
+    """A repeated text is answered from the result cache until the model is reloaded."""
+    from app.core.cache import ResultCache
+    from app.models import loaders
+
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=60)
+    with patch("app.services.bilstm_service.get_result_cache", return_value=cache), \
+         patch("app.models.loaders.get_result_cache", return_value=cache), \
+         patch.dict(loaders.model_versions, {"bilstm": "v1"}), \
+         patch.dict(loaders.model_status, {"bilstm": "ready"}), \
+         patch.dict(loaders._BACKEND_LOADERS, {"bilstm": lambda: bilstm_mocks}), \
+         patch("app.models.loaders._model_version", return_value="v2"):
+        first = asyncio.run(bilstm_service.extract_locations_with_bilstm("I visited London"))
+        second = asyncio.run(bilstm_service.extract_locations_with_bilstm("I visited London"))
+        assert first == second
+        assert first["locations"] == ["London"]
+        assert len(bilstm_mocks.calls) == 1
+
+        loaders.reload_model("bilstm")
+        assert loaders.get_model_version("bilstm") == "v2"
+        assert cache.stats()["entries"] == 0
+        asyncio.run(bilstm_service.extract_locations_with_bilstm("I visited London"))
+        assert len(bilstm_mocks.calls) == 2
+
+def test_split_sentences_keeps_offsets_and_abbreviations():
+    from app.services.sentence_memo import split_sentences
+
+    text = "PARIS, May 3 (Reuters)\nMr. Smith flew to St. Petersburg. He met officials in the U.S. Embassy! Later he left.  "
+    sentences = [text[start:end] for start, end in split_sentences(text)]
+
+    assert sentences == [
+        "PARIS, May 3 (Reuters)",
+        "Mr. Smith flew to St. Petersburg.",
+        "He met officials in the U.S. Embassy!",
+        "Later he left.",
+    ]
+
+def test_sentence_mode_only_decodes_changed_sentences(bilstm_mocks):
+    """Re-sending an edited document decodes only the new sentences; spans keep document offsets."""
+    from app.core.cache import ResultCache
+    from app.models import loaders
+
+    original = "I visited London\nI visited Paris\nnothing"
+    edited = "I visited London\nI visited London and Paris\nnothing"
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=60)
+
+    with patch("app.services.sentence_memo.get_sentence_cache", return_value=cache), \
+         patch.dict(loaders.model_versions, {"bilstm": "v1"}):
+        first = asyncio.run(bilstm_service.extract_locations_with_bilstm(original, by_sentence=True))
+        second = asyncio.run(bilstm_service.extract_locations_with_bilstm(edited, by_sentence=True))
+
+    assert bilstm_mocks.calls == [(3, 3), (1, 5)]
+    assert first["locations"] == ["London", "Paris"]
+    assert (first["sentences"], first["sentences_computed"]) == (3, 3)
+    assert (second["sentences"], second["sentences_computed"]) == (3, 1)
+    assert [edited[span["start"]:span["end"]] for span in second["spans"]] == ["London", "London", "Paris"]
+    assert [span["start"] for span in second["spans"]] == [10, 27, 38]
+    assert [(span["token_start"], span["token_end"]) for span in second["spans"]] == [(2, 3), (5, 6), (7, 8)]
+
+def test_spacy_sentence_mode_spans_match_document_mode():
+    """With the real pipeline, whitespace tokens between sentences are counted, so token indices match the whole-document ones."""
+    from app.models import loaders
+    from app.services import spacy_service
+
+    text = " I flew to Paris.\n\nThen  I went to Berlin and Rome.\tI flew to Paris. \n I went to Berlin.\n\n\nI flew to London."
+    nlp = loaders.load_model("spacy")
+    document_spans = spacy_service._spans_from_doc(nlp(text))
+    result = asyncio.run(spacy_service.extract_locations_with_spacy(text, by_sentence=True))
+
+    assert len(document_spans) >= 4
+    assert [(span["start"], span["token_start"], span["token_end"]) for span in result["spans"]] == [
+        (span["start"], span["token_start"], span["token_end"]) for span in document_spans
+    ]
+
+def test_bilstm_spans_use_exact_input_text_and_linear_dedupe(bilstm_mocks):
+    """Multi-token locations keep the original spacing; repeated locations are listed once, in order."""
+    idx2tag = {0: "O", 1: "B-LOC", 2: "I-LOC"}
+    text = "Paris  London visited Paris"
+    # RecordingModel tags London/Paris as B-LOC; make London continue the Paris location
+    with patch("app.services.bilstm_service.get_bilstm_idx2tag", return_value=idx2tag), \
+         patch.object(bilstm_mocks, "viterbi", lambda emissions, mask: torch.tensor([[1, 2, 0, 1]])):
+        result = asyncio.run(bilstm_service.extract_locations_with_bilstm_batch([text]))["results"][0]
+
+    assert result["locations"] == ["Paris  London", "Paris"]
+    assert [(s["start"], s["end"], s["token_start"], s["token_end"]) for s in result["spans"]] == [(0, 13, 0, 2), (22, 27, 3, 4)]
+    assert {s["label"] for s in result["spans"]} == {"LOC"}
+
+def test_merge_spans_policies():
+    """Overlapping spans form one cluster; the policy decides which clusters are kept."""
+    from app.services.ensemble_service import merge_spans
+    from app.services.spans import make_span
+
+    spacy_spans = [make_span(0, 8, "New York", "GPE", 0, 2), make_span(20, 25, "Paris", "GPE", 5, 6)]
+    bilstm_spans = [make_span(4, 8, "York", "LOC", 1, 2), make_span(30, 34, "Lima", "LOC", 8, 9)]
+    spans_by_model = {"spacy": spacy_spans, "bilstm": bilstm_spans}
+    weights = {"spacy": 0.6, "bilstm": 0.4}
+
+    union = merge_spans(spans_by_model, "union", weights)
+    assert [(s["text"], s["sources"]) for s in union] == [("New York", ["bilstm", "spacy"]), ("Paris", ["spacy"]), ("Lima", ["bilstm"])]
+    assert [s["text"] for s in merge_spans(spans_by_model, "intersection", weights)] == ["New York"]
+    assert [s["text"] for s in merge_spans(spans_by_model, "vote", weights, threshold=0.5)] == ["New York", "Paris"]
+
+def test_ensemble_shares_tokenization_between_models(bilstm_mocks):
+    """The ensemble decodes the spaCy Doc's tokens with the BiLSTM and merges both models' spans."""
+    import spacy
+    from app.core.config import SPACY_MODEL_PATH
+    from app.services import ensemble_service
+
+    nlp = spacy.load(SPACY_MODEL_PATH)
+    text = "I visited London and Paris"
+    with patch("app.services.ensemble_service.get_spacy_nlp", return_value=nlp), \
+         patch("app.services.ensemble_service.get_bilstm_model", return_value=bilstm_mocks), \
+         patch("app.services.ensemble_service.get_bilstm_word2idx", return_value=WORD2IDX), \
+         patch("app.services.ensemble_service.get_bilstm_idx2tag", return_value=IDX2TAG), \
+         patch.object(nlp, "make_doc", wraps=nlp.make_doc) as make_doc:
+        result = asyncio.run(ensemble_service.extract_locations_with_ensemble(text, policy="union"))
+
+    assert make_doc.call_count == 1
+    assert bilstm_mocks.calls == [(1, 5)]
+    assert result["locations"] == ["London", "Paris"]
+    assert all(text[s["start"]:s["end"]] == s["text"] and "bilstm" in s["sources"] for s in result["spans"])
+    assert [(s["token_start"], s["token_end"]) for s in result["spans"]] == [(2, 3), (4, 5)]
+
+def test_ensemble_runs_both_models_concurrently(bilstm_mocks):
+    """The two model calls overlap, so the ensemble takes about as long as the slower one."""
+    import time
+    from app.services import ensemble_service
+
+    def slow(result):
+        def run(*args):
+            time.sleep(0.2)
+            return result
+        return run
+
+    with patch("app.services.ensemble_service.get_spacy_nlp", return_value=object()), \
+         patch("app.services.ensemble_service.get_bilstm_model", return_value=bilstm_mocks), \
+         patch("app.services.ensemble_service.get_bilstm_word2idx", return_value=WORD2IDX), \
+         patch("app.services.ensemble_service.get_bilstm_idx2tag", return_value=IDX2TAG), \
+         patch("app.services.ensemble_service._tokenize_sync", return_value=(None, [], [], [])), \
+         patch("app.services.ensemble_service._spacy_spans_sync", slow([])), \
+         patch("app.services.ensemble_service._bilstm_spans_sync", slow([])):
+        started = time.perf_counter()
+        result = asyncio.run(ensemble_service.extract_locations_with_ensemble("anything"))
+        elapsed = time.perf_counter() - started
+
+    assert result["locations"] == []
+    assert elapsed < 0.35
+
+def test_batch_returns_an_error_result_when_the_process_engine_fails(bilstm_mocks):
+    """A failure other than saturation (here a broken worker pool) becomes a 500 result instead of escaping."""
+    from concurrent.futures.process import BrokenProcessPool
+
+    class BrokenEngine:
+        async def run_chunked(self, fn, texts, *args):
+            raise BrokenProcessPool("A worker process terminated abruptly.")
+
+    with patch("app.services.bilstm_service.INFERENCE_ENGINE", "processes"), \
+         patch("app.services.bilstm_service.get_process_engine", return_value=BrokenEngine()):
+        result = asyncio.run(bilstm_service.extract_locations_with_bilstm_batch(["I visited London"]))
+
+    assert result["status_code"] == 500
+    assert "terminated abruptly" in result["error"]